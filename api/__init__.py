@@ -1,13 +1,11 @@
 # api/__init__.py
-import os
 from flask import Flask, request, current_app
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask_swagger_ui import get_swaggerui_blueprint
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from .services.database import RoutingSession
 
 load_dotenv()
 
@@ -22,8 +20,8 @@ def get_identifier():
     return get_remote_address()
 
 # --- Initialize Extensions ---
-db = SQLAlchemy()
-migrate = Migrate()
+# Reads inside replica_reads() go to the replica bind, if one is configured
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 limiter = Limiter(
     key_func=get_identifier
 )
@@ -35,15 +33,65 @@ def create_app(config_class_string='api.config.ProductionConfig'):
     app = Flask(__name__)
     app.config.from_object(config_class_string)
 
+    from .services.serialization import configure_json
+    configure_json(app)
+
     # --- Database Config ---
-    db_url = os.getenv('DATABASE_URL')
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url + "?sslmode=require"
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # A config class may pin its own database (e.g. TestingConfig uses SQLite);
+    # pool, TLS and replica settings come from the DB_* values
+    from .services.database import configure_database, init_engines
+    configure_database(app)
 
     # --- Extension Initialization ---
     db.init_app(app)
-    migrate.init_app(app, db)
+    init_engines(app, db)
+    # Flask-Migrate (and Alembic) only where migrations run: the flask
+    # command, or when MIGRATIONS_ENABLED asks for it
+    from .services.startup import running_cli
+    if app.config.get('MIGRATIONS_ENABLED') or running_cli():
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    # Registers the mmap:// and database:// rate limit storages
+    from .services import ratelimit
+    configured_storage = app.config.get('RATELIMIT_STORAGE_URI')
+    app.config['RATELIMIT_STORAGE_URI'] = ratelimit.storage_uri(configured_storage)
+    if app.config['RATELIMIT_STORAGE_URI'] != configured_storage:
+        app.logger.warning('mmap:// rate limit storage is not available here; using memory://.')
     limiter.init_app(app)
+
+    from .services.cache import result_cache
+    result_cache.init_app(app)
+
+    from .services.jobs import job_manager
+    job_manager.init_app(app)
+
+    from .services.usage import usage_counter
+    usage_counter.init_app(app)
+
+    from .services.persistence import write_buffer
+    write_buffer.init_app(app)
+
+    from .services.rollups import global_rollups
+    global_rollups.init_app(app)
+
+    from .services.metrics import instrumentation
+    instrumentation.init_app(app)
+
+    from .services.resilience import deadline_budget, watson_breaker
+    deadline_budget.init_app(app)
+    watson_breaker.init_app(app)
+
+    from .services.concurrency import watson_limiter
+    watson_limiter.init_app(app)
+
+    from .services.serialization import analysis_memo
+    analysis_memo.init_app(app)
+
+    from .services.payload_log import payload_log
+    payload_log.init_app(app)
+
+    from .services.compression import response_compression
+    response_compression.init_app(app)
     
     # --- CORS ---
     frontend_url = app.config.get('FRONTEND_URL')
@@ -52,13 +100,19 @@ def create_app(config_class_string='api.config.ProductionConfig'):
     else:
         CORS(app)  # Permissive for development
 
-    # Swagger UI Configuration
-    SWAGGER_URL = '/api/docs'
-    API_URL = '/static/swagger.json'
-    swaggerui_blueprint = get_swaggerui_blueprint(
-        SWAGGER_URL, API_URL, config={'app_name': "Sentiment Analyzer API"}
-    )
-    app.register_blueprint(swaggerui_blueprint)
+    # Swagger UI Configuration (static/swagger.json is served either way)
+    if app.config.get('SWAGGER_UI_ENABLED'):
+        from flask_swagger_ui import get_swaggerui_blueprint
+        SWAGGER_URL = '/api/docs'
+        API_URL = '/static/swagger.json'
+        swaggerui_blueprint = get_swaggerui_blueprint(
+            SWAGGER_URL, API_URL, config={'app_name': "Sentiment Analyzer API"}
+        )
+        app.register_blueprint(swaggerui_blueprint)
+
+    # --- CLI Commands ---
+    from .commands import register_commands
+    register_commands(app)
 
     # --- Register Blueprints ---
     from .routes import main_bp
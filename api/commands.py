@@ -0,0 +1,96 @@
+# api/commands.py
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+rollups_cli = AppGroup('rollups', help='Manage the pre-aggregated analysis statistics.')
+
+
+@rollups_cli.command('rebuild')
+@click.option('--batch-size', default=1000, show_default=True, help='Analyses read per query.')
+def rebuild_rollups_command(batch_size):
+    """Recompute every rollup row from the analyses table."""
+    from .services.rollups import rebuild_rollups
+
+    processed = rebuild_rollups(batch_size=batch_size)
+    click.echo(f"Rebuilt rollups from {processed} analyses.")
+
+
+near_duplicates_cli = AppGroup('near-duplicates', help='Manage the near-duplicate text index.')
+
+
+@near_duplicates_cli.command('backfill')
+@click.option('--batch-size', default=1000, show_default=True, help='Analyses read per query.')
+@click.option('--backend', type=click.Choice(['watson', 'lexicon']), default=None,
+              help='Backend that produced the stored results (default: the configured one).')
+def backfill_near_duplicates_command(batch_size, backend):
+    """Compute signatures for analyses saved before the index existed."""
+    from .services.backends import get_backend
+    from .services.near_duplicates import backfill_signatures
+
+    read, indexed = backfill_signatures(get_backend(backend).cache_namespace, batch_size=batch_size)
+    click.echo(f"Indexed {indexed} of {read} analyses without a signature.")
+
+
+storage_cli = AppGroup('storage', help='Manage the compact analysis storage layout.')
+
+
+@storage_cli.command('backfill')
+@click.option('--batch-size', default=1000, show_default=True, help='Analyses moved per transaction.')
+def backfill_storage_command(batch_size):
+    """Move analyses saved in the legacy layout to deduplicated texts and packed emotions."""
+    from .services.storage import backfill_storage
+
+    moved = backfill_storage(batch_size=batch_size)
+    click.echo(f"Moved {moved} analyses to the compact layout.")
+
+
+partitions_cli = AppGroup('partitions', help='Manage the monthly partitions of the analyses table.')
+
+
+@partitions_cli.command('create')
+@click.option('--months-ahead', type=int, default=None,
+              help='Future months to create besides the current one (default: PARTITION_MONTHS_AHEAD).')
+def create_partitions_command(months_ahead):
+    """
+    Create the partitions of the current and coming months. Schedule it (e.g.
+    daily): rows of a month without a partition go to analyses_default
+    until it is created.
+    """
+    from .services.partitions import create_partitions, is_partitioned
+
+    if not is_partitioned():
+        click.echo("The analyses table is not partitioned; nothing to do.")
+        return
+    if months_ahead is None:
+        months_ahead = current_app.config.get('PARTITION_MONTHS_AHEAD', 3)
+    created = create_partitions(months_ahead)
+    click.echo(f"Created {len(created)} partitions{': ' + ', '.join(created) if created else '.'}")
+
+
+@partitions_cli.command('retain')
+@click.option('--keep-months', type=int, default=None,
+              help='Whole months kept besides the current one (default: RETENTION_MONTHS).')
+@click.option('--archive-dir', default=None, help='Where archives are written (default: ARCHIVE_DIR).')
+@click.option('--batch-size', default=1000, show_default=True, help='Analyses read per round trip.')
+@click.option('--dry-run', is_flag=True, help='Only list the months that would be archived.')
+def retain_partitions_command(keep_months, archive_dir, batch_size, dry_run):
+    """Archive expired months to NDJSON.gz files, then drop them."""
+    from .services.partitions import apply_retention, expired_months
+
+    if keep_months is None:
+        keep_months = current_app.config.get('RETENTION_MONTHS', 12)
+    if dry_run:
+        months = expired_months(keep_months)
+        click.echo(f"Would archive {len(months)} months{': ' + ', '.join(f'{m:%Y-%m}' for m in months) if months else '.'}")
+        return
+    archive_dir = archive_dir or current_app.config.get('ARCHIVE_DIR', 'archives')
+    for month, path, rows in apply_retention(keep_months, archive_dir, batch_size=batch_size):
+        click.echo(f"Archived {rows} analyses of {month:%Y-%m} to {path} and dropped them.")
+
+
+def register_commands(app):
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(near_duplicates_cli)
+    app.cli.add_command(storage_cli)
+    app.cli.add_command(partitions_cli)
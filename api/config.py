@@ -6,21 +6,166 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'a-default-secret-key')
     # Character limit for the analysis
     MAX_TEXT_CHARS = 1000
+    # Upper bound of the keywordLimit a request may ask for
+    ANALYSIS_MAX_KEYWORDS = 50
+    # Dev-only parts, off unless asked for: the Swagger UI at /api/docs, and
+    # Flask-Migrate outside the `flask` command (which always loads it)
+    SWAGGER_UI_ENABLED = os.getenv('SWAGGER_UI_ENABLED', '0') == '1'
+    MIGRATIONS_ENABLED = os.getenv('MIGRATIONS_ENABLED', '0') == '1'
+    # Database engine (api/services/database.py). Pools are per worker:
+    # workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) must fit in max_connections.
+    # PostgreSQL connections use DATABASE_SSLMODE unless DATABASE_URL sets one.
+    DATABASE_SSLMODE = os.getenv('DATABASE_SSLMODE', 'require')
+    # The defaults give every gunicorn thread (GUNICORN_THREADS=12) a connection.
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = 10
+    DB_POOL_RECYCLE_SECONDS = 1800
+    DB_POOL_PRE_PING = True
+    DB_CONNECT_TIMEOUT = 10
+    DB_TCP_KEEPALIVES_IDLE = 60
+    # Optional read replica for history, search, stats, export and the
+    # daily-limit pre-check; writes always go to DATABASE_URL
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
     # Flask-Limiter configurations
     # Enable the rate limiter
     RATELIMIT_ENABLED = True
-    # Store rate limit data in memory. For production, you might use "redis://..."
-    RATELIMIT_STORAGE_URI = "memory://"
+    # Rate limit counters: "memory://" keeps them per worker. Opt into
+    # "mmap:///tmp/sentiment-ratelimit.bin" to share them between the workers of
+    # one host; that file is local to the host (or container), so limits are
+    # not shared between replicas and start over on a redeploy. "database://"
+    # shares them between hosts. See api/services/ratelimit.py.
+    RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URI', 'memory://')
     # Send rate limit headers in the response
     RATELIMIT_HEADERS_ENABLED = True
     # Add config variable for the reCAPTCHA secret key
     RECAPTCHA_SECRET_KEY = os.getenv('RECAPTCHA_SECRET_KEY')
+    RECAPTCHA_VERIFY_URL = os.getenv('RECAPTCHA_VERIFY_URL', 'https://www.google.com/recaptcha/api/siteverify')
+    # Keep-alive connections kept open to the verification endpoint per worker
+    RECAPTCHA_POOL_MAXSIZE = 10
+    # 'sequential' runs the daily-limit query and the reCAPTCHA call one after
+    # the other; 'concurrent' overlaps them on a shared thread pool.
+    ADMISSION_MODE = os.getenv('ADMISSION_MODE', 'sequential')
+    ADMISSION_MAX_WORKERS = 16
     # Daily limit for analyses per user session
     DAILY_ANALYSIS_LIMIT_PER_SESSION = 10
+    # Remember sessions that used up their quota, to reject them without a query
+    USAGE_CACHE_ENABLED = True
+    USAGE_CACHE_TTL_SECONDS = 60
+    USAGE_CACHE_MAX_ENTRIES = 10000
+    # Analysis engine: 'watson' (IBM Watson NLU) or 'lexicon' (local, no network)
+    SENTIMENT_BACKEND = os.getenv('SENTIMENT_BACKEND', 'watson')
+    # Tail-latency protection (api/services/resilience.py): the time budget of
+    # a request, the longest single Watson call, and the circuit breaker that
+    # stops calling Watson after repeated failures or timeouts
+    ANALYSIS_DEADLINE_SECONDS = 15.0
+    WATSON_TIMEOUT_SECONDS = float(os.getenv('WATSON_TIMEOUT_SECONDS', '10'))
+    CIRCUIT_FAILURE_THRESHOLD = 5
+    CIRCUIT_RECOVERY_SECONDS = 30.0
+    CIRCUIT_HALF_OPEN_MAX_CALLS = 1
+    # Backend that answers (flagged as degraded) while the configured one is
+    # unavailable; empty to return the error instead
+    FALLBACK_BACKEND = os.getenv('FALLBACK_BACKEND', 'lexicon')
+    # Admission control for Watson calls (api/services/concurrency.py): slots
+    # per worker, callers allowed to wait for one and for how long; beyond
+    # that requests get 503 with Retry-After. Sized for gunicorn.conf.py
+    # (2 gthread workers x 12 threads): 4 calls and 6 waiting per worker
+    # leave threads that get shed. OUTBOUND_HOST_CONCURRENCY caps the calls of
+    # all workers on the host (flock()ed slot files; 0 disables it), so the
+    # Watson budget holds when WEB_CONCURRENCY is raised.
+    OUTBOUND_MAX_CONCURRENCY = int(os.getenv('OUTBOUND_MAX_CONCURRENCY', '4'))
+    OUTBOUND_MAX_QUEUE = int(os.getenv('OUTBOUND_MAX_QUEUE', '6'))
+    OUTBOUND_QUEUE_TIMEOUT_SECONDS = 5.0
+    OUTBOUND_HOST_CONCURRENCY = int(os.getenv('OUTBOUND_HOST_CONCURRENCY', '8'))
+    OUTBOUND_SLOT_DIR = os.getenv('OUTBOUND_SLOT_DIR', '/tmp/sentiment-outbound-slots')
+    # Result cache in front of the Watson call (in-process LRU + database lookup)
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', '1') == '1'
+    RESULT_CACHE_MAX_ENTRIES = 1024
+    RESULT_CACHE_TTL_SECONDS = 3600
+    # How old a stored analysis can be and still be reused for the same text
+    RESULT_CACHE_DB_MAX_AGE_SECONDS = 7 * 24 * 3600
+    # /analyze/document: longest accepted text, chunk size sent to the backend
+    # (at most MAX_TEXT_CHARS) and keywords kept after merging the chunks
+    LONG_DOCUMENT_MAX_CHARS = 20000
+    LONG_DOCUMENT_CHUNK_CHARS = 1000
+    LONG_DOCUMENT_MAX_KEYWORDS = 10
+    # Reuse the result of a stored analysis whose SimHash is at least this similar
+    # (share of equal bits; 0.95 allows 3 of 64 bits to differ)
+    NEAR_DUPLICATE_ENABLED = os.getenv('NEAR_DUPLICATE_ENABLED', '1') == '1'
+    NEAR_DUPLICATE_THRESHOLD = 0.95
+    NEAR_DUPLICATE_MAX_CANDIDATES = 100
+    # Batch endpoint: maximum texts per request and concurrent Watson calls
+    BATCH_MAX_ITEMS = 25
+    BATCH_MAX_WORKERS = 8
+    # Write-behind buffer: Analysis rows are saved in bulk off the request path
+    WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', '1') == '1'
+    WRITE_BEHIND_MAX_QUEUE = 1000
+    WRITE_BEHIND_BATCH_SIZE = 100
+    WRITE_BEHIND_FLUSH_INTERVAL = 1.0
+    # /history pagination
+    HISTORY_PAGE_SIZE = 10
+    HISTORY_MAX_PAGE_SIZE = 100
+    SEARCH_MAX_QUERY_CHARS = 200
+    # Rows fetched per round trip when streaming /history/export
+    EXPORT_BATCH_SIZE = 500
+    # /stats rollups: keywords kept per day, and the longest range served
+    ROLLUP_MAX_KEYWORDS = 200
+    # Global rollups are summed per worker and applied every interval (so the
+    # global /stats lag by up to that long), instead of every insert locking
+    # the same row
+    ROLLUP_GLOBAL_BUFFER_ENABLED = True
+    ROLLUP_GLOBAL_FLUSH_INTERVAL = 1.0
+    STATS_MAX_DAYS = 366
+    # Monthly partitions of analyses (PostgreSQL) created ahead of time, whole
+    # months kept besides the current one, and where older months are archived
+    # before they are dropped (see api/services/partitions.py)
+    PARTITION_MONTHS_AHEAD = 3
+    RETENTION_MONTHS = int(os.getenv('RETENTION_MONTHS', '12'))
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archives')
+    # Response encoding: 'orjson' (when installed) or 'default' (stdlib), and
+    # gzip for responses of at least GZIP_MIN_BYTES when the client accepts it
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson')
+    GZIP_ENABLED = True
+    GZIP_MIN_BYTES = 1024
+    GZIP_LEVEL = 6
+    # Encoded analyses kept per worker (per ?fields= selection) for history pages
+    ANALYSIS_MEMO_ENABLED = True
+    ANALYSIS_MEMO_MAX_ENTRIES = 10000
+    ANALYSIS_MEMO_TTL_SECONDS = 3600
+    # Share of raw Watson responses logged at DEBUG (0 disables it)
+    WATSON_PAYLOAD_LOG_SAMPLE_RATE = float(os.getenv('WATSON_PAYLOAD_LOG_SAMPLE_RATE', '0'))
+    # Prometheus metrics at /metrics and per-stage Server-Timing response headers
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+    SERVER_TIMING_ENABLED = True
+    # Asynchronous jobs: 'database' works across workers, 'memory' only within one
+    JOB_STORE = os.getenv('JOB_STORE', 'database')
+    JOB_MAX_WORKERS = 4
+    JOB_TTL_SECONDS = 3600
+    # Server-Sent Events stream for a job. Each open stream holds one of the
+    # worker's threads (gunicorn.conf.py), so only JOB_EVENTS_MAX_STREAMS per
+    # worker are served at once (0 turns streams off); past that clients get
+    # 503 and poll the job's status URL instead.
+    JOB_EVENTS_POLL_INTERVAL = 0.25
+    JOB_EVENTS_TIMEOUT = 30
+    JOB_EVENTS_MAX_STREAMS = int(os.getenv('JOB_EVENTS_MAX_STREAMS', '4'))
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    SWAGGER_UI_ENABLED = os.getenv('SWAGGER_UI_ENABLED', '1') == '1'
 
 class ProductionConfig(Config):
     DEBUG = False
-    FRONTEND_URL = os.getenv('FRONTEND_URL')
\ No newline at end of file
+    FRONTEND_URL = os.getenv('FRONTEND_URL')
+
+class TestingConfig(Config):
+    TESTING = True
+    # In-memory SQLite keeps the tests fast and isolated
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    DATABASE_REPLICA_URL = None
+    RATELIMIT_ENABLED = False
+    RATELIMIT_STORAGE_URI = "memory://"
+    JOB_STORE = 'memory'
+    OUTBOUND_HOST_CONCURRENCY = 0
+    WRITE_BEHIND_ENABLED = False
+    ROLLUP_GLOBAL_BUFFER_ENABLED = False
+    FALLBACK_BACKEND = None
@@ -1,7 +1,39 @@
 # api/models.py
 from . import db
 from datetime import datetime, timezone
+from sqlalchemy import event
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+from .services.search import install_search_ddl
+from .services.storage import (
+    EMOTION_NAMES, decompress_text, pack_emotions, store_pending_texts, unpack_emotions
+)
+
+class AnalysisText(db.Model):
+    """
+    One distinct analyzed text, shared by every analysis of it (see
+    api/services/storage.py). The body is zlib-compressed when that makes
+    it smaller.
+    """
+    __tablename__ = 'texts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # SHA-256 of the UTF-8 text
+    content_hash = db.Column(db.LargeBinary(32), nullable=False, unique=True)
+    body = db.Column(db.LargeBinary, nullable=False)
+    compressed = db.Column(db.Boolean, nullable=False)
+
+    @property
+    def content(self):
+        """The text, decompressed on first use."""
+        content = self.__dict__.get('_content')
+        if content is None:
+            content = self.__dict__['_content'] = decompress_text(self.body, self.compressed)
+        return content
+
+    def __repr__(self):
+        return f"<AnalysisText id={self.id} bytes={len(self.body)}>"
+
 
 class Analysis(db.Model):
     """
@@ -10,20 +42,42 @@ class Analysis(db.Model):
     __tablename__ = 'analyses'
 
     id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.String(36), nullable=False, index=True)
+    # Indexed by ix_analyses_session_created_id below
+    session_id = db.Column(db.String(36), nullable=False)
 
-    text_content = db.Column(db.Text, nullable=False)
+    # The text, in texts (read through text_content). No foreign key, like the
+    # other side tables; indexed so retention can tell which texts are unused.
+    text_id = db.Column(db.Integer, index=True)
+    text = db.relationship(
+        AnalysisText, primaryjoin='foreign(Analysis.text_id) == AnalysisText.id', viewonly=True
+    )
     
-    sentiment_label = db.Column(db.String(10), nullable=False)
-    sentiment_score = db.Column(db.Float, nullable=False)
+    # Columns of features the request didn't ask for are left NULL
+    sentiment_label = db.Column(db.String(10))
+    sentiment_score = db.Column(db.Float)
     
-    emotion_joy = db.Column(db.Float)
-    emotion_sadness = db.Column(db.Float)
-    emotion_fear = db.Column(db.Float)
-    emotion_disgust = db.Column(db.Float)
-    emotion_anger = db.Column(db.Float)
+    # The five emotion scores, packed (read through emotion_<name>)
+    emotion_scores = db.Column(db.LargeBinary(20))
 
-    keywords = db.Column(JSONB)
+    # Legacy layout: rows saved before texts/emotion_scores existed, until
+    # `flask storage backfill` moves them. No migration drops these yet (see
+    # migration d8a3f5b1c927).
+    legacy_text = db.Column('text_content', db.Text)
+    legacy_emotion_joy = db.Column('emotion_joy', db.Float)
+    legacy_emotion_sadness = db.Column('emotion_sadness', db.Float)
+    legacy_emotion_fear = db.Column('emotion_fear', db.Float)
+    legacy_emotion_disgust = db.Column('emotion_disgust', db.Float)
+    legacy_emotion_anger = db.Column('emotion_anger', db.Float)
+
+    keywords = db.Column(db.JSON().with_variant(JSONB, 'postgresql'))
+    # The keyword limit the analysis was requested with
+    keyword_limit = db.Column(db.SmallInteger)
+
+    # Hash of the normalized text and requested features, used by the result cache
+    cache_key = db.Column(db.String(64), index=True)
+    # 64-bit SimHash (stored signed) for near-duplicate lookups; its LSH bands
+    # are in analysis_simhash_bands
+    simhash = db.Column(db.BigInteger)
     
     created_at = db.Column(
         db.DateTime, 
@@ -31,24 +85,73 @@ class Analysis(db.Model):
         default=lambda: datetime.now(timezone.utc)
     )
 
-    def to_dict(self):
-        """Serializes the Analysis object to a dictionary."""
+    @classmethod
+    def from_result(cls, session_id, text_content, analysis_data, cache_key=None, simhash=None,
+                    keyword_limit=None):
+        """
+        Builds an Analysis from the data payload returned by analyze_text.
+        Features missing from the payload (not requested) are stored as NULL.
+        """
+        sentiment_data = analysis_data.get("sentiment")
+        emotions_data = analysis_data.get("emotions")
+        keywords = analysis_data.get("keywords")
+
+        if sentiment_data is not None:
+            sentiment = {'sentiment_label': sentiment_data.get('label', 'unknown'),
+                         'sentiment_score': sentiment_data.get('score', 0.0)}
+        else:
+            sentiment = {}
+        return cls(
+            session_id=session_id,
+            text_content=text_content,
+            **sentiment,
+            emotion_scores=pack_emotions(emotions_data),
+            keywords=keywords,
+            keyword_limit=keyword_limit if keywords is not None else None,
+            cache_key=cache_key,
+            simhash=simhash,
+            # Set now rather than at INSERT time, which may be later for buffered writes
+            created_at=datetime.now(timezone.utc)
+        )
+
+    # Text of a new analysis, until a flush gives it a texts row
+    _pending_text = None
+
+    @property
+    def text_content(self):
+        if self._pending_text is not None:
+            return self._pending_text
+        if self.text_id is not None:
+            return self.text.content
+        return self.legacy_text
+
+    @text_content.setter
+    def text_content(self, value):
+        self._pending_text = value
+        self.text_id = None
+
+    @property
+    def emotions(self):
+        """{name: score}, or None if the analysis has no emotions."""
+        if self.emotion_scores is not None:
+            return unpack_emotions(self.emotion_scores)
+        if self.legacy_emotion_joy is not None:
+            return {name: getattr(self, f'legacy_emotion_{name}') for name in EMOTION_NAMES}
+        return None
+
+    @emotions.setter
+    def emotions(self, value):
+        self.emotion_scores = pack_emotions(value)
+
+    def to_dict(self, fields=None):
+        """
+        Serializes the Analysis object to a dictionary.
+        If `fields` is given, only those keys are built (see ANALYSIS_FIELDS).
+        """
         return {
-            'id': self.id,
-            'text_content': self.text_content,
-            'text_snippet': f"{self.text_content[:75]}..." if len(self.text_content) > 75 else self.text_content,
-            'sentiment_label': self.sentiment_label,
-            'sentiment_score': self.sentiment_score,
-            'emotions': {
-                'joy': self.emotion_joy,
-                'sadness': self.emotion_sadness,
-                'fear': self.emotion_fear,
-                'disgust': self.emotion_disgust,
-                'anger': self.emotion_anger,
-            },
-            'keywords': self.keywords,
-            # Attach UTC timezone info before formatting to ensure the 'Z' is included
-            'created_at': self.created_at.replace(tzinfo=timezone.utc).isoformat()
+            name: serialize(self)
+            for name, (serialize, _) in ANALYSIS_FIELDS.items()
+            if fields is None or name in fields
         }
 
     def __repr__(self):
@@ -56,4 +159,188 @@ class Analysis(db.Model):
         Provides a developer-friendly string representation of the object,
         useful for debugging.
         """
-        return f"<Analysis id={self.id} sentiment='{self.sentiment_label}'>"
\ No newline at end of file
+        return f"<Analysis id={self.id} sentiment='{self.sentiment_label}'>"
+
+# History is read per session, newest first, with (created_at, id) as the keyset.
+db.Index(
+    'ix_analyses_session_created_id',
+    Analysis.session_id, Analysis.created_at.desc(), Analysis.id.desc()
+)
+# Full-text and keyword search indexes (tsvector/GIN on Postgres, FTS5 on SQLite)
+install_search_ddl(Analysis.__table__, AnalysisText.__table__)
+# New analyses get their texts row when they are flushed
+event.listen(Session, 'before_flush', store_pending_texts)
+
+
+def _emotion_property(name):
+    def get(analysis):
+        emotions = analysis.emotions
+        return None if emotions is None else emotions[name]
+
+    def set_(analysis, value):
+        analysis.emotions = {**(analysis.emotions or dict.fromkeys(EMOTION_NAMES, 0.0)), name: value}
+
+    return property(get, set_, doc=f"The {name} score, or None if the analysis has no emotions.")
+
+
+for _name in EMOTION_NAMES:
+    setattr(Analysis, f'emotion_{_name}', _emotion_property(_name))
+
+# Columns (and the relationship) text_content is read from
+TEXT_COLUMNS = ('text_id', 'legacy_text', 'text')
+
+# Serialized field name -> (how to build it, columns it needs)
+ANALYSIS_FIELDS = {
+    'id': (lambda a: a.id, ('id',)),
+    'text_content': (lambda a: a.text_content, TEXT_COLUMNS),
+    'text_snippet': (
+        lambda a: f"{a.text_content[:75]}..." if len(a.text_content) > 75 else a.text_content,
+        TEXT_COLUMNS
+    ),
+    'sentiment_label': (lambda a: a.sentiment_label, ('sentiment_label',)),
+    'sentiment_score': (lambda a: a.sentiment_score, ('sentiment_score',)),
+    'emotions': (
+        lambda a: a.emotions,
+        ('emotion_scores',) + tuple(f'legacy_emotion_{name}' for name in EMOTION_NAMES)
+    ),
+    'keywords': (lambda a: a.keywords, ('keywords',)),
+    # Attach UTC timezone info before formatting to ensure the 'Z' is included
+    'created_at': (lambda a: a.created_at.replace(tzinfo=timezone.utc).isoformat(), ('created_at',)),
+}
+
+class SessionDailyUsage(db.Model):
+    """
+    Number of analyses admitted for a session on a given (UTC) day.
+    Incremented atomically when a request is admitted, so the daily limit
+    check never has to count rows in analyses.
+    """
+    __tablename__ = 'session_daily_usage'
+
+    session_id = db.Column(db.String(36), primary_key=True)
+    usage_date = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SessionDailyUsage session_id={self.session_id} date={self.usage_date} count={self.count}>"
+
+
+class AnalysisSimhashBand(db.Model):
+    """
+    LSH index of Analysis.simhash: one row per band of the signature, so
+    near-duplicate candidates are found with equality lookups.
+    No foreign key to analyses, like the other side tables.
+    """
+    __tablename__ = 'analysis_simhash_bands'
+
+    band = db.Column(db.SmallInteger, primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)
+    analysis_id = db.Column(db.Integer, primary_key=True)
+
+    def __repr__(self):
+        return f"<AnalysisSimhashBand band={self.band} bucket={self.bucket} analysis_id={self.analysis_id}>"
+
+
+class RateLimitCounter(db.Model):
+    """
+    Fixed-window rate limit counter, used when RATELIMIT_STORAGE_URI is
+    'database://' (see api/services/ratelimit.py).
+    """
+    __tablename__ = 'rate_limit_counters'
+
+    key = db.Column(db.String(255), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    # End of the current window, in epoch seconds
+    expires_at = db.Column(db.Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<RateLimitCounter key={self.key} count={self.count}>"
+
+
+class AnalysisRollup(db.Model):
+    """
+    Pre-aggregated sentiment and emotion totals for one day, either for one
+    session or for all sessions (session_id == GLOBAL_ROLLUP_SCOPE).
+    Updated incrementally whenever analyses are saved.
+    """
+    __tablename__ = 'analysis_rollups'
+
+    day = db.Column(db.Date, primary_key=True)
+    session_id = db.Column(db.String(36), primary_key=True)
+
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    positive_count = db.Column(db.Integer, nullable=False, default=0)
+    negative_count = db.Column(db.Integer, nullable=False, default=0)
+    neutral_count = db.Column(db.Integer, nullable=False, default=0)
+    sentiment_score_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Analyses that carried emotion scores (the denominator for the averages)
+    emotion_count = db.Column(db.Integer, nullable=False, default=0)
+    joy_sum = db.Column(db.Float, nullable=False, default=0.0)
+    sadness_sum = db.Column(db.Float, nullable=False, default=0.0)
+    fear_sum = db.Column(db.Float, nullable=False, default=0.0)
+    disgust_sum = db.Column(db.Float, nullable=False, default=0.0)
+    anger_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    # keyword text -> number of analyses it appeared in
+    keyword_counts = db.Column(db.JSON().with_variant(JSONB, 'postgresql'), nullable=False, default=dict)
+
+    def __repr__(self):
+        return f"<AnalysisRollup day={self.day} session_id={self.session_id} total={self.total_count}>"
+
+
+class AnalysisJob(db.Model):
+    """
+    State of an asynchronous analysis job, used by the database job store.
+    """
+    __tablename__ = 'analysis_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    session_id = db.Column(db.String(36), nullable=False, index=True)
+    status = db.Column(db.String(16), nullable=False)
+    status_code = db.Column(db.Integer)
+    result = db.Column(db.JSON().with_variant(JSONB, 'postgresql'))
+    error = db.Column(db.Text)
+    analysis_id = db.Column(db.Integer)
+
+    created_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc)
+    )
+
+    def to_dict(self):
+        """Serializes the job to the dictionary shape shared by all job stores."""
+        return {
+            'id': self.id,
+            'session_id': self.session_id,
+            'status': self.status,
+            'status_code': self.status_code,
+            'result': self.result,
+            'error': self.error,
+            'analysis_id': self.analysis_id,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+        }
+
+    def __repr__(self):
+        return f"<AnalysisJob id={self.id} status='{self.status}'>"
+
+
+def upsert_insert(model):
+    """
+    Returns a dialect-specific INSERT for `model` that supports
+    on_conflict_do_update / on_conflict_do_nothing (PostgreSQL and SQLite).
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upserts are not supported on '{dialect}'.")
+    return insert(model)
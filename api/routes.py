@@ -1,17 +1,46 @@
-import requests
+import json
 import uuid
-from datetime import datetime, timezone
-from flask import Blueprint, jsonify, request, current_app
-from sqlalchemy import func
-from .services.watson_service import analyze_text
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import timezone
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context, url_for
+from flask_limiter.util import get_remote_address
+from .services.backends import analyze_text, analyze_texts, get_backend
+from .services.cache import (
+    DEFAULT_KEYWORD_LIMIT, FEATURES, make_cache_key, missing_features, result_cache, result_from_analysis,
+    select_features
+)
+from .services.jobs import job_manager, job_to_response, wait_for_change, FINISHED_STATES
+from .services.usage import usage_counter
+from .services.persistence import write_buffer
+from .services.history import decode_cursor, encode_cursor, load_page, page_etag, page_keys, parse_fields
+from .services.export import EXPORT_FORMATS
+from .services.documents import analyze_document
+from .services.near_duplicates import find_near_duplicate, stored_signature
+from .services.search import search_query
+from .services.serialization import array_response
+from .services.rollups import GLOBAL_ROLLUP_SCOPE, get_stats
+from .services.metrics import add_server_timing, collect_timings, timed
+from .services.pools import get_executor, get_http_session
+from .services.resilience import watson_breaker
+from .services.concurrency import watson_limiter
+from .services.database import replica_reads
 from . import limiter, db
 from .models import Analysis
 
 main_bp = Blueprint('main', __name__)
 
+@main_bp.before_request
+def reject_reserved_session_id():
+    """GLOBAL_ROLLUP_SCOPE keys the rollups of every session, so no client may use it as its session ID."""
+    if GLOBAL_ROLLUP_SCOPE in (request.headers.get('X-Session-ID'), request.args.get('session_id')):
+        return jsonify({"error": "Invalid session ID."}), 400
+    return None
+
 # 2. Add the reCAPTCHA verification helper function
 def verify_recaptcha(token):
     """Verifies a reCAPTCHA token with the Google API."""
+    import requests  # loaded with the first verification, not at startup
+
     secret_key = current_app.config.get('RECAPTCHA_SECRET_KEY')
 
     # Fail securely if the secret key is not configured
@@ -21,12 +50,15 @@ def verify_recaptcha(token):
 
     payload = {'secret': secret_key, 'response': token}
     
+    # A pooled keep-alive session: no new TLS handshake with Google per request
+    session = get_http_session('recaptcha', current_app.config.get('RECAPTCHA_POOL_MAXSIZE', 10))
     try:
-        response = requests.post(
-            'https://www.google.com/recaptcha/api/siteverify', 
-            data=payload,
-            timeout=5 
-        )
+        with timed('recaptcha'):
+            response = session.post(
+                current_app.config['RECAPTCHA_VERIFY_URL'],
+                data=payload,
+                timeout=5 
+            )
         response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
         result = response.json()
         return result.get('success', False)
@@ -34,6 +66,197 @@ def verify_recaptcha(token):
         current_app.logger.error(f'reCAPTCHA verification request failed: {e}')
         return False
 
+def check_daily_limit(session_id, requested=1):
+    """
+    Checks the per-session daily quota (Capa 2) without taking any of it.
+    Returns an error response tuple if `requested` more analyses would exceed it.
+    """
+    daily_limit = current_app.config.get('DAILY_ANALYSIS_LIMIT_PER_SESSION', 10)
+    try:
+        with timed('daily_limit'), replica_reads():
+            has_room = usage_counter.has_room(session_id, requested, daily_limit)
+        if not has_room:
+            return jsonify({"error": f"You have reached the daily limit of {daily_limit} analyses."}), 429
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error during daily limit check: {e}")
+        return jsonify({"error": "Could not verify usage limit due to a server error."}), 500
+
+    return None
+
+def reserve_daily_quota(session_id, requested=1):
+    """
+    Atomically takes `requested` units of the daily quota once a request is admitted.
+    Returns (day charged, None), or (None, error response tuple) if another
+    request used up the quota first.
+    """
+    daily_limit = current_app.config.get('DAILY_ANALYSIS_LIMIT_PER_SESSION', 10)
+    try:
+        with timed('quota'):
+            day = usage_counter.reserve(session_id, requested, daily_limit)
+        if day is None:
+            return None, (jsonify({"error": f"You have reached the daily limit of {daily_limit} analyses."}), 429)
+    except Exception as e:
+        current_app.logger.error(f"Database error during daily limit check: {e}")
+        return None, (jsonify({"error": "Could not verify usage limit due to a server error."}), 500)
+
+    return day, None
+
+def check_captcha(token):
+    """Returns a 403 response tuple unless `token` is a valid reCAPTCHA token."""
+    if not token or not verify_recaptcha(token):
+        return jsonify({
+            "error": "CAPTCHA verification failed. Please try again."
+        }), 403 # 403 Forbidden is the appropriate status code
+    return None
+
+def require_json_object(data):
+    """Returns an error response tuple unless the body is a JSON object."""
+    if not request.is_json:
+        return jsonify({"error": "Request must be of type application/json"}), 415
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object."}), 400
+    return None
+
+def _run_check(app, check):
+    with app.app_context(), collect_timings() as timings:
+        return check(), timings
+
+def run_admission_checks(checks):
+    """
+    Runs the checks that decide whether a request is admitted and returns the
+    first error response tuple, or None if they all pass.
+
+    `checks` is a list of (check, blocking) pairs in the order they run one
+    after another (ADMISSION_MODE = 'sequential'). Blocking checks wait on
+    the database or the network; with ADMISSION_MODE = 'concurrent' the
+    local checks run first and the blocking ones then run together on a
+    shared pool, so their latencies overlap. The first failure is returned
+    as soon as it is known, without waiting for the other checks.
+    """
+    if current_app.config.get('ADMISSION_MODE', 'sequential') != 'concurrent':
+        for check, _ in checks:
+            error = check()
+            if error:
+                return error
+        return None
+
+    for check, blocking in checks:
+        if not blocking:
+            error = check()
+            if error:
+                return error
+
+    blocking_checks = [check for check, blocking in checks if blocking]
+    if len(blocking_checks) < 2:
+        return blocking_checks[0]() if blocking_checks else None
+
+    app = current_app._get_current_object()
+    executor = get_executor('admission', current_app.config.get('ADMISSION_MAX_WORKERS', 16))
+    pending = {executor.submit(_run_check, app, check) for check in blocking_checks}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            error, timings = future.result()
+            add_server_timing(timings)
+            if error:
+                return error
+    return None
+
+def text_signature(text, namespace):
+    """SimHash stored with a new analysis, or None when near-duplicate reuse is off."""
+    if not current_app.config.get('NEAR_DUPLICATE_ENABLED', True):
+        return None
+    return stored_signature(text, namespace)
+
+def reuse_near_duplicate(text, signature, features=FEATURES, keyword_limit=DEFAULT_KEYWORD_LIMIT):
+    """
+    Looks for a stored analysis of an almost identical text that has every
+    requested feature. Returns its (data, meta) pair, or None.
+    """
+    if signature is None or not result_cache.enabled:
+        return None
+    match = find_near_duplicate(
+        text,
+        signature,
+        current_app.config.get('NEAR_DUPLICATE_THRESHOLD', 0.95),
+        max_age_seconds=current_app.config.get('RESULT_CACHE_DB_MAX_AGE_SECONDS'),
+        max_candidates=current_app.config.get('NEAR_DUPLICATE_MAX_CANDIDATES', 100),
+    )
+    if match is None:
+        return None
+    analysis, score = match
+    data = result_from_analysis(analysis, features, keyword_limit)
+    if missing_features(data, features):
+        return None
+    meta = {"reused": "near_duplicate", "similarity": round(score, 4), "analysis_id": analysis.id}
+    return data, meta
+
+def parse_feature_request(data):
+    """
+    Reads the optional "features" list and "keywordLimit" of a request body
+    (default: every feature, DEFAULT_KEYWORD_LIMIT keywords).
+    Returns (features, keyword_limit); raises ValueError if they are invalid.
+    """
+    features = data.get('features')
+    if features is None:
+        features = FEATURES
+    elif not isinstance(features, list) or not features or any(feature not in FEATURES for feature in features):
+        raise ValueError(f"'features' must be a non-empty list of: {', '.join(FEATURES)}.")
+    else:
+        # Canonical order, so equivalent requests share cache entries
+        features = tuple(feature for feature in FEATURES if feature in features)
+
+    keyword_limit = data.get('keywordLimit', DEFAULT_KEYWORD_LIMIT)
+    max_keywords = current_app.config.get('ANALYSIS_MAX_KEYWORDS', 50)
+    if isinstance(keyword_limit, bool) or not isinstance(keyword_limit, int) or not 1 <= keyword_limit <= max_keywords:
+        raise ValueError(f"'keywordLimit' must be an integer between 1 and {max_keywords}.")
+    return features, keyword_limit
+
+def validate_text(text_to_analyze, max_chars=None):
+    """Returns an (error message, status code) tuple if the text can't be analyzed."""
+    if not text_to_analyze or not isinstance(text_to_analyze, str) or not text_to_analyze.strip():
+        return "The 'text' field is required and must be a non-empty string.", 400
+
+    max_chars = max_chars or current_app.config.get('MAX_TEXT_CHARS', 1000)
+    if len(text_to_analyze) > max_chars:
+        return f"The text exceeds the character limit of {max_chars}. Submitted: {len(text_to_analyze)} characters.", 413
+
+    return None
+
+def parse_limit(raw):
+    """Parses the ?limit= page size, bounded by HISTORY_MAX_PAGE_SIZE."""
+    if raw is None:
+        return current_app.config.get('HISTORY_PAGE_SIZE', 10)
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError("'limit' must be an integer.")
+    max_limit = current_app.config.get('HISTORY_MAX_PAGE_SIZE', 100)
+    if not 1 <= limit <= max_limit:
+        raise ValueError(f"'limit' must be between 1 and {max_limit}.")
+    return limit
+
+def error_response(result):
+    """Response for a failed analyze result; shed calls tell the client when to retry."""
+    headers = {}
+    if result.get("retry_after"):
+        headers['Retry-After'] = str(result["retry_after"])
+    return jsonify({"error": result["error"]}), result.get("status", 500), headers
+
+def wants_async():
+    """True if the client asked for an asynchronous analysis (?async=1 or Prefer: respond-async)."""
+    if request.args.get('async', '').lower() in ('1', 'true'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+def get_session_job(job_id, session_id):
+    """Returns the job if it belongs to `session_id`, otherwise None."""
+    job = job_manager.get(job_id)
+    if job is None or job['session_id'] != session_id:
+        return None
+    return job
+
 @main_bp.route('/health')
 def health_check():
     """Health check endpoint for monitoring."""
@@ -51,118 +274,582 @@ def health_check():
 def analyze_route():
     """
     Analyzes a block of text, protected by two layers of rate limiting.
+
+    The body may name the features to compute ("features": any of
+    "sentiment", "emotion", "keywords"; default all) and "keywordLimit".
+    Only those are requested from Watson and returned.
     """
     session_id = request.headers.get('X-Session-ID')
     if not session_id:
         return jsonify({"error": "Session ID is missing from the request."}), 400
 
-    # --- Capa 2: Límite de Uso Diario (Lógica de Base de Datos) ---
-    try:
-        daily_limit = current_app.config.get('DAILY_ANALYSIS_LIMIT_PER_SESSION', 10)
-        
-        # Define el inicio del día actual en UTC
-        start_of_day_utc = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Contar los análisis para esta sesión desde el inicio del día
-        analyses_today = db.session.query(func.count(Analysis.id)).filter(
-            Analysis.session_id == session_id,
-            Analysis.created_at >= start_of_day_utc
-        ).scalar()
-
-        if analyses_today >= daily_limit:
-            return jsonify({"error": f"You have reached the daily limit of {daily_limit} analyses."}), 429
+    data = request.get_json(silent=True)
+    options = {}
 
-    except Exception as e:
-        current_app.logger.error(f"Database error during daily limit check: {e}")
-        return jsonify({"error": "Could not verify usage limit due to a server error."}), 500
+    def text_check():
+        text_error = validate_text(data.get('text'))
+        if text_error:
+            return jsonify({"error": text_error[0]}), text_error[1]
+        try:
+            options['features'], options['keyword_limit'] = parse_feature_request(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return None
 
-    if not request.is_json:
-        return jsonify({"error": "Request must be of type application/json"}), 415
+    admission_error = run_admission_checks([
+        # --- Capa 2: Límite de Uso Diario (Lógica de Base de Datos) ---
+        (lambda: check_daily_limit(session_id), True),
+        (lambda: require_json_object(data), False),
+        # --- reCAPTCHA Verification ---
+        (lambda: check_captcha(data.get('captchaToken')), True),
+        (text_check, False),
+    ])
+    if admission_error:
+        return admission_error
 
-    data = request.get_json()
+    # --- Continues only if every check passed ---
+    text_to_analyze = data.get('text')
+    features, keyword_limit = options['features'], options['keyword_limit']
 
-    # --- NEW: reCAPTCHA Verification Logic ---
-    captcha_token = data.get('captchaToken')
-    if not captcha_token or not verify_recaptcha(captcha_token):
-        return jsonify({
-            "error": "CAPTCHA verification failed. Please try again."
-        }), 403 # 403 Forbidden is the appropriate status code
+    cache_namespace = get_backend().cache_namespace
+    cache_key = make_cache_key(text_to_analyze, cache_namespace)
+    signature = text_signature(text_to_analyze, cache_namespace)
 
-    # --- Existing logic continues only if CAPTCHA is valid ---
-    text_to_analyze = data.get('text')
+    # The request is admitted: take one unit of today's quota
+    quota_day, quota_error = reserve_daily_quota(session_id)
+    if quota_error:
+        return quota_error
 
-    if not text_to_analyze or not isinstance(text_to_analyze, str) or not text_to_analyze.strip():
-        return jsonify({"error": "The 'text' field is required and must be a non-empty string."}), 400
+    # --- Async mode: answer 202 right away and let a job worker call Watson ---
+    if wants_async():
+        job = job_manager.submit(
+            current_app._get_current_object(), session_id, text_to_analyze, cache_key, analyze_text,
+            simhash=signature, features=features, keyword_limit=keyword_limit, quota_day=quota_day
+        )
+        status_url = url_for('main.job_status', job_id=job['id'])
+        body = {
+            "job_id": job['id'],
+            "status": job['status'],
+            "status_url": status_url,
+            "events_url": url_for('main.job_events', job_id=job['id']),
+        }
+        return jsonify(body), 202, {'Location': status_url}
 
-    max_chars = current_app.config.get('MAX_TEXT_CHARS', 1000)
-    if len(text_to_analyze) > max_chars:
-        error_message = f"The text exceeds the character limit of {max_chars}. Submitted: {len(text_to_analyze)} characters."
-        return jsonify({"error": error_message}), 413
+    # Repeated texts are served from the result cache (feature by feature),
+    # and almost identical ones from a stored near-duplicate; they still count
+    # toward the daily limit because the quota was reserved above.
+    meta = {}
+    cached_data, missing = result_cache.get_features(cache_key, features, keyword_limit)
+    if not cached_data:
+        reused = reuse_near_duplicate(text_to_analyze, signature, features, keyword_limit)
+        if reused is not None:
+            (cached_data, meta), missing = reused, []
+            result_cache.put_features(cache_key, cached_data, keyword_limit)
+
+    if missing and get_backend().circuit_open():
+        # The engine is failing: an old stored result beats no result
+        stale_data, still_missing = result_cache.get_stale_features(cache_key, missing, keyword_limit)
+        if not still_missing:
+            cached_data, missing = {**cached_data, **stale_data}, []
+            meta["degraded"] = {"reason": "circuit_open", "source": "stale_cache"}
 
-    # Call the service layer to perform the analysis
-    result = analyze_text(text_to_analyze)
-    status_code = result.get("status", 500)
+    if not missing:
+        result = {"data": cached_data, "status": 200}
+    else:
+        # Call the service layer for the features the cache doesn't have
+        result = analyze_text(text_to_analyze, features=tuple(missing), keyword_limit=keyword_limit)
 
-    if "error" in result:
-        return jsonify({"error": result["error"]}), status_code
+        if "error" in result:
+            # Failed analyses don't count toward the daily limit
+            usage_counter.release(session_id, day=quota_day)
+            return error_response(result)
+
+        if "degraded" in result:
+            # A fallback backend's result must not be cached or reused as this backend's
+            meta["degraded"] = result["degraded"]
+            cache_key = signature = None
+        else:
+            result_cache.put_features(cache_key, result.get("data"), keyword_limit)
+        result = {"data": select_features({**cached_data, **result.get("data")}, features), "status": 200}
 
     # --- New Database Logic ---
     # If the analysis was successful, save the results to the database.
     try:
-        analysis_data = result.get("data", {})
-        sentiment_data = analysis_data.get("sentiment", {})
-        emotions_data = analysis_data.get("emotions", {})
-        
-        new_analysis = Analysis(
-            session_id=session_id, # <-- 2. INCLUDE SESSION ID ON SAVE
-            text_content=text_to_analyze,
-            sentiment_label=sentiment_data.get('label', 'unknown'),
-            sentiment_score=sentiment_data.get('score', 0.0),
-            emotion_joy=emotions_data.get('joy', 0.0),
-            emotion_sadness=emotions_data.get('sadness', 0.0),
-            emotion_fear=emotions_data.get('fear', 0.0),
-            emotion_disgust=emotions_data.get('disgust', 0.0),
-            emotion_anger=emotions_data.get('anger', 0.0),
-            keywords=analysis_data.get('keywords', [])
+        new_analysis = Analysis.from_result(
+            session_id, # <-- 2. INCLUDE SESSION ID ON SAVE
+            text_to_analyze,
+            result.get("data", {}),
+            cache_key=cache_key,
+            simhash=signature,
+            keyword_limit=keyword_limit
         )
-        
-        db.session.add(new_analysis)
-        db.session.commit()
+
+        # Queued for a bulk write when write-behind is enabled, written now otherwise
+        write_buffer.submit([new_analysis])
     except Exception as e:
-        db.session.rollback()
         # In a real production environment, this error should be logged.
         print(f"Database Error: Could not save analysis. {e}")
         # We don't return an error to the user because the analysis itself
         # was successful. The user gets their result, even if we failed to save it.
 
     # The user receives the analysis data, regardless of the DB operation outcome.
-    return jsonify(result.get("data")), 200
+    body = result.get("data")
+    if meta:
+        body = {**body, "meta": meta}
+    return jsonify(body), 200
+
+@main_bp.route('/analyze/batch', methods=['POST'])
+@limiter.limit("15 per minute")
+def analyze_batch_route():
+    """
+    Analyzes a list of texts in one request.
+
+    The daily quota and reCAPTCHA are checked once for the whole batch, texts
+    are analyzed together by the configured backend, and every
+    successful analysis is saved with a single commit. Items that fail are
+    given back to the daily quota. Results come back in input order, one
+    entry per text.
+    """
+    session_id = request.headers.get('X-Session-ID')
+    if not session_id:
+        return jsonify({"error": "Session ID is missing from the request."}), 400
+
+    data = request.get_json(silent=True)
+    texts = data.get('texts') if isinstance(data, dict) else None
+    options = {}
+
+    def texts_check():
+        if not texts or not isinstance(texts, list):
+            return jsonify({"error": "The 'texts' field is required and must be a non-empty list."}), 400
+        max_items = current_app.config.get('BATCH_MAX_ITEMS', 25)
+        if len(texts) > max_items:
+            return jsonify({"error": f"A batch can contain at most {max_items} texts. Submitted: {len(texts)}."}), 413
+        try:
+            options['features'], options['keyword_limit'] = parse_feature_request(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return None
+
+    admission_error = run_admission_checks([
+        (lambda: require_json_object(data), False),
+        (texts_check, False),
+        # The whole batch counts against the daily quota
+        (lambda: check_daily_limit(session_id, requested=len(texts)), True),
+        (lambda: check_captcha(data.get('captchaToken')), True),
+    ])
+    if admission_error:
+        return admission_error
+
+    quota_day, quota_error = reserve_daily_quota(session_id, requested=len(texts))
+    if quota_error:
+        return quota_error
+
+    features, keyword_limit = options['features'], options['keyword_limit']
+    cache_namespace = get_backend().cache_namespace
+    near_duplicates_enabled = current_app.config.get('NEAR_DUPLICATE_ENABLED', True)
+    results = [None] * len(texts)
+    cache_keys = [None] * len(texts)
+    cached = {}
+    pending = []
+    pending_features = set()
+    for index, text in enumerate(texts):
+        text_error = validate_text(text)
+        if text_error:
+            results[index] = {"error": text_error[0], "status": text_error[1]}
+            continue
+
+        cache_keys[index] = make_cache_key(text, cache_namespace)
+        cached[index], missing = result_cache.get_features(cache_keys[index], features, keyword_limit)
+        if not missing:
+            results[index] = {"data": cached[index], "status": 200}
+        else:
+            pending.append(index)
+            pending_features.update(missing)
+
+    if pending:
+        # Watson fans out on a bounded thread pool; local backends score the batch in one pass.
+        # One request shape for the whole batch: every feature some text is missing.
+        pending_features = tuple(feature for feature in FEATURES if feature in pending_features)
+        analyzed = analyze_texts([texts[index] for index in pending], features=pending_features,
+                                 keyword_limit=keyword_limit)
+        for index, result in zip(pending, analyzed):
+            if "error" not in result:
+                if "degraded" in result:
+                    # Answered by the fallback backend: not cached, not reusable
+                    cache_keys[index] = None
+                else:
+                    result_cache.put_features(cache_keys[index], result.get("data"), keyword_limit)
+                merged = select_features({**cached[index], **result.get("data")}, features)
+                result = {**result, "data": merged, "status": 200}
+            results[index] = result
+
+    # Save every successful analysis in one bulk insert
+    new_analyses = [
+        Analysis.from_result(
+            session_id, texts[index], result.get("data", {}), cache_key=cache_keys[index],
+            simhash=(stored_signature(texts[index], cache_namespace)
+                     if near_duplicates_enabled and cache_keys[index] else None),
+            keyword_limit=keyword_limit
+        )
+        for index, result in enumerate(results)
+        if "error" not in result
+    ]
+    if new_analyses:
+        try:
+            write_buffer.submit(new_analyses)
+        except Exception as e:
+            print(f"Database Error: Could not save batch analyses. {e}")
+
+    # Failed items don't count toward the daily limit
+    failed = sum(1 for result in results if "error" in result)
+    if failed:
+        usage_counter.release(session_id, failed, day=quota_day)
+
+    response_items = []
+    for index, result in enumerate(results):
+        if "error" in result:
+            item = {"index": index, "status": result.get("status", 500), "error": result["error"]}
+            if result.get("retry_after"):
+                item["retry_after"] = result["retry_after"]
+            response_items.append(item)
+        else:
+            item = {"index": index, "status": 200, "data": result.get("data")}
+            if "degraded" in result:
+                item["degraded"] = result["degraded"]
+            response_items.append(item)
+
+    return jsonify({"results": response_items}), 200
+
+@main_bp.route('/analyze/document', methods=['POST'])
+@limiter.limit("15 per minute")
+def analyze_document_route():
+    """
+    Analyzes a long text (up to LONG_DOCUMENT_MAX_CHARS) as one document.
+
+    The text is split at sentence boundaries into chunks that are analyzed in
+    parallel and merged into one sentiment, emotion vector and keyword list,
+    weighted by chunk length. With "includeChunks": true the per-chunk
+    results are returned under "chunks". The document counts as a single
+    analysis toward the daily limit and is saved as one row.
+    """
+    session_id = request.headers.get('X-Session-ID')
+    if not session_id:
+        return jsonify({"error": "Session ID is missing from the request."}), 400
+
+    data = request.get_json(silent=True)
+    max_chars = current_app.config.get('LONG_DOCUMENT_MAX_CHARS', 20000)
+
+    def text_check():
+        text_error = validate_text(data.get('text'), max_chars=max_chars)
+        return (jsonify({"error": text_error[0]}), text_error[1]) if text_error else None
+
+    admission_error = run_admission_checks([
+        (lambda: check_daily_limit(session_id), True),
+        (lambda: require_json_object(data), False),
+        (lambda: check_captcha(data.get('captchaToken')), True),
+        (text_check, False),
+    ])
+    if admission_error:
+        return admission_error
+
+    text_to_analyze = data.get('text')
+    include_chunks = data.get('includeChunks') is True
+    chunk_chars = current_app.config.get('LONG_DOCUMENT_CHUNK_CHARS', 1000)
+    # The chunking is part of the key: a different chunk size merges differently
+    cache_key = make_cache_key(text_to_analyze, f"{get_backend().cache_namespace}|document:{chunk_chars}")
+
+    quota_day, quota_error = reserve_daily_quota(session_id)
+    if quota_error:
+        return quota_error
+
+    # Cached documents don't keep their chunks, so a breakdown is always recomputed
+    cached_data = None if include_chunks else result_cache.get(cache_key)
+    if cached_data is not None:
+        result = {"data": cached_data}
+    else:
+        result = analyze_document(
+            text_to_analyze, chunk_chars, current_app.config.get('LONG_DOCUMENT_MAX_KEYWORDS', 10)
+        )
+        if "error" in result:
+            usage_counter.release(session_id, day=quota_day)
+            return error_response(result)
+        if "degraded" in result:
+            cache_key = None
+        else:
+            result_cache.put(cache_key, result["data"])
+
+    try:
+        write_buffer.submit([
+            Analysis.from_result(session_id, text_to_analyze, result["data"], cache_key=cache_key,
+                                 keyword_limit=current_app.config.get('LONG_DOCUMENT_MAX_KEYWORDS', 10))
+        ])
+    except Exception as e:
+        print(f"Database Error: Could not save analysis. {e}")
+
+    body = dict(result["data"])
+    if include_chunks:
+        body["chunks"] = result["chunks"]
+    if "degraded" in result:
+        body["meta"] = {"degraded": result["degraded"]}
+    return jsonify(body), 200
+
+@main_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Returns the state of an asynchronous analysis job, and its result once finished."""
+    session_id = request.headers.get('X-Session-ID')
+    if not session_id:
+        return jsonify({"error": "Session ID is missing from the request."}), 400
+
+    job = get_session_job(job_id, session_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+
+    return jsonify(job_to_response(job)), 200
+
+@main_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Streams the job state as Server-Sent Events until it finishes.
+    EventSource can't send headers, so the session may also be given as ?session_id=.
+    At most JOB_EVENTS_MAX_STREAMS streams are open per worker; past that
+    the answer is 503 and the client polls the job status instead.
+    """
+    session_id = request.headers.get('X-Session-ID') or request.args.get('session_id')
+    if not session_id:
+        return jsonify({"error": "Session ID is missing from the request."}), 400
+
+    job = get_session_job(job_id, session_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+
+    streams = job_manager.event_streams
+    if not streams.acquire(blocking=False):
+        headers = {'Retry-After': '1', 'Location': url_for('main.job_status', job_id=job_id)}
+        return jsonify({"error": "Too many open event streams. Poll the job status instead."}), 503, headers
+
+    store = job_manager.store
+    poll_interval = current_app.config.get('JOB_EVENTS_POLL_INTERVAL', 0.25)
+    timeout = current_app.config.get('JOB_EVENTS_TIMEOUT', 30)
+
+    def generate(job):
+        while job is not None:
+            yield f"event: {job['status']}\ndata: {json.dumps(job_to_response(job))}\n\n"
+            if job['status'] in FINISHED_STATES:
+                return
+            next_job = wait_for_change(store, job_id, job['status'], timeout, poll_interval)
+            if next_job is not None and next_job['status'] == job['status']:
+                # Nothing happened before the timeout; the client can reconnect.
+                return
+            job = next_job
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    response = Response(stream_with_context(generate(job)), mimetype='text/event-stream', headers=headers)
+    # Also runs when the client disconnects before the stream ends
+    response.call_on_close(streams.release)
+    return response
 
 # --- New Endpoint ---
 @main_bp.route('/history', methods=['GET'])
 def history_route():
     """
-    Retrieves the 10 most recent analysis records for the current user's session.
+    Retrieves the current user's analyses, newest first, one page at a time.
+
+    Query parameters:
+      limit  - page size (default HISTORY_PAGE_SIZE)
+      cursor - value of the X-Next-Cursor header of the previous page
+      fields - comma-separated subset of the Analysis fields to return
+
+    Responses carry an ETag and Last-Modified, so unchanged pages cost a 304.
     """
     # --- 3. ADD SESSION ID VALIDATION ---
     session_id = request.headers.get('X-Session-ID')
     if not session_id:
         return jsonify({"error": "Session ID is missing from the request."}), 400
 
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         # --- 4. MODIFY THE DATABASE QUERY ---
         # Filter analyses to only return those for the current session
-        recent_analyses = Analysis.query.filter_by(session_id=session_id).order_by(Analysis.created_at.desc()).limit(10).all()
-        
-        # Use the `to_dict()` method from our model to serialize each object.
-        history_list = [analysis.to_dict() for analysis in recent_analyses]
-        
-        return jsonify(history_list), 200
+        with replica_reads():
+            session_query = Analysis.query.filter(Analysis.session_id == session_id)
+            keys = page_keys(session_query, limit + 1, cursor)
+            has_more = len(keys) > limit
+            keys = keys[:limit]
+
+            etag = page_etag(session_id, limit, request.args.get('cursor'), fields, keys=keys)
+            if request.if_none_match.contains_weak(etag):
+                return Response(status=304, headers={'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'})
+
+            history_list = load_page(keys, fields)
     except Exception as e:
+        db.session.rollback()
         # In a real production environment, this error should be logged.
         print(f"Database Error: Could not retrieve history. {e}")
         return jsonify({"error": "Could not retrieve analysis history."}), 500
 
+    response = array_response(history_list)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    if keys:
+        response.last_modified = keys[0].created_at.replace(tzinfo=timezone.utc)
+    if has_more:
+        next_cursor = encode_cursor(keys[-1].created_at, keys[-1].id)
+        next_args = {**request.args.to_dict(), 'cursor': next_cursor}
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for("main.history_route", **next_args)}>; rel="next"'
+    return response.make_conditional(request)
+
+SEARCH_LABELS = ('positive', 'negative', 'neutral')
+
+@main_bp.route('/history/search', methods=['GET'])
+def search_history_route():
+    """
+    Searches the current user's analyses, newest first, one page at a time.
+
+    Query parameters (at least one of q, keyword, label):
+      q       - words that must all appear in the text (stemmed: "charging" finds "charge")
+      keyword - exact text of a keyword Watson extracted
+      label   - sentiment label: positive, negative or neutral
+      limit, cursor, fields - as for /history
+
+    Like /history, responses carry an ETag, so unchanged pages cost a 304.
+    """
+    session_id = request.headers.get('X-Session-ID')
+    if not session_id:
+        return jsonify({"error": "Session ID is missing from the request."}), 400
+
+    q = request.args.get('q', '').strip()
+    keyword = request.args.get('keyword', '').strip()
+    label = request.args.get('label', '').strip().lower()
+    if not (q or keyword or label):
+        return jsonify({"error": "Provide at least one of 'q', 'keyword' or 'label'."}), 400
+    max_chars = current_app.config.get('SEARCH_MAX_QUERY_CHARS', 200)
+    if len(q) > max_chars or len(keyword) > max_chars:
+        return jsonify({"error": f"Search terms cannot exceed {max_chars} characters."}), 400
+    if label and label not in SEARCH_LABELS:
+        return jsonify({"error": f"'label' must be one of: {', '.join(SEARCH_LABELS)}."}), 400
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        with replica_reads():
+            with timed('search'):
+                keys = page_keys(search_query(session_id, q=q, keyword=keyword, label=label), limit + 1, cursor)
+            has_more = len(keys) > limit
+            keys = keys[:limit]
+
+            etag = page_etag(session_id, q, keyword, label, limit, request.args.get('cursor'), fields, keys=keys)
+            if request.if_none_match.contains_weak(etag):
+                return Response(status=304, headers={'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'})
+
+            results = load_page(keys, fields)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Database Error: Could not search history. {e}")
+        return jsonify({"error": "Could not search analysis history."}), 500
+
+    response = array_response(results)
+    # No Last-Modified: backfilled texts can add older rows to the results
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    if has_more:
+        next_cursor = encode_cursor(keys[-1].created_at, keys[-1].id)
+        next_args = {**request.args.to_dict(), 'cursor': next_cursor}
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for("main.search_history_route", **next_args)}>; rel="next"'
+    return response.make_conditional(request)
+
+@main_bp.route('/history/export', methods=['GET'])
+def export_history_route():
+    """
+    Streams every analysis of the current session as NDJSON (default) or CSV.
+    Rows are read with a server-side cursor and written as they arrive, so
+    memory use doesn't grow with the size of the history.
+    """
+    session_id = request.headers.get('X-Session-ID')
+    if not session_id:
+        return jsonify({"error": "Session ID is missing from the request."}), 400
+
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format '{export_format}'. Use one of: {', '.join(EXPORT_FORMATS)}."}), 400
+
+    generate, mimetype = EXPORT_FORMATS[export_format]
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 500)
+    headers = {'Content-Disposition': f'attachment; filename="analyses-{session_id}.{export_format}"'}
+    return Response(stream_with_context(generate(session_id, batch_size)), mimetype=mimetype, headers=headers)
+
+@main_bp.route('/stats', methods=['GET'])
+def stats_route():
+    """
+    Sentiment distribution, average emotions and top keywords per day, read
+    from the pre-aggregated rollups.
+
+    Query parameters:
+      scope - 'session' (default, needs X-Session-ID) or 'global'
+      days  - how many days back to include (default 30)
+    """
+    scope = request.args.get('scope', 'session')
+    if scope == 'global':
+        rollup_scope = GLOBAL_ROLLUP_SCOPE
+    elif scope == 'session':
+        rollup_scope = request.headers.get('X-Session-ID')
+        if not rollup_scope:
+            return jsonify({"error": "Session ID is missing from the request."}), 400
+    else:
+        return jsonify({"error": "'scope' must be 'session' or 'global'."}), 400
+
+    max_days = current_app.config.get('STATS_MAX_DAYS', 366)
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        days = 0
+    if not 1 <= days <= max_days:
+        return jsonify({"error": f"'days' must be an integer between 1 and {max_days}."}), 400
+
+    try:
+        with replica_reads():
+            stats = get_stats(rollup_scope, days)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Database Error: Could not retrieve stats. {e}")
+        return jsonify({"error": "Could not retrieve statistics."}), 500
+
+    return jsonify({"scope": scope, **stats}), 200
+
+@main_bp.route('/circuit/stats', methods=['GET'])
+def circuit_stats():
+    """Returns the state and counters of the Watson circuit breaker in this worker."""
+    return jsonify(watson_breaker.stats()), 200
+
+@main_bp.route('/concurrency/stats', methods=['GET'])
+def concurrency_stats():
+    """Returns the Watson call slots, wait queue and shed count of this worker."""
+    return jsonify(watson_limiter.stats()), 200
+
+@main_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Returns the result cache hit/miss counters for this worker."""
+    return jsonify(result_cache.stats()), 200
+
+@main_bp.route('/persistence/stats', methods=['GET'])
+def persistence_stats():
+    """Returns the write-behind queue depth and counters for this worker."""
+    return jsonify(write_buffer.stats()), 200
+
 # --- 2. ADD THE NEW ENDPOINT HERE ---
 @main_bp.route('/session/new', methods=['GET'])
 def new_session():
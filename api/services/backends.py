@@ -0,0 +1,169 @@
+# api/services/backends.py
+import os
+import threading
+from flask import current_app, has_app_context
+from . import watson_service
+from .cache import ANALYSIS_FEATURES, DEFAULT_KEYWORD_LIMIT, FEATURES
+from .concurrency import Overloaded, watson_limiter
+from .metrics import timed
+from .pools import get_executor
+from .resilience import call_timeout, current_deadline, deadline_scope, is_unavailable, watson_breaker
+
+
+class SentimentBackend:
+    """
+    Interface of an analysis engine. `analyze` returns the same dictionary as
+    watson_service.analyze_text: {"data": {...}, "status": 200} on success or
+    {"error": "...", "status": code} on failure. The data holds only the
+    requested `features` (see cache.FEATURES).
+    """
+    name = None
+    # Part of the result cache key, so results of different engines never mix
+    cache_namespace = None
+    # CircuitBreaker guarding a remote engine
+    breaker = None
+
+    def circuit_open(self):
+        """True while the engine is known to be failing and isn't being called."""
+        return self.breaker is not None and self.breaker.state != 'closed'
+
+    def analyze(self, text, features=FEATURES, keyword_limit=DEFAULT_KEYWORD_LIMIT):
+        raise NotImplementedError
+
+    def analyze_many(self, texts, features=FEATURES, keyword_limit=DEFAULT_KEYWORD_LIMIT):
+        """Analyzes several texts; results are returned in input order."""
+        return [self.analyze(text, features, keyword_limit) for text in texts]
+
+
+class WatsonBackend(SentimentBackend):
+    """IBM Watson Natural Language Understanding."""
+    name = 'watson'
+    cache_namespace = ANALYSIS_FEATURES
+    breaker = watson_breaker
+    limiter = watson_limiter
+
+    def analyze(self, text, features=FEATURES, keyword_limit=DEFAULT_KEYWORD_LIMIT):
+        default_timeout = current_app.config.get('WATSON_TIMEOUT_SECONDS', 10.0) if has_app_context() else 10.0
+        out_of_time = {"error": "The request ran out of time before the analysis could start.", "status": 504}
+        if call_timeout(default_timeout) is None:
+            # Our own budget ran out; says nothing about Watson's health
+            return out_of_time
+        try:
+            with self.limiter.slot():
+                # Waiting for the slot used part of the budget
+                timeout = call_timeout(default_timeout)
+                if timeout is None:
+                    return out_of_time
+                if not self.breaker.allow():
+                    return {"error": "The analysis service is temporarily unavailable.", "status": 503,
+                            "circuit_open": True}
+                result = watson_service.analyze_text(text, features, keyword_limit, timeout=timeout)
+                self.breaker.record(result)
+                return result
+        except Overloaded as e:
+            return {"error": "The analysis service is busy, please try again shortly.", "status": 503,
+                    "retry_after": e.retry_after, "shed": True}
+
+    def analyze_many(self, texts, features=FEATURES, keyword_limit=DEFAULT_KEYWORD_LIMIT):
+        # Each text is a separate HTTP call, so fan them out on a bounded pool
+        max_workers = current_app.config.get('BATCH_MAX_WORKERS', 8) if has_app_context() else 8
+        executor = get_executor('watson-batch', max_workers)
+        deadline = current_deadline()
+
+        def analyze(text):
+            with deadline_scope(deadline):
+                return self.analyze(text, features, keyword_limit)
+
+        return list(executor.map(analyze, texts))
+
+
+def _lexicon_backend():
+    # Imported lazily so Watson-only deployments don't load NumPy
+    from .lexicon_service import LexiconBackend
+    return LexiconBackend()
+
+
+BACKEND_FACTORIES = {
+    'watson': WatsonBackend,
+    'lexicon': _lexicon_backend,
+}
+
+_instances = {}
+_lock = threading.Lock()
+
+
+def configured_backend_name():
+    """The backend selected by SENTIMENT_BACKEND (app config first, then environment)."""
+    if has_app_context():
+        return current_app.config.get('SENTIMENT_BACKEND', 'watson')
+    return os.getenv('SENTIMENT_BACKEND', 'watson')
+
+
+def get_backend(name=None):
+    """Returns the (shared) backend instance called `name`, or the configured one."""
+    name = name or configured_backend_name()
+    backend = _instances.get(name)
+    if backend is None:
+        if name not in BACKEND_FACTORIES:
+            raise ValueError(f"Unknown SENTIMENT_BACKEND '{name}'.")
+        with _lock:
+            backend = _instances.get(name)
+            if backend is None:
+                backend = _instances[name] = BACKEND_FACTORIES[name]()
+    return backend
+
+
+def fallback_backend(engine):
+    """The FALLBACK_BACKEND used while `engine` is unavailable, or None."""
+    if has_app_context():
+        name = current_app.config.get('FALLBACK_BACKEND')
+    else:
+        name = os.getenv('FALLBACK_BACKEND')
+    if not name or name == engine.name:
+        return None
+    return get_backend(name)
+
+
+def _degraded_reason(result):
+    if result.get("circuit_open"):
+        return 'circuit_open'
+    return 'timeout' if result.get("status") == 504 else 'unavailable'
+
+
+def _with_fallback(engine, texts, results, features, keyword_limit):
+    """
+    Re-analyzes the texts whose engine was unavailable with the fallback
+    backend. Those results carry "degraded": {"reason", "backend"}; results
+    the fallback can't improve are left as they were. Calls shed by admission
+    control are not retried: the point of shedding is to push the load back.
+    """
+    failed = [index for index, result in enumerate(results) if is_unavailable(result) and not result.get("shed")]
+    fallback = fallback_backend(engine) if failed else None
+    if fallback is None:
+        return results
+
+    with timed('analysis_fallback'):
+        retried = fallback.analyze_many([texts[index] for index in failed], features, keyword_limit)
+    results = list(results)
+    for index, result in zip(failed, retried):
+        if "error" not in result:
+            results[index] = {
+                **result, "degraded": {"reason": _degraded_reason(results[index]), "backend": fallback.name}
+            }
+    return results
+
+
+def analyze_text(text_to_analyze, backend=None, features=FEATURES, keyword_limit=DEFAULT_KEYWORD_LIMIT):
+    """Analyzes one text with the configured backend (or the fallback, if it is unavailable)."""
+    engine = get_backend(backend)
+    with timed('analysis'):
+        result = engine.analyze(text_to_analyze, features, keyword_limit)
+    return _with_fallback(engine, [text_to_analyze], [result], features, keyword_limit)[0]
+
+
+def analyze_texts(texts, backend=None, features=FEATURES, keyword_limit=DEFAULT_KEYWORD_LIMIT):
+    """Analyzes several texts with the configured backend, in input order."""
+    engine = get_backend(backend)
+    with timed('analysis'):
+        results = engine.analyze_many(texts, features, keyword_limit)
+    return _with_fallback(engine, texts, results, features, keyword_limit)
@@ -0,0 +1,263 @@
+# api/services/cache.py
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from .metrics import timed
+
+# Describes the Watson request made by analyze_text; it is part of the cache
+# key so results for a different feature set are never mixed up.
+ANALYSIS_FEATURES = 'sentiment,emotion,keywords:5'
+
+# Features a client can ask for, and the key each one has in the result data
+FEATURES = ('sentiment', 'emotion', 'keywords')
+FEATURE_DATA_KEYS = {'sentiment': 'sentiment', 'emotion': 'emotions', 'keywords': 'keywords'}
+DEFAULT_KEYWORD_LIMIT = 5
+
+
+def normalize_text(text):
+    """Normalizes text so trivially different inputs share a cache entry."""
+    text = unicodedata.normalize('NFC', text)
+    return ' '.join(text.split())
+
+
+def make_cache_key(text, features=ANALYSIS_FEATURES):
+    """Returns the content hash used to look up a cached analysis."""
+    payload = f"{features}\n{normalize_text(text)}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+class TTLCache:
+    """A small thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def feature_part(feature, keyword_limit):
+    """Name of one cached part of a result; keyword lists are cached per limit."""
+    return f"keywords:{keyword_limit}" if feature == 'keywords' else feature
+
+
+def select_features(data, features):
+    """Only the requested features of a data payload."""
+    return {FEATURE_DATA_KEYS[feature]: data[FEATURE_DATA_KEYS[feature]]
+            for feature in features if FEATURE_DATA_KEYS[feature] in data}
+
+
+def missing_features(data, features):
+    """The features of `features` that `data` has no entry for."""
+    return [feature for feature in features if FEATURE_DATA_KEYS[feature] not in data]
+
+
+def result_from_analysis(analysis, features=FEATURES, keyword_limit=None):
+    """
+    Rebuilds the analyze_text data payload from a stored Analysis row, with
+    the requested features the row has (columns of unrequested features are
+    NULL). With a `keyword_limit`, keywords are only taken from a row that
+    was analyzed with at least that limit; without one, as stored.
+    """
+    data = {}
+    if 'sentiment' in features and analysis.sentiment_label is not None:
+        data["sentiment"] = {
+            "label": analysis.sentiment_label,
+            "score": analysis.sentiment_score,
+        }
+    if 'emotion' in features and analysis.emotions is not None:
+        data["emotions"] = analysis.emotions
+    if 'keywords' in features and analysis.keywords is not None:
+        if keyword_limit is None:
+            data["keywords"] = analysis.keywords
+        elif (analysis.keyword_limit or 0) >= keyword_limit:
+            data["keywords"] = analysis.keywords[:keyword_limit]
+    return data
+
+
+class ResultCache:
+    """
+    Two-tier cache for analysis results keyed by the content hash of the text.
+
+    The first tier is an in-process TTLCache; the second looks for a recent
+    Analysis row with the same cache_key, so every worker benefits from
+    results already stored in the database.
+
+    get()/put() cache whole results; get_features()/put_features() cache
+    each feature separately, so a request for more features than a previous
+    one only has to fetch the missing ones.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.db_max_age = 0
+        self._memory = TTLCache()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self.reset_stats()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RESULT_CACHE_ENABLED', True)
+        self.db_max_age = app.config.get('RESULT_CACHE_DB_MAX_AGE_SECONDS', 0)
+        self._memory = TTLCache(
+            max_entries=app.config.get('RESULT_CACHE_MAX_ENTRIES', 1024),
+            ttl=app.config.get('RESULT_CACHE_TTL_SECONDS', 3600),
+        )
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {'memory_hits': 0, 'db_hits': 0, 'partial_hits': 0, 'misses': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['memory_entries'] = len(self._memory)
+        return stats
+
+    def get(self, key):
+        """Returns the cached data payload for `key`, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        data = self._memory.get(key)
+        if data is not None:
+            self._count('memory_hits')
+            return data
+
+        data = self._lookup_db(key)
+        if data is not None:
+            self._memory.set(key, data)
+            self._count('db_hits')
+            return data
+
+        self._count('misses')
+        return None
+
+    def put(self, key, data):
+        if self.enabled:
+            self._memory.set(key, data)
+
+    def get_features(self, key, features=FEATURES, keyword_limit=DEFAULT_KEYWORD_LIMIT):
+        """
+        Returns (data, missing): the cached parts of the result for `key`
+        and the requested features that still have to be fetched.
+        """
+        if not self.enabled:
+            return {}, list(features)
+
+        data = {}
+        for feature in features:
+            part = self._memory.get(f"{key}|{feature_part(feature, keyword_limit)}")
+            if part is not None:
+                data[FEATURE_DATA_KEYS[feature]] = part
+        missing = missing_features(data, features)
+        if not missing:
+            self._count('memory_hits')
+            return data, missing
+
+        found = self._lookup_db_features(key, missing, keyword_limit, self.db_max_age) if self.db_max_age else {}
+        if found:
+            self.put_features(key, found, keyword_limit)
+            data.update(found)
+            missing = missing_features(data, features)
+
+        if not missing:
+            self._count('db_hits')
+        elif data:
+            self._count('partial_hits')
+        else:
+            self._count('misses')
+        return data, missing
+
+    def put_features(self, key, data, keyword_limit=DEFAULT_KEYWORD_LIMIT):
+        if not self.enabled:
+            return
+        for feature in FEATURES:
+            value = data.get(FEATURE_DATA_KEYS[feature])
+            if value is not None:
+                self._memory.set(f"{key}|{feature_part(feature, keyword_limit)}", value)
+
+    def get_stale_features(self, key, features, keyword_limit=DEFAULT_KEYWORD_LIMIT):
+        """
+        The requested features from stored results of any age: a last resort
+        while the engine is unavailable. Returns (data, missing).
+        """
+        if not self.enabled:
+            return {}, list(features)
+        data = self._lookup_db_features(key, features, keyword_limit, max_age=None)
+        return data, missing_features(data, features)
+
+    def _recent_rows(self, key, limit, max_age):
+        from .. import db
+        from ..models import Analysis
+
+        query = Analysis.query.filter(Analysis.cache_key == key)
+        if max_age is not None:
+            # created_at is stored as naive UTC
+            oldest = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=max_age)
+            query = query.filter(Analysis.created_at >= oldest)
+        try:
+            with timed('result_cache_db'):
+                return query.order_by(Analysis.created_at.desc()).limit(limit).all()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Database Error: Could not look up cached analysis. {e}")
+            return []
+
+    def _lookup_db(self, key):
+        if not self.db_max_age:
+            return None
+        rows = self._recent_rows(key, 1, self.db_max_age)
+        return result_from_analysis(rows[0]) if rows else None
+
+    def _lookup_db_features(self, key, features, keyword_limit, max_age):
+        """Each feature from the newest row that has it (at most `max_age` seconds old, if given)."""
+        data = {}
+        for analysis in self._recent_rows(key, 10, max_age):
+            for name, value in result_from_analysis(analysis, missing_features(data, features), keyword_limit).items():
+                data[name] = value
+            if not missing_features(data, features):
+                break
+        return data
+
+
+result_cache = ResultCache()
@@ -0,0 +1,49 @@
+# api/services/compression.py
+import gzip
+from flask import request
+
+# Text responses worth compressing; streams (export, job events) are left alone
+COMPRESSIBLE_MIMETYPES = frozenset({'application/json', 'application/x-ndjson', 'text/csv', 'text/plain'})
+
+
+class ResponseCompression:
+    """
+    Gzips responses of at least GZIP_MIN_BYTES when the client accepts it.
+    The ETag of a compressed response is made weak, since the bytes differ
+    from the uncompressed representation.
+    """
+
+    def __init__(self):
+        self.min_bytes = 1024
+        self.level = 6
+
+    def init_app(self, app):
+        if not app.config.get('GZIP_ENABLED', True):
+            return
+        self.min_bytes = app.config.get('GZIP_MIN_BYTES', 1024)
+        self.level = app.config.get('GZIP_LEVEL', 6)
+        app.after_request(self._compress)
+
+    def _compress(self, response):
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES or response.direct_passthrough
+                or response.is_streamed or 'Content-Encoding' in response.headers
+                or response.status_code < 200 or response.status_code in (204, 304)):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if not request.accept_encodings['gzip']:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return response
+
+        # mtime=0 keeps the output identical for identical bodies
+        response.set_data(gzip.compress(data, compresslevel=self.level, mtime=0))
+        response.headers['Content-Encoding'] = 'gzip'
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+response_compression = ResponseCompression()
@@ -0,0 +1,253 @@
+# api/services/concurrency.py
+"""
+Admission control for outbound engine calls.
+
+    Per worker: at most OUTBOUND_MAX_CONCURRENCY Watson calls at a time. Up to
+                OUTBOUND_MAX_QUEUE more may wait for a slot, each for no longer
+                than OUTBOUND_QUEUE_TIMEOUT_SECONDS or the request's deadline.
+    Per host:   OUTBOUND_HOST_CONCURRENCY slots shared by every worker, one
+                flock()ed file each in OUTBOUND_SLOT_DIR (0 disables them;
+                so does a platform without fcntl, such as Windows).
+
+A call that can't get a slot in time is shed (Overloaded): the request is
+answered at once with 503 and a Retry-After estimated from the queue length
+and the recent call duration, instead of queueing behind work Watson can't
+take anyway.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge
+from .resilience import current_deadline
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock(), so no host-wide slots
+    fcntl = None
+
+# How often a worker retries the host-wide slot files while waiting
+HOST_POLL_SECONDS = 0.01
+# Weight of the latest call in the average call duration
+DURATION_SMOOTHING = 0.2
+
+QUEUE_DEPTH = Gauge(
+    'sentiment_outbound_queue_depth',
+    'Calls waiting for an outbound concurrency slot.',
+    ['name'],
+    multiprocess_mode='livesum',
+)
+IN_FLIGHT = Gauge(
+    'sentiment_outbound_in_flight',
+    'Outbound calls holding a concurrency slot.',
+    ['name'],
+    multiprocess_mode='livesum',
+)
+SHED = Counter(
+    'sentiment_outbound_shed_total',
+    'Outbound calls rejected by admission control.',
+    ['name', 'reason'],
+)
+
+
+class Overloaded(Exception):
+    """No concurrency slot could be had in time; retry after `retry_after` seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Outbound concurrency limit reached ({reason}).")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """Bounded slots for outbound calls, with a bounded, deadline-aware wait queue."""
+
+    def __init__(self, name, max_concurrency=8, max_queue=16, queue_timeout=5.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.host_slots = 0
+        self.slot_dir = None
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        # Average seconds a slot is held; None until the first call finishes
+        self._avg_seconds = None
+        self._stats = {'admitted': 0, 'queued': 0, 'shed': 0}
+        # Host slots: file descriptors of this process and the slots it holds
+        self._host_lock = threading.Lock()
+        self._slot_fds = None
+        self._held = set()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def init_app(self, app):
+        self.max_concurrency = app.config.get('OUTBOUND_MAX_CONCURRENCY', 8)
+        self.max_queue = app.config.get('OUTBOUND_MAX_QUEUE', 16)
+        self.queue_timeout = app.config.get('OUTBOUND_QUEUE_TIMEOUT_SECONDS', 5.0)
+        self.host_slots = app.config.get('OUTBOUND_HOST_CONCURRENCY', 0)
+        if self.host_slots and fcntl is None:
+            app.logger.warning('Host-wide outbound slots need fcntl; only the per-worker limit applies.')
+            self.host_slots = 0
+        self.slot_dir = app.config.get('OUTBOUND_SLOT_DIR')
+        self.reset()
+
+    def _after_fork(self):
+        # Locks held by other threads at fork time would never be released, and
+        # flock()s belong to the parent's open files
+        self._cond = threading.Condition()
+        self._host_lock = threading.Lock()
+        self._active = self._waiting = 0
+        for fd in self._slot_fds or ():
+            os.close(fd)
+        self._slot_fds = None
+        self._held = set()
+
+    def reset(self):
+        with self._cond:
+            self._avg_seconds = None
+            self._stats = dict.fromkeys(self._stats, 0)
+        with self._host_lock:
+            self._close_slot_files()
+
+    # --- Per-worker slots ---
+
+    def _expected_wait(self, position):
+        """Seconds until the `position`-th caller in line gets a slot (0 if unknown)."""
+        if not self._avg_seconds:
+            return 0.0
+        return self._avg_seconds * math.ceil(position / self.max_concurrency)
+
+    def _retry_after(self):
+        return max(1, math.ceil(self._expected_wait(self._waiting + 1) or self.queue_timeout))
+
+    def _shed(self, reason):
+        self._stats['shed'] += 1
+        SHED.labels(self.name, reason).inc()
+        return Overloaded(reason, self._retry_after())
+
+    def acquire(self):
+        """
+        Takes a slot, waiting in line if needed; raises Overloaded when the
+        queue is full or the wait would outlast the deadline. Returns the time
+        limit the wait had, for the host-wide slot.
+        """
+        deadline = time.monotonic() + self.queue_timeout
+        request_deadline = current_deadline()
+        if request_deadline is not None:
+            deadline = min(deadline, request_deadline)
+
+        with self._cond:
+            if self._active >= self.max_concurrency:
+                if self._waiting >= self.max_queue:
+                    raise self._shed('queue_full')
+                if self._expected_wait(self._waiting + 1) > deadline - time.monotonic():
+                    raise self._shed('deadline')
+                self._waiting += 1
+                self._stats['queued'] += 1
+                QUEUE_DEPTH.labels(self.name).inc()
+                try:
+                    while self._active >= self.max_concurrency:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._shed('timeout')
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    QUEUE_DEPTH.labels(self.name).dec()
+            self._active += 1
+            self._stats['admitted'] += 1
+            IN_FLIGHT.labels(self.name).inc()
+        return deadline
+
+    def release(self, elapsed=None):
+        with self._cond:
+            self._active -= 1
+            IN_FLIGHT.labels(self.name).dec()
+            if elapsed is not None:
+                if self._avg_seconds is None:
+                    self._avg_seconds = elapsed
+                else:
+                    self._avg_seconds += DURATION_SMOOTHING * (elapsed - self._avg_seconds)
+            self._cond.notify()
+
+    # --- Host-wide slots ---
+
+    def _open_slot_files(self):
+        if self._slot_fds is None:
+            os.makedirs(self.slot_dir, exist_ok=True)
+            self._slot_fds = [
+                os.open(os.path.join(self.slot_dir, f'{self.name}-{index}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+                for index in range(self.host_slots)
+            ]
+            self._held = set()
+        return self._slot_fds
+
+    def _close_slot_files(self):
+        for fd in self._slot_fds or ():
+            os.close(fd)
+        self._slot_fds = None
+        self._held = set()
+
+    def _try_host_slot(self):
+        with self._host_lock:
+            for index, fd in enumerate(self._open_slot_files()):
+                # flock() doesn't exclude threads sharing the descriptor
+                if index in self._held:
+                    continue
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held.add(index)
+                return index
+        return None
+
+    def _acquire_host_slot(self, deadline):
+        while True:
+            index = self._try_host_slot()
+            if index is not None:
+                return index
+            if time.monotonic() >= deadline:
+                with self._cond:
+                    raise self._shed('host_busy')
+            time.sleep(HOST_POLL_SECONDS)
+
+    def _release_host_slot(self, index):
+        with self._host_lock:
+            fcntl.flock(self._slot_fds[index], fcntl.LOCK_UN)
+            self._held.discard(index)
+
+    @contextmanager
+    def slot(self):
+        """Holds a worker slot (and a host slot, if configured) for the block."""
+        deadline = self.acquire()
+        host_slot = None
+        if self.host_slots and self.slot_dir:
+            try:
+                host_slot = self._acquire_host_slot(deadline)
+            except Overloaded:
+                self.release()
+                raise
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            if host_slot is not None:
+                self._release_host_slot(host_slot)
+            self.release(time.monotonic() - started)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(
+                in_flight=self._active, queue_depth=self._waiting, max_concurrency=self.max_concurrency,
+                max_queue=self.max_queue, host_slots=self.host_slots,
+                avg_call_seconds=round(self._avg_seconds, 4) if self._avg_seconds is not None else None,
+            )
+            return stats
+
+
+watson_limiter = ConcurrencyLimiter('watson')
@@ -0,0 +1,126 @@
+# api/services/database.py
+"""
+Engine, pool and read-replica setup for the database layer.
+
+    Engines:   pool sizes, pre-ping, recycling and (PostgreSQL) TLS and TCP
+               keepalive settings come from the DB_* config values. Pools
+               are per worker, so workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+               has to fit in the server's max_connections.
+    Forks:     connections opened before a fork (gunicorn --preload) are
+               dropped in the child without being closed, so parent and
+               workers never share a socket.
+    Replica:   with DATABASE_REPLICA_URL set, queries run inside
+               `replica_reads()` go to the replica. Flushes and INSERT,
+               UPDATE and DELETE statements always go to the primary, and so
+               does everything when no replica is configured. Replica reads
+               can lag behind the primary.
+"""
+import os
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+REPLICA_EXTENSION = 'sqlalchemy_replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+_engines = weakref.WeakSet()
+
+
+def engine_options(config, url):
+    """SQLAlchemy create_engine() options for `url`, from the DB_* config values."""
+    options = {
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        'pool_recycle': config.get('DB_POOL_RECYCLE_SECONDS', 1800),
+    }
+    backend = make_url(url).get_backend_name()
+    if backend == 'sqlite':
+        # SQLite pools don't take sizes, and in-memory databases use a single connection
+        return options
+
+    options.update(
+        pool_size=config.get('DB_POOL_SIZE', 5),
+        max_overflow=config.get('DB_MAX_OVERFLOW', 5),
+        pool_timeout=config.get('DB_POOL_TIMEOUT', 10),
+    )
+    if backend == 'postgresql':
+        connect_args = {
+            'connect_timeout': config.get('DB_CONNECT_TIMEOUT', 10),
+            # Keepalives let idle pooled connections (and their TLS sessions) survive NATs and proxies
+            'keepalives': 1,
+            'keepalives_idle': config.get('DB_TCP_KEEPALIVES_IDLE', 60),
+        }
+        if config.get('DATABASE_SSLMODE') and 'sslmode' not in make_url(url).query:
+            connect_args['sslmode'] = config['DATABASE_SSLMODE']
+        options['connect_args'] = connect_args
+    return options
+
+
+def configure_database(app):
+    """
+    Sets SQLALCHEMY_DATABASE_URI (from DATABASE_URL unless the config class
+    pins one) and the engine options, unless the config class sets them.
+    """
+    config = app.config
+    if not config.get('SQLALCHEMY_DATABASE_URI'):
+        config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
+    config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(config, config['SQLALCHEMY_DATABASE_URI']))
+
+
+def init_engines(app, db):
+    """
+    Creates the replica engine, if DATABASE_REPLICA_URL is set, and remembers
+    the app's engines so forked children drop their pooled connections.
+    """
+    replica_url = app.config.get('DATABASE_REPLICA_URL')
+    # Not a Flask-SQLAlchemy bind: binds are for tables that live elsewhere,
+    # while the replica holds the same tables as the primary
+    replica = create_engine(replica_url, **engine_options(app.config, replica_url)) if replica_url else None
+    app.extensions[REPLICA_EXTENSION] = replica
+
+    with app.app_context():
+        engines = [*db.engines.values(), replica]
+    for engine in engines:
+        if engine is not None:
+            _engines.add(engine)
+
+
+def get_replica_engine():
+    """The current app's replica engine, or None."""
+    return current_app.extensions.get(REPLICA_EXTENSION)
+
+
+def _dispose_after_fork():
+    for engine in list(_engines):
+        # close=False: the sockets belong to the parent, which keeps using them
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_after_fork)
+
+
+@contextmanager
+def replica_reads():
+    """Sends the queries run inside the block to the read replica, if one is configured."""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class RoutingSession(Session):
+    """db.session class that sends reads inside `replica_reads()` to the replica engine."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _use_replica.get() and not self._flushing \
+                and not getattr(clause, 'is_dml', False):
+            replica = get_replica_engine()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
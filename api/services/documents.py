@@ -0,0 +1,139 @@
+# api/services/documents.py
+import re
+from .backends import analyze_texts
+
+EMOTIONS = ('joy', 'sadness', 'fear', 'disgust', 'anger')
+# |score| below this is reported as neutral, as the lexicon backend does
+NEUTRAL_THRESHOLD = 0.05
+
+# A sentence ends at ., ! or ? (plus closing quotes/brackets) followed by
+# whitespace, or at a blank line.
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n\s*\n')
+
+
+def split_sentences(text):
+    """Returns (start, end) offsets of the sentences of `text`, whitespace excluded."""
+    spans = []
+    start = 0
+    for match in SENTENCE_END_RE.finditer(text):
+        end = match.start() + len(match.group().rstrip())
+        if text[start:end].strip():
+            spans.append((start, end))
+        start = match.end()
+    if text[start:].strip():
+        spans.append((start, len(text.rstrip())))
+    return spans
+
+
+def _split_long_span(text, start, end, max_chars):
+    """Cuts a sentence longer than max_chars at whitespace (or anywhere, for a huge word)."""
+    while end - start > max_chars:
+        cut = text.rfind(' ', start + 1, start + max_chars + 1)
+        if cut <= start:
+            cut = start + max_chars
+        yield start, cut
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if start < end:
+        yield start, end
+
+
+def chunk_text(text, max_chars):
+    """
+    Packs whole sentences into chunks of at most `max_chars` characters.
+    Returns (start, end) offsets into `text`.
+    """
+    chunks = []
+    current = None
+    for sentence_start, sentence_end in split_sentences(text):
+        for start, end in _split_long_span(text, sentence_start, sentence_end, max_chars):
+            if current is not None and end - current[0] <= max_chars:
+                current = (current[0], end)
+            else:
+                if current is not None:
+                    chunks.append(current)
+                current = (start, end)
+    if current is not None:
+        chunks.append(current)
+    return chunks
+
+
+def _label(score):
+    if score > NEUTRAL_THRESHOLD:
+        return 'positive'
+    if score < -NEUTRAL_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+
+def merge_results(weights, results, keyword_limit=10):
+    """
+    Merges per-chunk analysis data into one document-level result. Sentiment
+    and emotions are averages weighted by chunk length; a keyword's relevance
+    is its length-weighted relevance over the whole document, so terms found
+    in many chunks rank above terms found in one.
+    """
+    total = float(sum(weights)) or 1.0
+
+    score = sum(weight * (data.get("sentiment") or {}).get("score", 0.0) for weight, data in zip(weights, results))
+    score = round(score / total, 6)
+
+    emotions = {}
+    for emotion in EMOTIONS:
+        weighted = [
+            (weight, data["emotions"][emotion])
+            for weight, data in zip(weights, results)
+            if (data.get("emotions") or {}).get(emotion) is not None
+        ]
+        if weighted:
+            emotions[emotion] = round(sum(w * v for w, v in weighted) / sum(w for w, _ in weighted), 6)
+
+    keywords = {}
+    for weight, data in zip(weights, results):
+        for keyword in data.get("keywords") or []:
+            text = keyword.get("text")
+            if not text:
+                continue
+            merged = keywords.setdefault(text.lower(), {"text": text, "relevance": 0.0, "count": 0})
+            merged["relevance"] += weight * keyword.get("relevance", 0.0) / total
+            merged["count"] += keyword.get("count", 1)
+    ranked = sorted(keywords.values(), key=lambda keyword: (-keyword["relevance"], -keyword["count"]))
+    for keyword in ranked:
+        keyword["relevance"] = round(keyword["relevance"], 6)
+
+    return {
+        "sentiment": {"label": _label(score), "score": score},
+        "emotions": emotions,
+        "keywords": ranked[:keyword_limit],
+    }
+
+
+def analyze_document(text, chunk_chars, keyword_limit=10):
+    """
+    Analyzes a long text as sentence-aligned chunks, in parallel through the
+    configured backend, and merges them. Returns {"data": ..., "chunks": [...],
+    "status": 200}, or the first chunk error ({"error": ..., "status": code}).
+    If any chunk was answered by the fallback backend, the result carries
+    that chunk's "degraded" entry.
+    """
+    spans = chunk_text(text, chunk_chars)
+    if not spans:
+        return {"error": "The text has nothing to analyze.", "status": 400}
+
+    results = analyze_texts([text[start:end] for start, end in spans])
+    for result in results:
+        if "error" in result:
+            return result
+
+    weights = [end - start for start, end in spans]
+    chunk_data = [result.get("data") or {} for result in results]
+    chunks = [
+        {"index": index, "start": start, "end": end, **data}
+        for index, ((start, end), data) in enumerate(zip(spans, chunk_data))
+    ]
+    document = {"data": merge_results(weights, chunk_data, keyword_limit), "chunks": chunks, "status": 200}
+    degraded = next((result["degraded"] for result in results if "degraded" in result), None)
+    if degraded is not None:
+        document["degraded"] = degraded
+    return document
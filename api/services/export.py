@@ -0,0 +1,114 @@
+# api/services/export.py
+import csv
+import io
+import json
+from contextlib import nullcontext
+from sqlalchemy import select
+from .database import replica_reads
+from .storage import EMOTION_NAMES, decompress_text, unpack_emotions
+
+CSV_COLUMNS = (
+    'id', 'created_at', 'sentiment_label', 'sentiment_score',
+    'joy', 'sadness', 'fear', 'disgust', 'anger', 'keywords', 'text_content',
+)
+
+
+class ExportedRow:
+    """A lightweight analysis row that reads text_content and the emotions like Analysis does."""
+    __slots__ = ('row',)
+
+    def __init__(self, row):
+        self.row = row
+
+    def __getattr__(self, name):
+        return getattr(self.row, name)
+
+    @property
+    def text_content(self):
+        if self.row.text_body is not None:
+            return decompress_text(self.row.text_body, self.row.text_compressed)
+        return self.row.legacy_text
+
+    @property
+    def emotions(self):
+        if self.row.emotion_scores is not None:
+            return unpack_emotions(self.row.emotion_scores)
+        if self.row.legacy_emotion_joy is not None:
+            return {name: getattr(self.row, f'legacy_emotion_{name}') for name in EMOTION_NAMES}
+        return None
+
+
+def iter_analysis_rows(condition, batch_size, replica=False):
+    """
+    Yields the analyses matching `condition` oldest first as lightweight rows
+    (not ORM objects), fetching `batch_size` at a time through a server-side
+    cursor. With `replica`, they are read from the read replica, if any.
+    """
+    from .. import db
+    from ..models import Analysis, AnalysisText
+
+    columns = [column.label(key) for key, column in Analysis.__mapper__.columns.items()]
+    stmt = (
+        select(*columns, AnalysisText.body.label('text_body'), AnalysisText.compressed.label('text_compressed'))
+        .outerjoin(AnalysisText, AnalysisText.id == Analysis.text_id)
+        .where(condition)
+        .order_by(Analysis.created_at, Analysis.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    # The connection is chosen when the statement runs; the rows then stream from it
+    with replica_reads() if replica else nullcontext():
+        result = db.session.execute(stmt)
+    try:
+        for row in result:
+            yield ExportedRow(row)
+    finally:
+        result.close()
+
+
+def iter_session_rows(session_id, batch_size):
+    """Yields the session's analyses oldest first (see iter_analysis_rows)."""
+    from ..models import Analysis
+
+    return iter_analysis_rows(Analysis.session_id == session_id, batch_size, replica=True)
+
+
+def generate_ndjson(session_id, batch_size):
+    """One JSON document per line, in the same shape as Analysis.to_dict."""
+    from ..models import ANALYSIS_FIELDS
+
+    for row in iter_session_rows(session_id, batch_size):
+        record = {name: serialize(row) for name, (serialize, _) in ANALYSIS_FIELDS.items()}
+        yield json.dumps(record) + '\n'
+
+
+def generate_csv(session_id, batch_size):
+    """CSV with a header row; keywords are embedded as a JSON string."""
+    from ..models import ANALYSIS_FIELDS
+
+    serialize_created_at = ANALYSIS_FIELDS['created_at'][0]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for row in iter_session_rows(session_id, batch_size):
+        emotions = row.emotions or dict.fromkeys(EMOTION_NAMES)
+        writer.writerow((
+            row.id, serialize_created_at(row), row.sentiment_label, row.sentiment_score,
+            *(emotions[name] for name in EMOTION_NAMES),
+            json.dumps(row.keywords), row.text_content,
+        ))
+        yield flush()
+
+
+# format -> (generator, mimetype)
+EXPORT_FORMATS = {
+    'ndjson': (generate_ndjson, 'application/x-ndjson'),
+    'csv': (generate_csv, 'text/csv'),
+}
@@ -0,0 +1,108 @@
+# api/services/history.py
+import base64
+import hashlib
+from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload, load_only
+
+
+def encode_cursor(created_at, analysis_id):
+    """Opaque keyset cursor pointing just after (created_at, id)."""
+    raw = f"{created_at.isoformat()}|{analysis_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (created_at, id) from a cursor; raises ValueError if it's malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, analysis_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+def parse_fields(raw):
+    """Parses ?fields=a,b into a tuple of field names (None means all fields)."""
+    from ..models import ANALYSIS_FIELDS
+
+    if not raw:
+        return None
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in ANALYSIS_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(ANALYSIS_FIELDS)}.")
+    return fields
+
+
+def page_keys(query, limit, cursor=None):
+    """
+    Runs the keyset part of a page: only (id, created_at) of up to `limit`
+    rows, newest first, after `cursor`. For a session this is answered from
+    ix_analyses_session_created_id alone.
+
+    One ordered query. The cursor's created_at is also given as a plain
+    bound, which PostgreSQL can prune monthly partitions with (it can't with
+    the row comparison); it reads the remaining partitions newest first and
+    stops once it has `limit` rows.
+    """
+    from ..models import Analysis
+
+    query = query.with_entities(Analysis.id, Analysis.created_at)
+    if cursor is not None:
+        query = query.filter(Analysis.created_at <= cursor[0],
+                             tuple_(Analysis.created_at, Analysis.id) < tuple_(*cursor))
+    return query.order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(limit).all()
+
+
+def load_page(keys, fields=None):
+    """
+    Encodes the rows for `keys` (see serialization.array_response). Rows in
+    the analysis memo for these `fields` aren't read again; the others are
+    loaded (only the columns `fields` need), encoded and memoized.
+    """
+    from ..models import Analysis, ANALYSIS_FIELDS
+    from .serialization import analysis_memo, encode_item
+
+    if not keys:
+        return []
+
+    found = {}
+    if analysis_memo.enabled:
+        for key in keys:
+            encoded = analysis_memo.get(key, fields)
+            if encoded is not None:
+                found[key.id] = encoded
+    missing = [key for key in keys if key.id not in found]
+
+    if missing:
+        # The created_at bounds let a partitioned table skip partitions
+        query = Analysis.query.filter(
+            Analysis.id.in_([key.id for key in missing]),
+            Analysis.created_at.between(min(key.created_at for key in missing),
+                                        max(key.created_at for key in missing)),
+        )
+        columns = {column for name in (fields or ANALYSIS_FIELDS) for column in ANALYSIS_FIELDS[name][1]}
+        if fields is not None:
+            query = query.options(load_only(*(getattr(Analysis, column) for column in columns if column != 'text')))
+        if 'text' in columns:
+            # Texts come with the rows, in the same query
+            query = query.options(joinedload(Analysis.text))
+
+        for analysis in query:
+            found[analysis.id] = encode_item(analysis.to_dict(fields))
+            analysis_memo.put(analysis, fields, found[analysis.id])
+
+    return [found[key.id] for key in keys if key.id in found]
+
+
+def page_etag(*parts, keys):
+    """
+    ETag of a page. Analyses are never modified once written, so the
+    identities of the rows on the page (plus the request parameters) are
+    enough to tell whether the response changed.
+    """
+    digest = hashlib.sha1(repr(parts).encode('utf-8'))
+    for key in keys:
+        digest.update(f"{key.id}:{key.created_at.isoformat()};".encode('utf-8'))
+    return digest.hexdigest()
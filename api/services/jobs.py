@@ -0,0 +1,268 @@
+# api/services/jobs.py
+import threading
+from abc import ABC, abstractmethod
+import time
+import uuid
+from datetime import datetime, timezone
+from .cache import DEFAULT_KEYWORD_LIMIT, FEATURES, result_cache, select_features
+from .pools import get_executor
+from .usage import usage_counter
+from .persistence import save_analyses
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+# What a job left queued or running by a dead worker is reported as
+STALE_JOB_FIELDS = {'status': JOB_FAILED, 'status_code': 500, 'error': "The job did not finish in time."}
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class JobStore(ABC):
+    """
+    Interface for storing the state of asynchronous analysis jobs. Jobs still
+    queued or running `ttl` seconds after their last update belong to a
+    worker that died, and are reported as failed.
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+
+    @abstractmethod
+    def create(self, session_id):
+        """Creates a queued job and returns its dictionary representation."""
+
+    @abstractmethod
+    def get(self, job_id):
+        """Returns the job as a dictionary, or None if it doesn't exist."""
+
+    @abstractmethod
+    def update(self, job_id, **fields):
+        """Sets `fields` on the job and bumps its updated_at."""
+
+    def _expired(self, updated_at, now):
+        # The database store reads back naive UTC datetimes
+        return (now - updated_at.replace(tzinfo=timezone.utc)).total_seconds() > self.ttl
+
+
+class MemoryJobStore(JobStore):
+    """
+    Keeps jobs in a dictionary of this process. Only suitable for a single
+    worker (and for tests); finished jobs are pruned after `ttl` seconds.
+    """
+
+    def __init__(self, ttl=3600):
+        super().__init__(ttl)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, session_id):
+        now = _now()
+        job = {
+            'id': uuid.uuid4().hex,
+            'session_id': session_id,
+            'status': JOB_QUEUED,
+            'status_code': None,
+            'result': None,
+            'error': None,
+            'analysis_id': None,
+            'created_at': now,
+            'updated_at': now,
+        }
+        with self._lock:
+            self._prune(now)
+            self._jobs[job['id']] = job
+        return dict(job)
+
+    def get(self, job_id):
+        now = _now()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job['status'] not in FINISHED_STATES and self._expired(job['updated_at'], now):
+                job.update(STALE_JOB_FIELDS, updated_at=now)
+            return dict(job)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated_at=_now())
+
+    def _prune(self, now):
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['status'] in FINISHED_STATES and self._expired(job['updated_at'], now)
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class DatabaseJobStore(JobStore):
+    """Keeps jobs in the analysis_jobs table so every worker can serve them."""
+
+    def create(self, session_id):
+        from .. import db
+        from ..models import AnalysisJob
+
+        job = AnalysisJob(id=uuid.uuid4().hex, session_id=session_id, status=JOB_QUEUED)
+        db.session.add(job)
+        db.session.commit()
+        return job.to_dict()
+
+    def get(self, job_id):
+        from .. import db
+        from ..models import AnalysisJob
+
+        job = db.session.get(AnalysisJob, job_id)
+        if job is None:
+            return None
+        # Another worker may have updated the row since we last read it
+        db.session.refresh(job)
+        if job.status not in FINISHED_STATES and self._expired(job.updated_at, _now()):
+            # Only if no worker finished it in the meantime
+            db.session.query(AnalysisJob).filter(
+                AnalysisJob.id == job_id, AnalysisJob.status.notin_(FINISHED_STATES)
+            ).update({**STALE_JOB_FIELDS, 'updated_at': _now()}, synchronize_session=False)
+            db.session.commit()
+            db.session.refresh(job)
+        return job.to_dict()
+
+    def update(self, job_id, **fields):
+        from .. import db
+        from ..models import AnalysisJob
+
+        job = db.session.get(AnalysisJob, job_id)
+        if job is None:
+            return
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.updated_at = _now()
+        db.session.commit()
+
+
+class JobManager:
+    """Runs analysis jobs on an in-process thread pool and tracks them in a JobStore."""
+
+    def __init__(self):
+        self.store = MemoryJobStore()
+        self.max_workers = 4
+        self.event_streams = threading.BoundedSemaphore(4)
+
+    def init_app(self, app):
+        backend = app.config.get('JOB_STORE', 'memory')
+        ttl = app.config.get('JOB_TTL_SECONDS', 3600)
+        if backend == 'memory':
+            self.store = MemoryJobStore(ttl=ttl)
+        elif backend == 'database':
+            self.store = DatabaseJobStore(ttl=ttl)
+        else:
+            raise ValueError(f"Unknown JOB_STORE '{backend}'.")
+        self.max_workers = app.config.get('JOB_MAX_WORKERS', 4)
+        # Every open event stream holds a worker thread until it ends
+        self.event_streams = threading.BoundedSemaphore(app.config.get('JOB_EVENTS_MAX_STREAMS', 4))
+
+    def submit(self, app, session_id, text, cache_key, analyze, simhash=None, features=FEATURES,
+               keyword_limit=DEFAULT_KEYWORD_LIMIT, quota_day=None):
+        """
+        Queues `text` for analysis and returns the new job.
+        `analyze` is the function that calls the sentiment service; `quota_day`
+        is the day the daily quota was charged, refunded if the job fails.
+        """
+        job = self.store.create(session_id)
+        executor = get_executor('analysis-jobs', self.max_workers)
+        executor.submit(self._run, app, job['id'], session_id, text, cache_key, analyze, simhash, features,
+                        keyword_limit, quota_day)
+        return job
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _run(self, app, job_id, session_id, text, cache_key, analyze, simhash=None, features=FEATURES,
+             keyword_limit=DEFAULT_KEYWORD_LIMIT, quota_day=None):
+        from .. import db
+        from ..models import Analysis
+
+        with app.app_context():
+            try:
+                self.store.update(job_id, status=JOB_RUNNING)
+
+                degraded = None
+                data, missing = result_cache.get_features(cache_key, features, keyword_limit)
+                if missing:
+                    result = analyze(text, features=tuple(missing), keyword_limit=keyword_limit)
+                    if "error" in result:
+                        # Failed analyses don't count toward the daily limit
+                        usage_counter.release(session_id, day=quota_day)
+                        self.store.update(
+                            job_id,
+                            status=JOB_FAILED,
+                            status_code=result.get("status", 500),
+                            error=result["error"]
+                        )
+                        return
+                    if "degraded" in result:
+                        # Answered by the fallback backend: not cached, not reusable
+                        cache_key = simhash = None
+                        degraded = result["degraded"]
+                    else:
+                        result_cache.put_features(cache_key, result.get("data"), keyword_limit)
+                    data = select_features({**data, **result.get("data")}, features)
+
+                analysis_id = None
+                try:
+                    new_analysis = Analysis.from_result(
+                        session_id, text, data, cache_key=cache_key, simhash=simhash, keyword_limit=keyword_limit
+                    )
+                    # Written synchronously: the job reports the new row's id
+                    save_analyses([new_analysis])
+                    analysis_id = new_analysis.id
+                except Exception as e:
+                    # As in the synchronous route, a failed save doesn't fail the analysis.
+                    print(f"Database Error: Could not save analysis. {e}")
+
+                self.store.update(
+                    job_id,
+                    status=JOB_SUCCEEDED,
+                    status_code=200,
+                    # Shaped like the synchronous response body
+                    result=data if degraded is None else {**data, "meta": {"degraded": degraded}},
+                    analysis_id=analysis_id
+                )
+            except Exception as e:
+                db.session.rollback()
+                print(f"Job Error: analysis job {job_id} failed. {e}")
+                usage_counter.release(session_id, day=quota_day)
+                self.store.update(job_id, status=JOB_FAILED, status_code=500, error="An unexpected error occurred.")
+
+
+def job_to_response(job):
+    """Public representation of a job (without the owning session)."""
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_code': job['status_code'],
+        'result': job['result'],
+        'error': job['error'],
+        'analysis_id': job['analysis_id'],
+        'created_at': job['created_at'].replace(tzinfo=timezone.utc).isoformat(),
+        'updated_at': job['updated_at'].replace(tzinfo=timezone.utc).isoformat(),
+    }
+
+
+def wait_for_change(store, job_id, last_status, timeout, poll_interval):
+    """Polls the store until the job leaves `last_status` or `timeout` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = store.get(job_id)
+        if job is None or job['status'] != last_status or time.monotonic() >= deadline:
+            return job
+        time.sleep(poll_interval)
+
+
+job_manager = JobManager()
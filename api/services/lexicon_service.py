@@ -0,0 +1,222 @@
+# api/services/lexicon_service.py
+import re
+import numpy as np
+from .backends import SentimentBackend
+from .cache import FEATURE_DATA_KEYS, FEATURES
+
+# Columns of the lexicon matrix
+VALENCE, JOY, SADNESS, FEAR, DISGUST, ANGER = range(6)
+EMOTIONS = ('joy', 'sadness', 'fear', 'disgust', 'anger')
+
+# word: (valence, joy, sadness, fear, disgust, anger)
+LEXICON = {
+    'good': (1.9, 0.5, 0, 0, 0, 0),
+    'great': (3.1, 0.7, 0, 0, 0, 0),
+    'excellent': (3.2, 0.7, 0, 0, 0, 0),
+    'amazing': (2.8, 0.8, 0, 0, 0, 0),
+    'awesome': (3.1, 0.8, 0, 0, 0, 0),
+    'fantastic': (2.6, 0.8, 0, 0, 0, 0),
+    'wonderful': (2.7, 0.8, 0, 0, 0, 0),
+    'perfect': (2.7, 0.6, 0, 0, 0, 0),
+    'nice': (1.8, 0.4, 0, 0, 0, 0),
+    'best': (3.2, 0.6, 0, 0, 0, 0),
+    'better': (1.9, 0.3, 0, 0, 0, 0),
+    'love': (3.2, 0.9, 0, 0, 0, 0),
+    'loved': (2.9, 0.9, 0, 0, 0, 0),
+    'like': (1.5, 0.3, 0, 0, 0, 0),
+    'enjoy': (2.2, 0.7, 0, 0, 0, 0),
+    'enjoyed': (2.3, 0.7, 0, 0, 0, 0),
+    'happy': (2.7, 1.0, 0, 0, 0, 0),
+    'glad': (2.0, 0.8, 0, 0, 0, 0),
+    'delighted': (2.9, 1.0, 0, 0, 0, 0),
+    'excited': (2.2, 0.9, 0, 0.1, 0, 0),
+    'pleased': (2.3, 0.8, 0, 0, 0, 0),
+    'beautiful': (2.9, 0.7, 0, 0, 0, 0),
+    'fun': (2.3, 0.9, 0, 0, 0, 0),
+    'recommend': (1.5, 0.4, 0, 0, 0, 0),
+    'thanks': (1.9, 0.6, 0, 0, 0, 0),
+    'thank': (1.5, 0.6, 0, 0, 0, 0),
+    'helpful': (1.8, 0.5, 0, 0, 0, 0),
+    'easy': (1.9, 0.4, 0, 0, 0, 0),
+    'fast': (1.2, 0.3, 0, 0, 0, 0),
+    'friendly': (2.2, 0.6, 0, 0, 0, 0),
+    'win': (2.8, 0.8, 0, 0, 0, 0),
+    'success': (2.7, 0.8, 0, 0, 0, 0),
+    'hope': (1.9, 0.5, 0, 0.1, 0, 0),
+    'calm': (1.3, 0.4, 0, 0, 0, 0),
+    'bad': (-2.5, 0, 0.5, 0, 0.2, 0.2),
+    'terrible': (-2.1, 0, 0.5, 0.2, 0.4, 0.3),
+    'awful': (-2.0, 0, 0.5, 0.1, 0.6, 0.3),
+    'horrible': (-2.5, 0, 0.4, 0.4, 0.6, 0.3),
+    'worst': (-3.1, 0, 0.5, 0, 0.5, 0.4),
+    'worse': (-2.1, 0, 0.5, 0, 0.2, 0.2),
+    'poor': (-2.1, 0, 0.6, 0, 0.2, 0.1),
+    'hate': (-2.7, 0, 0.2, 0, 0.6, 0.9),
+    'hated': (-3.2, 0, 0.2, 0, 0.6, 0.9),
+    'dislike': (-1.6, 0, 0.2, 0, 0.5, 0.3),
+    'angry': (-2.3, 0, 0.1, 0, 0.2, 1.0),
+    'furious': (-2.7, 0, 0, 0, 0.2, 1.0),
+    'annoyed': (-1.6, 0, 0.1, 0, 0.3, 0.7),
+    'annoying': (-1.7, 0, 0.1, 0, 0.4, 0.6),
+    'rude': (-2.0, 0, 0.1, 0, 0.5, 0.7),
+    'sad': (-2.1, 0, 1.0, 0, 0, 0),
+    'unhappy': (-1.8, 0, 0.9, 0, 0, 0.2),
+    'disappointed': (-1.9, 0, 0.8, 0, 0.2, 0.3),
+    'disappointing': (-2.2, 0, 0.7, 0, 0.3, 0.2),
+    'sorry': (-0.3, 0, 0.6, 0, 0, 0),
+    'cry': (-2.1, 0, 1.0, 0.1, 0, 0),
+    'lonely': (-1.5, 0, 0.9, 0.2, 0, 0),
+    'miss': (-0.6, 0, 0.6, 0, 0, 0),
+    'lost': (-1.3, 0, 0.6, 0.2, 0, 0),
+    'broken': (-1.6, 0, 0.5, 0, 0.2, 0.3),
+    'fail': (-2.5, 0, 0.6, 0.2, 0.1, 0.2),
+    'failed': (-2.3, 0, 0.6, 0.2, 0.1, 0.2),
+    'afraid': (-1.9, 0, 0.2, 1.0, 0, 0),
+    'scared': (-1.9, 0, 0.2, 1.0, 0, 0),
+    'fear': (-2.2, 0, 0.2, 1.0, 0, 0),
+    'worried': (-1.2, 0, 0.3, 0.8, 0, 0),
+    'anxious': (-1.0, 0, 0.3, 0.8, 0, 0),
+    'danger': (-2.4, 0, 0, 0.9, 0, 0),
+    'dangerous': (-2.1, 0, 0, 0.9, 0, 0),
+    'panic': (-1.9, 0, 0.1, 1.0, 0, 0),
+    'disgusting': (-2.4, 0, 0, 0, 1.0, 0.3),
+    'gross': (-2.1, 0, 0, 0, 0.9, 0.1),
+    'nasty': (-2.6, 0, 0, 0, 0.9, 0.3),
+    'dirty': (-1.9, 0, 0, 0, 0.8, 0),
+    'slow': (-0.9, 0, 0.2, 0, 0.1, 0.3),
+    'expensive': (-0.9, 0, 0.1, 0, 0, 0.2),
+    'useless': (-1.8, 0, 0.3, 0, 0.4, 0.4),
+    'problem': (-1.7, 0, 0.3, 0.2, 0, 0.2),
+    'problems': (-1.7, 0, 0.3, 0.2, 0, 0.2),
+    'wrong': (-2.1, 0, 0.3, 0, 0.1, 0.3),
+    'boring': (-1.3, 0, 0.4, 0, 0.2, 0),
+    'waste': (-1.8, 0, 0.2, 0, 0.5, 0.4),
+}
+
+NEGATORS = frozenset({'not', 'no', 'never', 'nothing', 'nobody', 'none', 'cannot', "don't", "doesn't",
+                      "didn't", "isn't", "wasn't", "aren't", "weren't", "won't", "can't", "couldn't"})
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by could did do does doing down during each few for from further had has have having he her here
+hers herself him himself his how i if in into is it its itself just me more most my myself of off on once
+only or other our ours ourselves out over own same she should so some such than that the their theirs them
+themselves then there these they this those through to too under until up very was we were what when where
+which while who whom why will with would you your yours yourself yourselves really also get got
+""".split()) | NEGATORS
+
+TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+_WORDS = list(LEXICON)
+_WORD_INDEX = {word: index for index, word in enumerate(_WORDS)}
+# One extra all-zero row for words that are not in the lexicon
+_MATRIX = np.vstack([np.array([LEXICON[word] for word in _WORDS], dtype=np.float64), np.zeros((1, 6))])
+_UNKNOWN = len(_WORDS)
+
+# Normalization constant for the valence sum (as in VADER): score = x / sqrt(x^2 + alpha)
+ALPHA = 15.0
+NEUTRAL_THRESHOLD = 0.05
+
+
+class LexiconBackend(SentimentBackend):
+    """
+    Local sentiment engine: scores sentiment, the five stored emotions and
+    keywords from a built-in lexicon. A whole batch of texts is scored in one
+    vectorized NumPy pass, with no network access, and results have the same
+    shape as the Watson backend's.
+    """
+    name = 'lexicon'
+    cache_namespace = 'lexicon-v1:sentiment,emotion,keywords:5'
+
+    def __init__(self, keyword_limit=5):
+        self.keyword_limit = keyword_limit
+
+    def analyze(self, text, features=FEATURES, keyword_limit=None):
+        return self.analyze_many([text], features, keyword_limit)[0]
+
+    def analyze_many(self, texts, features=FEATURES, keyword_limit=None):
+        """
+        Scores every feature (they come from the same pass), then returns only
+        the requested ones.
+        """
+        if not texts:
+            return []
+        keyword_limit = keyword_limit or self.keyword_limit
+
+        # --- Tokenize the batch into flat arrays ---
+        doc_ids, batch_ids, lex_ids, negated = [], [], [], []
+        batch_vocab = {}
+        for doc_id, text in enumerate(texts):
+            previous = None
+            for token in TOKEN_RE.findall(text.lower()):
+                doc_ids.append(doc_id)
+                batch_ids.append(batch_vocab.setdefault(token, len(batch_vocab)))
+                lex_ids.append(_WORD_INDEX.get(token, _UNKNOWN))
+                negated.append(previous in NEGATORS)
+                previous = token
+
+        n_docs = len(texts)
+        if not doc_ids:
+            return [self._result(0.0, np.zeros(5), [], features) for _ in texts]
+
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        batch_ids = np.asarray(batch_ids, dtype=np.int64)
+        lex_ids = np.asarray(lex_ids, dtype=np.int64)
+        negated = np.asarray(negated, dtype=bool)
+
+        # --- Sentiment and emotions ---
+        # A negated word flips its valence and loses its emotions ("not happy").
+        vectors = _MATRIX[lex_ids]
+        vectors[negated, VALENCE] *= -0.74
+        vectors[negated, JOY:] = 0.0
+        sums = np.zeros((n_docs, 6))
+        np.add.at(sums, doc_ids, vectors)
+
+        valence = sums[:, VALENCE]
+        scores = np.clip(valence / np.sqrt(valence * valence + ALPHA), -1.0, 1.0)
+        emotions = 1.0 - np.exp(-sums[:, JOY:])
+
+        # --- Keywords: most frequent non-stopword terms per document ---
+        words = np.array(list(batch_vocab), dtype=object)
+        is_candidate = np.array([len(word) > 2 and word not in STOPWORDS for word in words], dtype=bool)
+        mask = is_candidate[batch_ids]
+        keywords = [[] for _ in texts]
+        if mask.any():
+            n_words = len(words)
+            pair_keys, first_position, counts = np.unique(
+                doc_ids[mask] * n_words + batch_ids[mask], return_index=True, return_counts=True
+            )
+            pair_docs = pair_keys // n_words
+            pair_words = pair_keys % n_words
+            # Order by document, then by count (desc), then by first appearance
+            order = np.lexsort((first_position, -counts, pair_docs))
+            max_counts = np.zeros(n_docs, dtype=np.int64)
+            np.maximum.at(max_counts, pair_docs, counts)
+            for index in order:
+                doc_id = pair_docs[index]
+                if len(keywords[doc_id]) < keyword_limit:
+                    keywords[doc_id].append({
+                        "text": words[pair_words[index]],
+                        "relevance": round(float(counts[index] / max_counts[doc_id]), 6),
+                        "count": int(counts[index]),
+                    })
+
+        return [self._result(scores[i], emotions[i], keywords[i], features) for i in range(n_docs)]
+
+    @staticmethod
+    def _result(score, emotions, keywords, features=FEATURES):
+        score = round(float(score), 6)
+        if score > NEUTRAL_THRESHOLD:
+            label = 'positive'
+        elif score < -NEUTRAL_THRESHOLD:
+            label = 'negative'
+        else:
+            label, score = 'neutral', 0.0
+
+        result = {
+            "sentiment": {"label": label, "score": score},
+            "emotions": {name: round(float(value), 6) for name, value in zip(EMOTIONS, emotions)},
+            "keywords": keywords,
+        }
+        data = {FEATURE_DATA_KEYS[feature]: result[FEATURE_DATA_KEYS[feature]] for feature in features}
+        return {"data": data, "status": 200}
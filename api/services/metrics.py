@@ -0,0 +1,122 @@
+# api/services/metrics.py
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from flask import Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess
+
+# Finer low end than the defaults: cached lookups and small commits take ~1ms
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_DURATION = Histogram(
+    'sentiment_stage_duration_seconds',
+    'Time spent in each stage of an analysis request.',
+    ['stage'],
+    buckets=BUCKETS,
+)
+REQUEST_DURATION = Histogram(
+    'sentiment_http_request_duration_seconds',
+    'Time to handle an HTTP request, by route.',
+    ['method', 'endpoint', 'status'],
+    buckets=BUCKETS,
+)
+
+
+# Set by collect_timings() in threads that work on behalf of a request
+_collected_timings = contextvars.ContextVar('collected_timings', default=None)
+
+
+@contextmanager
+def timed(stage):
+    """
+    Times the block as `stage`: the duration goes to the stage histogram and,
+    inside a request, to that response's Server-Timing header.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.labels(stage).observe(elapsed)
+        timings = _collected_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+        elif has_request_context():
+            add_server_timing({stage: elapsed})
+
+
+@contextmanager
+def collect_timings():
+    """
+    Gathers the stages timed in this block into a dict, for pool threads that
+    have no request of their own; hand it to add_server_timing() afterwards.
+    """
+    timings = {}
+    token = _collected_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _collected_timings.reset(token)
+
+
+def add_server_timing(timings):
+    """Adds {stage: seconds} to the current response's Server-Timing header."""
+    server_timing = g.setdefault('server_timing', {})
+    for stage, elapsed in timings.items():
+        server_timing[stage] = server_timing.get(stage, 0.0) + elapsed
+
+
+def render_metrics():
+    """
+    Metrics in the Prometheus text format. With PROMETHEUS_MULTIPROC_DIR set
+    (as under gunicorn) every worker writes its values to files there, and
+    they are summed across workers here.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+class Instrumentation:
+    """Times every request and exposes the collected metrics at /metrics."""
+
+    def __init__(self):
+        self.server_timing = True
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        self.server_timing = app.config.get('SERVER_TIMING_ENABLED', True)
+        app.before_request(self._start_timer)
+        app.after_request(self._record)
+        app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', self.metrics_view)
+
+    @staticmethod
+    def metrics_view():
+        return Response(render_metrics(), mimetype=CONTENT_TYPE_LATEST)
+
+    @staticmethod
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    def _record(self, response):
+        started = g.get('request_started')
+        if started is None or request.endpoint == 'metrics':
+            return response
+
+        elapsed = time.perf_counter() - started
+        # The route name rather than the path keeps label cardinality bounded
+        REQUEST_DURATION.labels(request.method, request.endpoint or 'unmatched', response.status_code).observe(elapsed)
+
+        if self.server_timing:
+            entries = [f"{stage};dur={duration * 1000:.2f}" for stage, duration in g.get('server_timing', {}).items()]
+            entries.append(f"total;dur={elapsed * 1000:.2f}")
+            response.headers['Server-Timing'] = ', '.join(entries)
+        return response
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,201 @@
+# api/services/near_duplicates.py
+import hashlib
+import re
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from .metrics import timed
+
+# The 64-bit SimHash is indexed as BANDS bands of 64 / BANDS bits. Two
+# signatures that differ in fewer than BANDS bits share at least one band
+# exactly, so every match within that distance is a candidate.
+SIGNATURE_BITS = 64
+BANDS = 4
+BAND_BITS = SIGNATURE_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+# Too few features make the signature unstable; such texts aren't indexed
+MIN_FEATURES = 4
+
+TOKEN_RE = re.compile(r"\w+(?:'\w+)?")
+# Words that carry no sentiment. A candidate may differ from the text in
+# these (and in punctuation and casing) only: any other changed word, e.g.
+# "lasts" -> "dies after" or "good" -> "not good", can flip the result,
+# however close the signatures are.
+NEUTRAL_WORDS = frozenset({
+    'a', 'an', 'the', 'this', 'that', 'these', 'those', 'my', 'our', 'your', 'his', 'her', 'its', 'their',
+    'i', 'me', 'we', 'us', 'you', 'he', 'him', 'she', 'it', 'they', 'them',
+    'and', 'or', 'so', 'as', 'of', 'to', 'in', 'on', 'at', 'by', 'for', 'from', 'with', 'about', 'into',
+    'is', 'are', 'was', 'were', 'be', 'been', 'am', "it's", "i'm",
+    'has', 'have', 'had', 'do', 'does', 'did', 'just', 'also', 'then', 'there', 'here',
+})
+
+
+def tokenize(text):
+    """Lowercased words: punctuation and casing don't change the signature."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def _features(tokens):
+    # Words plus word pairs, so word order still matters a little
+    return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+
+def to_signed(value):
+    """64-bit unsigned signature -> the signed integer stored in a BIGINT column."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned(value):
+    return value & ((1 << 64) - 1)
+
+
+def simhash(text, namespace=''):
+    """
+    64-bit SimHash of the words and word pairs of `text`, or None if the text
+    is too short. The namespace (the backend's cache namespace) is mixed into
+    every feature hash, so results of different backends never match.
+    """
+    features = _features(tokenize(text))
+    if len(features) < MIN_FEATURES:
+        return None
+
+    import numpy as np
+
+    prefix = f"{namespace}\x00".encode('utf-8')
+    digests = b''.join(
+        hashlib.blake2b(prefix + feature.encode('utf-8'), digest_size=8).digest() for feature in features
+    )
+    # One row of 64 bits per feature; a bit of the signature is set when
+    # most features have it set
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(features)
+    return int.from_bytes(np.packbits(majority, bitorder='little').tobytes(), 'little')
+
+
+def stored_signature(text, namespace=''):
+    """The signature of `text` as stored in Analysis.simhash (signed), or None."""
+    signature = simhash(text, namespace)
+    return to_signed(signature) if signature is not None else None
+
+
+def similarity(first, second):
+    """Share of identical bits between two signatures (1.0 = identical)."""
+    return 1.0 - (to_unsigned(first) ^ to_unsigned(second)).bit_count() / SIGNATURE_BITS
+
+
+def bands(signature):
+    """(band, bucket) pairs under which a signature is indexed."""
+    value = to_unsigned(signature)
+    return [(band, (value >> (band * BAND_BITS)) & BAND_MASK) for band in range(BANDS)]
+
+
+def changed_words(first, second):
+    """Words of either text missing from the other, counted with repeats."""
+    first, second = Counter(tokenize(first)), Counter(tokenize(second))
+    return (first - second) + (second - first)
+
+
+def index_analyses(analyses):
+    """Adds the LSH band rows of flushed Analysis rows that have a signature."""
+    from sqlalchemy import insert
+    from .. import db
+    from ..models import AnalysisSimhashBand
+
+    rows = [
+        {'band': band, 'bucket': bucket, 'analysis_id': analysis.id}
+        for analysis in analyses
+        if analysis.simhash is not None
+        for band, bucket in bands(analysis.simhash)
+    ]
+    if rows:
+        db.session.execute(insert(AnalysisSimhashBand), rows)
+
+
+def find_near_duplicate(text, signature, threshold, max_age_seconds=None, max_candidates=100):
+    """
+    Returns (analysis, similarity) for the most similar stored analysis whose
+    signature is at least `threshold` similar to `signature`, or None.
+
+    A candidate whose text differs in anything but NEUTRAL_WORDS is never
+    reused, however close its signature.
+    """
+    from sqlalchemy import and_, or_, select
+    from sqlalchemy.orm import joinedload
+    from .. import db
+    from ..models import Analysis, AnalysisSimhashBand
+
+    if signature is None:
+        return None
+
+    band_filter = or_(*(
+        and_(AnalysisSimhashBand.band == band, AnalysisSimhashBand.bucket == bucket)
+        for band, bucket in bands(signature)
+    ))
+    # Newest candidates first: the most recent result is the best one to reuse
+    candidate_ids = (
+        select(AnalysisSimhashBand.analysis_id)
+        .where(band_filter)
+        .order_by(AnalysisSimhashBand.analysis_id.desc())
+        .limit(max_candidates)
+    )
+    # Texts come in the same query: each candidate's is compared below
+    query = Analysis.query.options(joinedload(Analysis.text)).filter(
+        Analysis.id.in_(candidate_ids.scalar_subquery())
+    )
+    if max_age_seconds:
+        # created_at is stored as naive UTC
+        oldest = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=max_age_seconds)
+        query = query.filter(Analysis.created_at >= oldest)
+
+    try:
+        with timed('near_duplicate_lookup'):
+            candidates = query.all()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Database Error: Could not look up near-duplicate analyses. {e}")
+        return None
+
+    best = None
+    for candidate in candidates:
+        score = similarity(signature, candidate.simhash)
+        if score < threshold or (best is not None and score <= best[1]):
+            continue
+        if NEUTRAL_WORDS.issuperset(changed_words(text, candidate.text_content)):
+            best = (candidate, score)
+    return best
+
+
+def backfill_signatures(namespace, batch_size=1000):
+    """
+    Computes the signature and band rows of every analysis that has none,
+    committing after each batch. Returns (rows read, rows indexed).
+    """
+    from sqlalchemy import delete
+    from .. import db
+    from ..models import Analysis, AnalysisSimhashBand
+
+    read = indexed = 0
+    last_id = 0
+    while True:
+        batch = (
+            Analysis.query.filter(Analysis.id > last_id, Analysis.simhash.is_(None))
+            .order_by(Analysis.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for analysis in batch:
+            analysis.simhash = stored_signature(analysis.text_content, namespace)
+        signed = [analysis for analysis in batch if analysis.simhash is not None]
+        # Rows whose signature was cleared by hand may still have band rows
+        db.session.execute(
+            delete(AnalysisSimhashBand).where(AnalysisSimhashBand.analysis_id.in_([a.id for a in signed]))
+        )
+        index_analyses(signed)
+        read += len(batch)
+        indexed += len(signed)
+        last_id = batch[-1].id
+
+        db.session.commit()
+        db.session.expunge_all()
+    return read, indexed
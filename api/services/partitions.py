@@ -0,0 +1,268 @@
+# api/services/partitions.py
+"""
+Monthly partitions of analyses, and the retention job that archives and
+removes old months.
+
+On PostgreSQL, analyses is partitioned by range of created_at: one
+partition per calendar month (analyses_y2026m10), plus analyses_default for
+rows outside them. Queries bounded on created_at (history pages, result
+cache lookups, today's usage) only read the partitions in range.
+`flask partitions create` adds the coming months ahead of time; run it from
+a scheduled job (e.g. daily), so every month has its partition before it
+begins. Rows of a month that arrive before its partition exists land in
+analyses_default and are moved when the partition is created.
+
+Retention keeps RETENTION_MONTHS whole months besides the current one. Each
+older month is written to ARCHIVE_DIR/analyses-YYYY-MM.ndjson.gz (one
+analysis per line: the to_dict fields plus what is needed to restore it)
+before its partition is detached and dropped. Rows of an expired month
+that sit in analyses_default are archived too, and deleted from it.
+Unpartitioned databases (SQLite in development and tests) get the same
+archives, with the rows deleted instead. Deletes run in batches of
+`batch_size` rows, one transaction each.
+"""
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timezone
+from sqlalchemy import and_, delete, exists, func, select, text
+
+PARTITION_RE = re.compile(r'^analyses_y(\d{4})m(\d{2})$')
+# Columns archived besides the to_dict fields, so a row can be restored
+ARCHIVE_COLUMNS = ('session_id', 'keyword_limit', 'cache_key', 'simhash')
+
+
+def month_start(moment):
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'analyses_y{month.year:04d}m{month.month:02d}'
+
+
+def month_range(month):
+    """(first, last) naive UTC datetimes bounding `month`, last exclusive."""
+    following = add_months(month, 1)
+    return (datetime(month.year, month.month, 1), datetime(following.year, following.month, 1))
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+def _delete_in_batches(key, selection, batch_size):
+    """
+    Deletes the rows of key's table whose `key` is returned by `selection`
+    (a SELECT of that column), up to `batch_size` keys per DELETE, committing
+    after each.
+    """
+    from .. import db
+
+    while True:
+        batch = selection.limit(batch_size).scalar_subquery()
+        deleted = db.session.execute(delete(key.table).where(key.in_(batch))).rowcount
+        db.session.commit()
+        if not deleted:
+            return
+
+
+def is_partitioned():
+    """True if analyses is a partitioned table (only ever on PostgreSQL)."""
+    from .. import db
+
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('analyses'))"
+    )).scalar()
+
+
+def list_partitions():
+    """Months that have a partition, oldest first."""
+    from .. import db
+
+    names = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('analyses')"
+    )).scalars()
+    months = []
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def create_partition(month):
+    """
+    Creates the partition of `month` in the current transaction. Rows of the
+    month already in analyses_default (the partition was created late) are
+    moved to it: PostgreSQL refuses a partition whose rows are in the
+    default one, so that is detached meanwhile.
+    """
+    from .. import db
+
+    first, last = month_range(month)
+    name = partition_name(month)
+    bounds = {'first': first, 'last': last}
+    # Writes wait until the transaction ends. The parent is locked first (the
+    # lock covers its partitions) so no insert holds it while we wait on one.
+    db.session.execute(text("LOCK TABLE analyses IN SHARE ROW EXCLUSIVE MODE"))
+    stray = db.session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM analyses_default WHERE created_at >= :first AND created_at < :last)"
+    ), bounds).scalar()
+    create = (f"CREATE TABLE {name} PARTITION OF analyses "
+              f"FOR VALUES FROM ('{first.isoformat()}') TO ('{last.isoformat()}')")
+    if not stray:
+        db.session.execute(text(create))
+        return
+
+    db.session.execute(text("ALTER TABLE analyses DETACH PARTITION analyses_default"))
+    db.session.execute(text(create))
+    db.session.execute(text(
+        f"INSERT INTO {name} SELECT * FROM analyses_default WHERE created_at >= :first AND created_at < :last"
+    ), bounds)
+    db.session.execute(text("DELETE FROM analyses_default WHERE created_at >= :first AND created_at < :last"), bounds)
+    db.session.execute(text("ALTER TABLE analyses ATTACH PARTITION analyses_default DEFAULT"))
+
+
+def create_partitions(months_ahead=3, today=None):
+    """
+    Creates the partitions of the current month and the next `months_ahead`
+    that don't exist yet, one transaction each; returns their names. A
+    no-op on unpartitioned databases.
+    """
+    from .. import db
+
+    if not is_partitioned():
+        return []
+    current = month_start(today or _today())
+    existing = set(list_partitions())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month in existing:
+            continue
+        create_partition(month)
+        # A month that fails doesn't take the ones already created with it
+        db.session.commit()
+        created.append(partition_name(month))
+    return created
+
+
+def expired_months(keep_months, today=None):
+    """Months older than the current one plus `keep_months` before it, oldest first."""
+    from .. import db
+    from ..models import Analysis
+
+    cutoff = add_months(month_start(today or _today()), -keep_months)
+    if is_partitioned():
+        # Expired rows outside every partition sit in the default one
+        stray = db.session.execute(text(
+            "SELECT DISTINCT date_trunc('month', created_at) FROM analyses_default WHERE created_at < :cutoff"
+        ), {'cutoff': month_range(cutoff)[0]}).scalars()
+        months = {month for month in list_partitions() if month < cutoff}
+        return sorted(months.union(month_start(month) for month in stray))
+
+    oldest = db.session.query(func.min(Analysis.created_at)).scalar()
+    months = []
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def archive_month(month, archive_dir, batch_size=1000):
+    """
+    Writes the month's analyses to a gzipped NDJSON file, made durable before
+    it is returned. Returns (path, number of analyses).
+    """
+    from ..models import ANALYSIS_FIELDS, Analysis
+    from .export import iter_analysis_rows
+
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f'analyses-{month:%Y-%m}.ndjson.gz')
+    partial = path + '.partial'
+    first, last = month_range(month)
+    rows = 0
+
+    with gzip.open(partial, 'wt', encoding='utf-8') as archive:
+        for row in iter_analysis_rows(and_(Analysis.created_at >= first, Analysis.created_at < last), batch_size):
+            record = {name: serialize(row) for name, (serialize, _) in ANALYSIS_FIELDS.items()
+                      if name != 'text_snippet'}
+            record.update((column, getattr(row, column)) for column in ARCHIVE_COLUMNS)
+            archive.write(json.dumps(record) + '\n')
+            rows += 1
+    with open(partial, 'rb') as archive:
+        os.fsync(archive.fileno())
+    os.replace(partial, path)
+    return path, rows
+
+
+def drop_month(month, batch_size=1000):
+    """
+    Removes the month's analyses (its partition, if it has one), their
+    near-duplicate index rows and the texts no analysis uses any more.
+    """
+    from .. import db
+    from ..models import Analysis, AnalysisSimhashBand
+
+    first, last = month_range(month)
+    month_ids = select(Analysis.id).where(Analysis.created_at >= first, Analysis.created_at < last)
+    # While the month's analyses are still there to say which rows are theirs
+    _delete_in_batches(
+        AnalysisSimhashBand.analysis_id,
+        select(AnalysisSimhashBand.analysis_id).where(AnalysisSimhashBand.analysis_id.in_(month_ids)),
+        batch_size,
+    )
+
+    if is_partitioned() and month in list_partitions():
+        name = partition_name(month)
+        db.session.execute(text(f"ALTER TABLE analyses DETACH PARTITION {name}"))
+        db.session.execute(text(f"DROP TABLE {name}"))
+        db.session.commit()
+    else:
+        _delete_in_batches(Analysis.id, month_ids, batch_size)
+
+    delete_unused_texts(batch_size)
+
+
+def delete_unused_texts(batch_size=1000):
+    """Deletes (and unindexes) texts that no analysis points at, `batch_size` per transaction."""
+    from .. import db
+    from ..models import Analysis, AnalysisText
+    from .search import unindex_texts
+    from .storage import decompress_text
+
+    last_id = 0
+    while True:
+        unused = db.session.execute(
+            select(AnalysisText.id, AnalysisText.body, AnalysisText.compressed)
+            .where(AnalysisText.id > last_id, ~exists().where(Analysis.text_id == AnalysisText.id))
+            .order_by(AnalysisText.id)
+            .limit(batch_size)
+        ).all()
+        if not unused:
+            return
+        unindex_texts(db.session, [(text_id, decompress_text(body, compressed))
+                                   for text_id, body, compressed in unused])
+        db.session.execute(delete(AnalysisText).where(AnalysisText.id.in_([row.id for row in unused])))
+        db.session.commit()
+        last_id = unused[-1].id
+
+
+def apply_retention(keep_months, archive_dir, batch_size=1000, today=None):
+    """Archives and drops every expired month; returns [(month, archive path, rows)]."""
+    archived = []
+    for month in expired_months(keep_months, today):
+        path, rows = archive_month(month, archive_dir, batch_size)
+        drop_month(month, batch_size)
+        archived.append((month, path, rows))
+    return archived
@@ -0,0 +1,81 @@
+# api/services/payload_log.py
+"""
+Opt-in, sampled debug logging of raw engine payloads.
+
+With WATSON_PAYLOAD_LOG_SAMPLE_RATE > 0 (e.g. 0.01 for one response in a
+hundred) the raw Watson response is logged at DEBUG on the 'api.payloads'
+logger. Records go through a queue to a listener thread, which also renders
+the JSON, so the request thread only pays for enqueueing.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+class _Payload:
+    """Renders the payload only when the record is formatted (on the listener thread)."""
+    __slots__ = ('payload',)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        return json.dumps(self.payload, indent=2, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # QueueHandler would format the message here, in the caller's thread
+        return record
+
+
+class PayloadLog:
+    def __init__(self):
+        self.sample_rate = 0.0
+        self.logger = logging.getLogger('api.payloads')
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.sample_rate = float(app.config.get('WATSON_PAYLOAD_LOG_SAMPLE_RATE', 0.0))
+
+    def _ensure_listener(self):
+        # Started lazily, in the worker process that logs (threads don't survive a fork)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            records = queue.SimpleQueue()
+            self.logger.handlers = [_DeferredQueueHandler(records)]
+            self.logger.setLevel(logging.DEBUG)
+            self.logger.propagate = False
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+            self._listener = QueueListener(records, handler)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+    def stop(self):
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def sample(self, source, payload):
+        """Logs `payload` for a sampled share of the calls."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return
+        self._ensure_listener()
+        self.logger.debug("Raw %s response: %s", source, _Payload(payload))
+
+
+payload_log = PayloadLog()
@@ -0,0 +1,177 @@
+# api/services/persistence.py
+import atexit
+import os
+import queue
+import threading
+import time
+from .metrics import timed
+
+
+def save_analyses(analyses):
+    """
+    Inserts Analysis rows, with their session rollups and near-duplicate
+    index entries, in a single commit; the global rollups follow once it
+    has committed.
+    Rolls back and re-raises if the write fails.
+    """
+    from .. import db
+    from .near_duplicates import index_analyses
+    from .rollups import global_rollups, record_analyses
+
+    try:
+        with timed('db_write'):
+            db.session.add_all(analyses)
+            global_deltas = record_analyses(analyses)
+            if any(analysis.simhash is not None for analysis in analyses):
+                # The band rows need the new ids
+                db.session.flush()
+                index_analyses(analyses)
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    global_rollups.add(global_deltas)
+
+
+class WriteBehindBuffer:
+    """
+    Bounded per-worker queue of Analysis rows that are written in bulk by a
+    background thread, once `batch_size` rows are waiting or `flush_interval`
+    seconds have passed. A full queue falls back to a synchronous write, and
+    the queue is flushed when the worker shuts down.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.batch_size = 100
+        self.flush_interval = 1.0
+        self._app = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stats = {}
+        self._reset_stats()
+
+    def init_app(self, app):
+        # Anything queued for a previous app goes to its own database first
+        self.stop()
+        self._app = app
+        self.enabled = app.config.get('WRITE_BEHIND_ENABLED', False)
+        self.batch_size = app.config.get('WRITE_BEHIND_BATCH_SIZE', 100)
+        self.flush_interval = app.config.get('WRITE_BEHIND_FLUSH_INTERVAL', 1.0)
+        self._queue = queue.Queue(maxsize=app.config.get('WRITE_BEHIND_MAX_QUEUE', 1000))
+        self._reset_stats()
+
+    def _reset_stats(self):
+        with self._stats_lock:
+            self._stats = {'queued': 0, 'flushed': 0, 'dropped': 0, 'sync_writes': 0, 'flushes': 0}
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['depth'] = self._queue.qsize()
+        return stats
+
+    def submit(self, analyses):
+        """
+        Queues Analysis rows for writing. Rows that don't fit in the queue (or
+        all of them, if the buffer is disabled) are written synchronously.
+        """
+        overflow = list(analyses)
+        if self.enabled:
+            self._ensure_worker()
+            while overflow:
+                try:
+                    self._queue.put_nowait(overflow[0])
+                except queue.Full:
+                    break
+                overflow.pop(0)
+                self._count('queued')
+
+        if overflow:
+            if self.enabled:
+                self._count('sync_writes', len(overflow))
+            save_analyses(overflow)
+
+    def flush(self):
+        """Writes everything currently queued, in the calling thread."""
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout=5):
+        """Stops the background writer and flushes what is left."""
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            self._stop.set()
+            thread.join(timeout)
+        self._thread = None
+        if self._app is not None and self._pid in (None, os.getpid()):
+            self.flush()
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid:
+                return
+            # Rows queued by a parent process belong to the parent
+            if self._pid is not None and self._pid != pid:
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = pid
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='analysis-write-behind', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take(block=True)
+            if batch:
+                self._write(batch)
+
+    def _take(self, block):
+        """Collects up to batch_size rows, waiting at most flush_interval when `block` is set."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if block:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        from .. import db
+
+        with self._app.app_context():
+            try:
+                save_analyses(batch)
+                self._count('flushed', len(batch))
+                self._count('flushes')
+            except Exception as e:
+                # Persistence is best-effort, like the synchronous path
+                self._count('dropped', len(batch))
+                print(f"Database Error: Could not flush {len(batch)} buffered analyses. {e}")
+            finally:
+                db.session.remove()
+
+
+write_buffer = WriteBehindBuffer()
+atexit.register(write_buffer.stop)
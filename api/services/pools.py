@@ -0,0 +1,68 @@
+# api/services/pools.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_lock = threading.Lock()
+_executors = {}
+_sessions = {}
+_pid = os.getpid()
+
+
+def _forget_parent_resources():
+    """Called with _lock held: drops pools and sessions created before a fork."""
+    global _pid
+    if _pid != os.getpid():
+        _executors.clear()
+        _sessions.clear()
+        _pid = os.getpid()
+
+
+def get_executor(name, max_workers):
+    """
+    Returns the process-wide thread pool called `name`, creating it on first use.
+
+    Pools are never inherited across fork: a gunicorn worker that finds pools
+    created by its parent starts fresh ones (the parent's threads don't exist
+    in the child).
+    """
+    with _lock:
+        _forget_parent_resources()
+
+        executor = _executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+            _executors[name] = executor
+        return executor
+
+
+def get_http_session(name, pool_maxsize=10):
+    """
+    Returns the process-wide requests.Session called `name`, whose
+    keep-alive connections are reused across requests and threads.
+    Like the thread pools, sessions are not shared with forked children.
+    """
+    # Imported here so requests isn't loaded at startup
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _lock:
+        _forget_parent_resources()
+
+        session = _sessions.get(name)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[name] = session
+        return session
+
+
+def shutdown_executors(wait=True):
+    """Shuts down every pool owned by this process."""
+    with _lock:
+        executors = list(_executors.values()) if _pid == os.getpid() else []
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,318 @@
+# api/services/ratelimit.py
+"""
+Flask-Limiter storage backends that are shared between gunicorn workers.
+
+Importing this module registers two storage schemes with the `limits` library:
+
+    mmap:///var/run/sentiment/ratelimit.bin?slots=65536
+        Counters live in a memory-mapped file, so every worker on the host
+        sees the same limits. A check is a few microseconds: no network hop.
+        The file is per host: other hosts (replicas) keep their own counts,
+        and a new container starts from zero. Needs fcntl locks, so where
+        they don't exist (Windows) memory:// is used instead.
+
+    database://
+        Counters live in the rate_limit_counters table of the app's database,
+        for deployments with several hosts behind one Postgres.
+
+Both implement fixed-window counters (Flask-Limiter's default strategy).
+"""
+import hashlib
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+from limits.errors import ConfigurationError
+from limits.storage import Storage
+
+try:
+    import fcntl
+except ImportError:  # Windows: no byte-range locks, so no mmap:// storage
+    fcntl = None
+
+# --- Memory-mapped file ---
+
+MAGIC = b'SARLMAP1'
+# magic, slot count; padded so slots start on a 64-byte boundary
+HEADER = struct.Struct('<8sQ')
+HEADER_SIZE = 64
+# key hash (0 = free), window end (epoch seconds), counter, unused
+SLOT = struct.Struct('<Qdq8x')
+# A key can only live in one bucket of this many consecutive slots, so one
+# lock covers every slot it might use.
+BUCKET_SLOTS = 8
+THREAD_LOCK_STRIPES = 64
+
+
+def storage_uri(uri):
+    """`uri`, or memory:// in place of an mmap:// URI on platforms without fcntl."""
+    if fcntl is None and uri and uri.startswith('mmap://'):
+        return 'memory://'
+    return uri
+
+
+def _key_hash(key):
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class MmapStorage(Storage):
+    """
+    Fixed-window counters in a file of fixed-size slots, addressed by a
+    64-bit hash of the key. Each bucket of slots is guarded by an fcntl
+    byte-range lock (between processes) and a thread lock (within one).
+    When every slot of a bucket is in use, the counter whose window ends
+    first is evicted.
+    """
+
+    STORAGE_SCHEME = ['mmap']
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        if fcntl is None:
+            raise ConfigurationError("mmap:// rate limit storage needs fcntl, which this platform lacks.")
+        parts = urlsplit(uri or 'mmap:///tmp/sentiment-ratelimit.bin')
+        query = parse_qs(parts.query)
+        self.path = parts.path
+        requested_slots = int(options.get('slots') or query.get('slots', [65536])[0])
+        requested_slots = max(BUCKET_SLOTS, requested_slots - requested_slots % BUCKET_SLOTS)
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.slots = self._initialize(requested_slots)
+        self.buckets = self.slots // BUCKET_SLOTS
+        self._map = mmap.mmap(self._fd, HEADER_SIZE + self.slots * SLOT.size)
+        self._thread_locks = [threading.Lock() for _ in range(THREAD_LOCK_STRIPES)]
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    def _initialize(self, slots):
+        """Creates the file layout if needed; an existing file keeps its own size."""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, HEADER_SIZE, 0)
+        try:
+            header = os.pread(self._fd, HEADER.size, 0)
+            if len(header) == HEADER.size:
+                magic, existing = HEADER.unpack(header)
+                if magic != MAGIC:
+                    raise ValueError(f"{self.path} is not a rate limit storage file.")
+                return existing
+            os.ftruncate(self._fd, HEADER_SIZE + slots * SLOT.size)
+            os.pwrite(self._fd, HEADER.pack(MAGIC, slots), 0)
+            return slots
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, HEADER_SIZE, 0)
+
+    def _after_fork(self):
+        # A lock held by another thread at fork time would never be released
+        self._thread_locks = [threading.Lock() for _ in range(THREAD_LOCK_STRIPES)]
+
+    @property
+    def base_exceptions(self):
+        return (OSError, ValueError)
+
+    # --- Slot access ---
+
+    def _bucket(self, key_hash):
+        return key_hash % self.buckets
+
+    def _locked(self, bucket):
+        return _BucketLock(self, bucket)
+
+    def _offset(self, index):
+        return HEADER_SIZE + index * SLOT.size
+
+    def _read(self, index):
+        return SLOT.unpack_from(self._map, self._offset(index))
+
+    def _write(self, index, key_hash, expires_at, count):
+        SLOT.pack_into(self._map, self._offset(index), key_hash, expires_at, count)
+
+    def _find(self, bucket, key_hash, now, create):
+        """Index of the key's slot in `bucket`; with `create`, claims a free (or the oldest) slot."""
+        first = bucket * BUCKET_SLOTS
+        free = oldest = None
+        oldest_expiry = None
+        for index in range(first, first + BUCKET_SLOTS):
+            slot_hash, expires_at, _ = self._read(index)
+            if slot_hash == key_hash:
+                return index
+            if free is None and (slot_hash == 0 or expires_at <= now):
+                free = index
+            if oldest_expiry is None or expires_at < oldest_expiry:
+                oldest, oldest_expiry = index, expires_at
+        if not create:
+            return None
+        return free if free is not None else oldest
+
+    # --- limits Storage interface ---
+
+    def incr(self, key, expiry, amount=1):
+        key_hash = _key_hash(key)
+        bucket = self._bucket(key_hash)
+        now = time.time()
+        with self._locked(bucket):
+            index = self._find(bucket, key_hash, now, create=True)
+            slot_hash, expires_at, count = self._read(index)
+            if slot_hash != key_hash or expires_at <= now:
+                expires_at, count = now + expiry, 0
+            count += amount
+            self._write(index, key_hash, expires_at, count)
+        return count
+
+    def get(self, key):
+        key_hash = _key_hash(key)
+        bucket = self._bucket(key_hash)
+        now = time.time()
+        with self._locked(bucket):
+            index = self._find(bucket, key_hash, now, create=False)
+            if index is None:
+                return 0
+            _, expires_at, count = self._read(index)
+        return count if expires_at > now else 0
+
+    def get_expiry(self, key):
+        key_hash = _key_hash(key)
+        bucket = self._bucket(key_hash)
+        now = time.time()
+        with self._locked(bucket):
+            index = self._find(bucket, key_hash, now, create=False)
+            expires_at = self._read(index)[1] if index is not None else now
+        return max(expires_at, now)
+
+    def clear(self, key):
+        key_hash = _key_hash(key)
+        bucket = self._bucket(key_hash)
+        with self._locked(bucket):
+            index = self._find(bucket, key_hash, time.time(), create=False)
+            if index is not None:
+                self._write(index, 0, 0.0, 0)
+
+    def reset(self):
+        """Clears every counter; returns how many were live."""
+        now = time.time()
+        cleared = 0
+        for bucket in range(self.buckets):
+            with self._locked(bucket):
+                for index in range(bucket * BUCKET_SLOTS, (bucket + 1) * BUCKET_SLOTS):
+                    slot_hash, expires_at, _ = self._read(index)
+                    if slot_hash and expires_at > now:
+                        cleared += 1
+                    self._write(index, 0, 0.0, 0)
+        return cleared
+
+    def check(self):
+        return not self._map.closed
+
+
+class _BucketLock:
+    """Holds a bucket against other threads (thread lock) and other processes (fcntl lock)."""
+
+    __slots__ = ('storage', 'bucket', 'thread_lock')
+
+    def __init__(self, storage, bucket):
+        self.storage = storage
+        self.bucket = bucket
+        self.thread_lock = storage._thread_locks[bucket % THREAD_LOCK_STRIPES]
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            fcntl.lockf(self.storage._fd, fcntl.LOCK_EX, BUCKET_SLOTS * SLOT.size,
+                        self.storage._offset(self.bucket * BUCKET_SLOTS))
+        except BaseException:
+            self.thread_lock.release()
+            raise
+
+    def __exit__(self, *exc_info):
+        try:
+            fcntl.lockf(self.storage._fd, fcntl.LOCK_UN, BUCKET_SLOTS * SLOT.size,
+                        self.storage._offset(self.bucket * BUCKET_SLOTS))
+        finally:
+            self.thread_lock.release()
+
+
+# --- Database ---
+
+class DatabaseStorage(Storage):
+    """
+    Fixed-window counters in the rate_limit_counters table, updated with one
+    upsert per hit. Uses its own connection, so it never touches the
+    request's session. Expired rows are purged now and then.
+    """
+
+    STORAGE_SCHEME = ['database']
+    PURGE_PROBABILITY = 0.001
+
+    @property
+    def base_exceptions(self):
+        from sqlalchemy.exc import SQLAlchemyError
+        return SQLAlchemyError
+
+    @staticmethod
+    def _engine():
+        from .. import db
+        return db.engine
+
+    def incr(self, key, expiry, amount=1):
+        from sqlalchemy import case
+        from ..models import RateLimitCounter, upsert_insert
+
+        now = time.time()
+        counter = RateLimitCounter.__table__.c
+        insert = upsert_insert(RateLimitCounter).values(key=key, count=amount, expires_at=now + expiry)
+        expired = counter.expires_at <= now
+        statement = insert.on_conflict_do_update(
+            index_elements=['key'],
+            set_={
+                'count': case((expired, insert.excluded.count), else_=counter.count + insert.excluded.count),
+                'expires_at': case((expired, insert.excluded.expires_at), else_=counter.expires_at),
+            }
+        ).returning(counter.count)
+
+        with self._engine().begin() as connection:
+            count = connection.execute(statement).scalar_one()
+            if random.random() < self.PURGE_PROBABILITY:
+                connection.execute(RateLimitCounter.__table__.delete().where(expired))
+        return count
+
+    def _row(self, key):
+        from ..models import RateLimitCounter
+
+        table = RateLimitCounter.__table__
+        with self._engine().connect() as connection:
+            return connection.execute(
+                table.select().where(table.c.key == key, table.c.expires_at > time.time())
+            ).first()
+
+    def get(self, key):
+        row = self._row(key)
+        return row.count if row is not None else 0
+
+    def get_expiry(self, key):
+        row = self._row(key)
+        return row.expires_at if row is not None else time.time()
+
+    def clear(self, key):
+        from ..models import RateLimitCounter
+
+        table = RateLimitCounter.__table__
+        with self._engine().begin() as connection:
+            connection.execute(table.delete().where(table.c.key == key))
+
+    def reset(self):
+        from ..models import RateLimitCounter
+
+        with self._engine().begin() as connection:
+            return connection.execute(RateLimitCounter.__table__.delete()).rowcount
+
+    def check(self):
+        from sqlalchemy import text
+
+        try:
+            with self._engine().connect() as connection:
+                connection.execute(text('SELECT 1'))
+            return True
+        except Exception:
+            return False
@@ -0,0 +1,212 @@
+# api/services/resilience.py
+"""
+Protection against a slow or failing analysis engine.
+
+    Deadline:        every request gets a time budget (ANALYSIS_DEADLINE_SECONDS)
+                     and an engine call may only use what is left of it.
+    Circuit breaker: after CIRCUIT_FAILURE_THRESHOLD consecutive failures or
+                     timeouts the engine is not called for
+                     CIRCUIT_RECOVERY_SECONDS; then a few probe calls decide
+                     whether it is closed again.
+
+The breaker's state is per worker process; it is exported as the
+sentiment_circuit_state gauge (one series per worker) and at
+/api/circuit/stats.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context
+from prometheus_client import Counter, Gauge
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Statuses that mean the engine is unavailable, not that the request was bad
+UNAVAILABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Not worth starting a call with less time than this left
+MIN_CALL_SECONDS = 0.05
+
+CIRCUIT_STATE = Gauge(
+    'sentiment_circuit_state',
+    'Circuit breaker state: 0 closed, 1 half-open, 2 open.',
+    ['name'],
+    multiprocess_mode='liveall',
+)
+CIRCUIT_TRANSITIONS = Counter(
+    'sentiment_circuit_transitions_total',
+    'Circuit breaker state changes.',
+    ['name', 'from_state', 'to_state'],
+)
+
+
+def is_unavailable(result):
+    """True if an analyze result failed because the engine is down, slow or overloaded."""
+    return "error" in result and result.get("status", 500) in UNAVAILABLE_STATUSES
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open probe phase."""
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._stats = {'calls': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+        CIRCUIT_STATE.labels(name).set(STATE_VALUES[CLOSED])
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def init_app(self, app):
+        self.failure_threshold = app.config.get('CIRCUIT_FAILURE_THRESHOLD', 5)
+        self.recovery_timeout = app.config.get('CIRCUIT_RECOVERY_SECONDS', 30.0)
+        self.half_open_max_calls = app.config.get('CIRCUIT_HALF_OPEN_MAX_CALLS', 1)
+        self.reset()
+
+    def _after_fork(self):
+        # A lock held by another thread at fork time would never be released
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._transition(CLOSED)
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    @property
+    def state(self):
+        with self._lock:
+            self._expire_open()
+            return self._state
+
+    def _expire_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state):
+        if state != self._state:
+            CIRCUIT_TRANSITIONS.labels(self.name, self._state, state).inc()
+            print(f"Circuit breaker '{self.name}': {self._state} -> {state}")
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self._stats['opened'] += 1
+        self._state = state
+        self._failures = 0
+        self._probes = 0
+        CIRCUIT_STATE.labels(self.name).set(STATE_VALUES[state])
+
+    def allow(self):
+        """True if a call may go through now (a probe, when half-open)."""
+        with self._lock:
+            self._expire_open()
+            if self._state == CLOSED:
+                allowed = True
+            elif self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                allowed = True
+            else:
+                allowed = False
+            self._stats['calls' if allowed else 'rejected'] += 1
+            return allowed
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED)
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._stats['failures'] += 1
+            if self._state == HALF_OPEN:
+                # The probe failed: wait a full recovery period again
+                self._transition(OPEN)
+            elif self._state == CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._transition(OPEN)
+
+    def record(self, result):
+        """Records an analyze result: unavailability counts as a failure, anything else as a success."""
+        if is_unavailable(result):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def stats(self):
+        with self._lock:
+            self._expire_open()
+            stats = dict(self._stats)
+            stats['state'] = self._state
+            stats['consecutive_failures'] = self._failures
+            if self._state == OPEN:
+                stats['retry_in_seconds'] = round(
+                    max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at)), 3
+                )
+            return stats
+
+
+watson_breaker = CircuitBreaker('watson')
+
+
+# --- Deadlines ---
+
+# Set by deadline_scope() in threads that work on behalf of a request
+_deadline = contextvars.ContextVar('analysis_deadline', default=None)
+
+
+def current_deadline():
+    """time.monotonic() value by which the current request must be answered, or None."""
+    deadline = _deadline.get()
+    if deadline is None and has_request_context():
+        deadline = g.get('analysis_deadline')
+    return deadline
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Applies a request's deadline in a pool thread (see current_deadline)."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def call_timeout(default):
+    """
+    Timeout for one engine call: `default`, or less if the request's
+    deadline is closer. None means the budget is already spent.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+    remaining = deadline - time.monotonic()
+    if remaining < MIN_CALL_SECONDS:
+        return None
+    return min(default, remaining)
+
+
+class DeadlineBudget:
+    """Gives every request ANALYSIS_DEADLINE_SECONDS, counted from its arrival."""
+
+    def __init__(self):
+        self.seconds = None
+
+    def init_app(self, app):
+        self.seconds = app.config.get('ANALYSIS_DEADLINE_SECONDS')
+        app.before_request(self._start)
+
+    def _start(self):
+        if self.seconds:
+            g.analysis_deadline = time.monotonic() + self.seconds
+
+
+deadline_budget = DeadlineBudget()
@@ -0,0 +1,273 @@
+# api/services/rollups.py
+import atexit
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+# session_id of the rollup rows that cover every session
+GLOBAL_ROLLUP_SCOPE = '*'
+
+EMOTIONS = ('joy', 'sadness', 'fear', 'disgust', 'anger')
+LABELS = ('positive', 'negative', 'neutral')
+SUM_COLUMNS = ('total_count', 'positive_count', 'negative_count', 'neutral_count', 'sentiment_score_sum',
+               'emotion_count') + tuple(f'{emotion}_sum' for emotion in EMOTIONS)
+
+
+def _day(created_at):
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+def aggregate(analyses):
+    """Sums analyses into {(day, scope): delta} for their session and the global scope."""
+    deltas = {}
+    for analysis in analyses:
+        day = _day(analysis.created_at or datetime.now(timezone.utc))
+        for scope in (analysis.session_id, GLOBAL_ROLLUP_SCOPE):
+            delta = deltas.get((day, scope))
+            if delta is None:
+                delta = deltas[(day, scope)] = dict.fromkeys(SUM_COLUMNS, 0)
+                delta['keyword_counts'] = Counter()
+
+            delta['total_count'] += 1
+            if analysis.sentiment_label in LABELS:
+                delta[f'{analysis.sentiment_label}_count'] += 1
+            delta['sentiment_score_sum'] += analysis.sentiment_score or 0.0
+
+            emotions = analysis.emotions
+            if emotions is not None:
+                delta['emotion_count'] += 1
+                for emotion in EMOTIONS:
+                    delta[f'{emotion}_sum'] += emotions.get(emotion) or 0.0
+
+            # Count each keyword once per analysis
+            texts = {keyword.get('text', '').lower() for keyword in (analysis.keywords or []) if keyword.get('text')}
+            delta['keyword_counts'].update(texts)
+    return deltas
+
+
+def apply_deltas(deltas, max_keywords=200):
+    """
+    Adds `deltas` to the rollup rows inside the current transaction.
+    Rows are locked in a fixed order so concurrent writers can't deadlock.
+    """
+    from .. import db
+    from ..models import AnalysisRollup, upsert_insert
+
+    for day, scope in sorted(deltas):
+        delta = deltas[(day, scope)]
+        db.session.execute(
+            upsert_insert(AnalysisRollup).values(
+                day=day, session_id=scope, keyword_counts={}, **dict.fromkeys(SUM_COLUMNS, 0)
+            ).on_conflict_do_nothing()
+        )
+        rollup = db.session.query(AnalysisRollup).filter_by(day=day, session_id=scope).with_for_update().populate_existing().one()
+        for column in SUM_COLUMNS:
+            setattr(rollup, column, getattr(rollup, column) + delta[column])
+
+        keyword_counts = Counter(rollup.keyword_counts or {})
+        keyword_counts.update(delta['keyword_counts'])
+        # Keep the map bounded; rare keywords beyond the top entries are dropped
+        rollup.keyword_counts = dict(keyword_counts.most_common(max_keywords))
+
+
+def merge_deltas(into, deltas):
+    """Adds `deltas` to `into` (both {(day, scope): delta})."""
+    for key, delta in deltas.items():
+        target = into.get(key)
+        if target is None:
+            into[key] = {**delta, 'keyword_counts': Counter(delta['keyword_counts'])}
+            continue
+        for column in SUM_COLUMNS:
+            target[column] += delta[column]
+        target['keyword_counts'].update(delta['keyword_counts'])
+    return into
+
+
+def record_analyses(analyses):
+    """
+    Updates the session rollups for newly saved analyses (same transaction as
+    the insert). Returns the global-scope deltas: every insert would otherwise
+    wait on the same row lock, so they go to `global_rollups` once the insert
+    has committed.
+    """
+    from flask import current_app
+
+    if not analyses:
+        return {}
+    deltas = aggregate(analyses)
+    global_deltas = {key: deltas.pop(key) for key in [key for key in deltas if key[1] == GLOBAL_ROLLUP_SCOPE]}
+    apply_deltas(deltas, current_app.config.get('ROLLUP_MAX_KEYWORDS', 200))
+    return global_deltas
+
+
+class GlobalRollupBuffer:
+    """
+    Per-worker sum of the global-scope rollup deltas, applied by a background
+    thread every `flush_interval` seconds in a short transaction of its own.
+    The global row lock is then taken once per worker and interval, never
+    inside a request's transaction. When disabled, deltas are applied right
+    away, still in their own transaction. Deltas not yet applied when a
+    worker dies are lost; `flask rollups rebuild` recomputes them.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.flush_interval = 1.0
+        self._app = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.stop()
+        self._app = app
+        self.enabled = app.config.get('ROLLUP_GLOBAL_BUFFER_ENABLED', False)
+        self.flush_interval = app.config.get('ROLLUP_GLOBAL_FLUSH_INTERVAL', 1.0)
+
+    def add(self, deltas):
+        if not deltas:
+            return
+        if not self.enabled:
+            self._apply(deltas)
+            return
+        self._ensure_worker()
+        with self._lock:
+            merge_deltas(self._pending, deltas)
+
+    def flush(self):
+        """Applies the pending deltas in the calling thread."""
+        with self._lock:
+            deltas, self._pending = self._pending, {}
+        if deltas and not self._apply(deltas):
+            # Kept for the next flush
+            with self._lock:
+                self._pending = merge_deltas(deltas, self._pending)
+
+    def stop(self, timeout=5):
+        """Stops the background thread and applies what is left; later deltas are applied right away."""
+        self.enabled = False
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            self._stop.set()
+            thread.join(timeout)
+        self._thread = None
+        if self._app is not None and self._pid in (None, os.getpid()):
+            self.flush()
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid:
+                return
+            # Deltas summed by a parent process belong to the parent
+            if self._pid is not None and self._pid != pid:
+                self._pending = {}
+            self._pid = pid
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='global-rollups', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _apply(self, deltas):
+        from .. import db
+
+        with self._app.app_context():
+            try:
+                apply_deltas(deltas, self._app.config.get('ROLLUP_MAX_KEYWORDS', 200))
+                db.session.commit()
+                return True
+            except Exception as e:
+                db.session.rollback()
+                print(f"Database Error: Could not update the global rollups. {e}")
+                return False
+
+
+global_rollups = GlobalRollupBuffer()
+atexit.register(global_rollups.stop)
+
+
+def rebuild_rollups(batch_size=1000):
+    """
+    Recomputes every rollup row from the analyses table in one transaction,
+    so readers keep seeing the old rollups until it commits.
+    Returns the number of analyses read.
+    """
+    from .. import db
+    from ..models import Analysis, AnalysisRollup
+    from flask import current_app
+
+    max_keywords = current_app.config.get('ROLLUP_MAX_KEYWORDS', 200)
+    db.session.query(AnalysisRollup).delete()
+
+    processed, last_id = 0, 0
+    while True:
+        batch = (
+            Analysis.query.filter(Analysis.id > last_id)
+            .order_by(Analysis.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        apply_deltas(aggregate(batch), max_keywords)
+        # Keep memory flat; everything is committed at once at the end
+        db.session.flush()
+        db.session.expunge_all()
+        processed += len(batch)
+        last_id = batch[-1].id
+
+    db.session.commit()
+    return processed
+
+
+def summarize(rollups, top_keywords=10):
+    """Turns rollup rows (or their sum) into the /api/stats representation."""
+    totals = dict.fromkeys(SUM_COLUMNS, 0)
+    keyword_counts = Counter()
+    for rollup in rollups:
+        for column in SUM_COLUMNS:
+            totals[column] += getattr(rollup, column)
+        keyword_counts.update(rollup.keyword_counts or {})
+
+    total, with_emotions = totals['total_count'], totals['emotion_count']
+    # Analyses that asked for no sentiment have no label
+    with_sentiment = sum(totals[f'{label}_count'] for label in LABELS)
+    return {
+        'total': total,
+        'sentiment': {label: totals[f'{label}_count'] for label in LABELS},
+        'average_sentiment_score': totals['sentiment_score_sum'] / with_sentiment if with_sentiment else None,
+        'average_emotions': {
+            emotion: (totals[f'{emotion}_sum'] / with_emotions if with_emotions else None)
+            for emotion in EMOTIONS
+        },
+        'top_keywords': [{'text': text, 'count': count} for text, count in keyword_counts.most_common(top_keywords)],
+    }
+
+
+def get_stats(scope, days):
+    """Per-day and overall stats for `scope` (a session id or GLOBAL_ROLLUP_SCOPE) over the last `days` days."""
+    from ..models import AnalysisRollup
+
+    today = datetime.now(timezone.utc).date()
+    first_day = today - timedelta(days=days - 1)
+    rollups = (
+        AnalysisRollup.query.filter(AnalysisRollup.session_id == scope, AnalysisRollup.day >= first_day)
+        .order_by(AnalysisRollup.day)
+        .all()
+    )
+    return {
+        'from': first_day.isoformat(),
+        'to': today.isoformat(),
+        'days': [{'date': rollup.day.isoformat(), **summarize([rollup])} for rollup in rollups],
+        'totals': summarize(rollups),
+    }
@@ -0,0 +1,137 @@
+# api/services/search.py
+"""
+Full-text and keyword search over analyses. Texts are indexed once in the
+texts table (see api/services/storage.py), when they are first stored.
+
+    Postgres: texts.search_vector, a tsvector with a GIN index, plus a GIN
+              (jsonb_path_ops) index on analyses.keywords.
+    SQLite:   the texts_fts FTS5 table (contentless, porter stemming), whose
+              rowids are texts ids.
+
+Only these two databases are supported, as for the upserts that store the
+texts (models.upsert_insert).
+
+Text bodies are compressed, so the database can't compute these itself:
+index_texts() fills them when texts are inserted. Migrations create them in
+deployed databases; the DDL below creates them whenever db.create_all()
+builds the tables (tests, development).
+"""
+import re
+from sqlalchemy import DDL, event, false, func, literal, literal_column, select, text, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+POSTGRES_ANALYSES_DDL = (
+    "CREATE INDEX ix_analyses_keywords ON analyses USING gin (keywords jsonb_path_ops)",
+)
+POSTGRES_TEXTS_DDL = (
+    "ALTER TABLE texts ADD COLUMN search_vector tsvector",
+    "CREATE INDEX ix_texts_search_vector ON texts USING gin (search_vector)",
+)
+
+SQLITE_TEXTS_DDL = (
+    "CREATE VIRTUAL TABLE texts_fts USING fts5(body, content='', tokenize='porter unicode61')",
+)
+
+TERM_RE = re.compile(r"\w+")
+
+
+def install_search_ddl(analyses, texts):
+    """Hooks the search indexes of each dialect onto the creation of the analyses and texts tables."""
+    for statement in POSTGRES_ANALYSES_DDL:
+        event.listen(analyses, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+    for statement in POSTGRES_TEXTS_DDL:
+        event.listen(texts, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+    for statement in SQLITE_TEXTS_DDL:
+        event.listen(texts, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(texts, 'before_drop', DDL("DROP TABLE IF EXISTS texts_fts").execute_if(dialect='sqlite'))
+
+
+def index_texts(session, rows):
+    """Adds (texts.id, text) pairs to the full-text index of the session's database."""
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    params = [{'id': text_id, 'body': body} for text_id, body in rows]
+    if dialect == 'postgresql':
+        session.execute(text("UPDATE texts SET search_vector = to_tsvector('english', :body) WHERE id = :id"), params)
+    elif dialect == 'sqlite':
+        session.execute(text("INSERT INTO texts_fts (rowid, body) VALUES (:id, :body)"), params)
+
+
+def unindex_texts(session, rows):
+    """Removes (texts.id, text) pairs from the full-text index, before their texts rows are deleted."""
+    if rows and session.get_bind().dialect.name == 'sqlite':
+        # A contentless FTS5 table needs the indexed text to delete an entry
+        session.execute(
+            text("INSERT INTO texts_fts (texts_fts, rowid, body) VALUES ('delete', :id, :body)"),
+            [{'id': text_id, 'body': body} for text_id, body in rows]
+        )
+    # On Postgres the index entry goes with the texts row
+
+
+def _dialect():
+    from .. import db
+    return db.engine.dialect.name
+
+
+def fts5_query(raw):
+    """
+    Turns free text into an FTS5 query that matches rows containing every
+    word, like plainto_tsquery does; None if there are no words. Each word is
+    quoted, so FTS5 operators typed by the user are taken literally.
+    """
+    terms = TERM_RE.findall(raw)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def text_filter(raw):
+    """
+    Condition on Analysis matching rows whose text contains every word of
+    `raw`. Rows still in the legacy layout are found once they are backfilled.
+    """
+    from ..models import Analysis
+
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        matches = select(literal_column('id')).select_from(text('texts')).where(
+            literal_column('search_vector').op('@@')(func.plainto_tsquery('english', raw))
+        )
+    elif dialect == 'sqlite':
+        query = fts5_query(raw)
+        if query is None:
+            return false()
+        matches = select(literal_column('rowid')).select_from(text('texts_fts')).where(
+            text('texts_fts MATCH :fts_query').bindparams(fts_query=query)
+        )
+    else:
+        raise NotImplementedError(f"Text search is not supported on '{dialect}'.")
+    return Analysis.text_id.in_(matches)
+
+
+def keyword_filter(keyword):
+    """Condition on Analysis matching rows that have a keyword with exactly this text."""
+    from ..models import Analysis
+
+    if _dialect() == 'postgresql':
+        # @> containment, answered by the jsonb_path_ops GIN index
+        return type_coerce(Analysis.keywords, JSONB).contains([{'text': keyword}])
+    entries = func.json_each(Analysis.keywords).table_valued('value')
+    return select(literal(1)).select_from(entries).where(
+        func.json_extract(entries.c.value, '$.text') == keyword
+    ).exists()
+
+
+def search_query(session_id, q=None, keyword=None, label=None):
+    """Analyses of `session_id` matching every given criterion (not yet ordered or paginated)."""
+    from ..models import Analysis
+
+    query = Analysis.query.filter(Analysis.session_id == session_id)
+    if q:
+        query = query.filter(text_filter(q))
+    if keyword:
+        query = query.filter(keyword_filter(keyword))
+    if label:
+        query = query.filter(Analysis.sentiment_label == label)
+    return query
@@ -0,0 +1,91 @@
+# api/services/serialization.py
+"""
+JSON encoding of responses, and memoized serialized analyses.
+
+    JSON_PROVIDER:  'orjson' encodes responses with orjson when it is
+                    installed, with the same output as Flask's provider
+                    (sorted keys, HTTP dates for datetimes); 'default', or a
+                    missing orjson, keeps Flask's stdlib provider.
+    Analysis memo:  analyses never change once written, so their encoded
+                    JSON is kept in a per-worker LRU keyed by (id, created_at,
+                    fields). History pages only load and encode the rows that
+                    aren't in it, and splice the cached bytes into the array.
+"""
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from .cache import TTLCache
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib provider is used instead
+    orjson = None
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson; falls back to Flask's rules for the types orjson leaves to it."""
+    sort_keys = True
+
+    def _options(self, indent=False):
+        # Datetimes and dataclasses are left to DefaultJSONProvider.default, as in Flask
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default,
+                            option=self._options(bool(kwargs.get('indent')))).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=DefaultJSONProvider.default, option=self._options(self._app.debug))
+        return self._app.response_class(body + b"\n", mimetype='application/json')
+
+
+def configure_json(app):
+    """Installs the JSON provider selected by JSON_PROVIDER."""
+    if app.config.get('JSON_PROVIDER', 'orjson') == 'orjson' and orjson is not None:
+        app.json = OrjsonProvider(app)
+
+
+def encode_item(data):
+    """Encodes one array item as compact JSON bytes, as the app's provider would inside a response."""
+    return current_app.json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def array_response(items):
+    """JSON array response from items already encoded by encode_item."""
+    return current_app.response_class(b'[' + b','.join(items) + b']\n', mimetype='application/json')
+
+
+class AnalysisMemo:
+    """Per-worker LRU of encoded Analysis.to_dict(fields) results, keyed by (id, created_at, fields)."""
+
+    def __init__(self):
+        self.enabled = False
+        self._memory = TTLCache()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('ANALYSIS_MEMO_ENABLED', True)
+        self._memory = TTLCache(
+            max_entries=app.config.get('ANALYSIS_MEMO_MAX_ENTRIES', 10000),
+            ttl=app.config.get('ANALYSIS_MEMO_TTL_SECONDS', 3600),
+        )
+
+    def get(self, key, fields=None):
+        return self._memory.get((key.id, key.created_at, fields)) if self.enabled else None
+
+    def put(self, analysis, fields, encoded):
+        if self.enabled:
+            self._memory.set((analysis.id, analysis.created_at, fields), encoded)
+
+    def __len__(self):
+        return len(self._memory)
+
+
+analysis_memo = AnalysisMemo()
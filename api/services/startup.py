@@ -0,0 +1,39 @@
+# api/services/startup.py
+"""
+Worker startup: which optional parts of the app get loaded, and warming a
+gunicorn --preload master.
+
+Modules that are slow to import and not needed to serve the first request
+(the IBM SDK, requests, Flask-Migrate, the Swagger UI) are imported on first
+use or only when the config asks for them. `benchmarks.startup` reports the
+import time of every module.
+"""
+import importlib
+import click
+
+LEXICON_MODULE = f'{__package__}.lexicon_service'
+
+
+def running_cli():
+    """True while the app is being loaded by the `flask` command (e.g. `flask db upgrade`)."""
+    return click.get_current_context(silent=True) is not None
+
+
+def preload(app):
+    """
+    Imports what the configured backends load on first use. Called in a
+    gunicorn --preload master, so workers fork warm and share those pages.
+    Opens no connections: pools, HTTP sessions and clients are per worker
+    and are rebuilt after fork.
+    """
+    from .watson_service import SDK_MODULES
+
+    backends = {app.config.get('SENTIMENT_BACKEND'), app.config.get('FALLBACK_BACKEND')}
+    modules = ['requests']
+    if 'watson' in backends:
+        modules += SDK_MODULES
+    if 'lexicon' in backends:
+        modules.append(LEXICON_MODULE)
+    for name in modules:
+        importlib.import_module(name)
+    return modules
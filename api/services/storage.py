@@ -0,0 +1,160 @@
+# api/services/storage.py
+"""
+Compact storage of analyses.
+
+    texts:          every distinct text once, keyed by its SHA-256 and
+                    zlib-compressed when that makes it smaller. Analyses point
+                    at it through text_id; the body is only decompressed when
+                    text_content is read.
+    emotion_scores: the five emotion scores of an analysis packed into 20 bytes
+                    as unsigned millionths. Watson and the lexicon backend
+                    report six decimals, so scores read back unchanged.
+
+Migration d8a3f5b1c927 moves the analyses that exist when it runs. Any saved
+in the legacy layout after that (by instances still running the previous
+release) keep their text and emotions in the legacy columns, still read as a
+fallback, until `flask storage backfill` moves them.
+"""
+import hashlib
+import struct
+import zlib
+
+EMOTION_NAMES = ('joy', 'sadness', 'fear', 'disgust', 'anger')
+EMOTION_SCALE = 1_000_000
+EMOTION_STRUCT = struct.Struct('<5I')
+ZLIB_LEVEL = 6
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+def compress_text(text):
+    """Returns (body, compressed): zlib output, or the UTF-8 bytes if compressing doesn't pay."""
+    raw = text.encode('utf-8')
+    packed = zlib.compress(raw, ZLIB_LEVEL)
+    if len(packed) < len(raw):
+        return packed, True
+    return raw, False
+
+
+def decompress_text(body, compressed):
+    raw = zlib.decompress(body) if compressed else bytes(body)
+    return raw.decode('utf-8')
+
+
+def pack_emotions(emotions):
+    """{name: score} -> 20 bytes (missing names count as 0.0); None stays None."""
+    if emotions is None:
+        return None
+    return EMOTION_STRUCT.pack(*(
+        min(EMOTION_SCALE, max(0, round((emotions.get(name) or 0.0) * EMOTION_SCALE)))
+        for name in EMOTION_NAMES
+    ))
+
+
+def unpack_emotions(packed):
+    if packed is None:
+        return None
+    return dict(zip(EMOTION_NAMES, (value / EMOTION_SCALE for value in EMOTION_STRUCT.unpack(packed))))
+
+
+def store_texts(session, contents):
+    """
+    Makes sure every text in `contents` has a texts row (inserting the missing
+    ones, and their search index entries) and returns {text: texts.id}.
+    Safe against concurrent writers of the same text.
+    """
+    from sqlalchemy import select
+    from ..models import AnalysisText, upsert_insert
+    from .search import index_texts
+
+    by_hash = {content_hash(content): content for content in contents}
+    if not by_hash:
+        return {}
+
+    rows = []
+    for digest, content in by_hash.items():
+        body, compressed = compress_text(content)
+        rows.append({'content_hash': digest, 'body': body, 'compressed': compressed})
+    stmt = (
+        upsert_insert(AnalysisText).values(rows)
+        .on_conflict_do_nothing(index_elements=['content_hash'])
+        .returning(AnalysisText.id, AnalysisText.content_hash)
+    )
+    # Only texts seen for the first time come back, and only they need indexing
+    inserted = session.execute(stmt).all()
+    index_texts(session, [(text_id, by_hash[digest]) for text_id, digest in inserted])
+
+    ids = dict(session.execute(
+        select(AnalysisText.content_hash, AnalysisText.id).where(AnalysisText.content_hash.in_(list(by_hash)))
+    ).all())
+    return {content: ids[digest] for digest, content in by_hash.items()}
+
+
+def store_pending_texts(session, flush_context, instances):
+    """before_flush hook: points new analyses at their (deduplicated) texts row."""
+    from ..models import Analysis
+
+    pending = [
+        obj for obj in session.new
+        if isinstance(obj, Analysis) and obj.text_id is None and obj._pending_text is not None
+    ]
+    if pending:
+        ids = store_texts(session, [analysis._pending_text for analysis in pending])
+        for analysis in pending:
+            analysis.text_id = ids[analysis._pending_text]
+
+
+def compact_mappings(session, mappings):
+    """
+    Converts dictionaries for a bulk insert(Analysis) from the logical layout
+    (text_content, emotion_<name>) to the stored one.
+    """
+    ids = store_texts(session, [mapping['text_content'] for mapping in mappings])
+    compact = []
+    for mapping in mappings:
+        mapping = dict(mapping)
+        mapping['text_id'] = ids[mapping.pop('text_content')]
+        emotions = {name: mapping.pop(f'emotion_{name}', None) for name in EMOTION_NAMES}
+        if any(value is not None for value in emotions.values()):
+            mapping['emotion_scores'] = pack_emotions(emotions)
+        compact.append(mapping)
+    return compact
+
+
+def backfill_storage(batch_size=1000):
+    """
+    Moves analyses saved in the legacy layout to texts and emotion_scores,
+    committing after each batch, and clears the legacy columns. Returns the
+    number of analyses moved.
+    """
+    from .. import db
+    from ..models import Analysis
+
+    moved = 0
+    last_id = 0
+    while True:
+        batch = (
+            Analysis.query.filter(Analysis.id > last_id, Analysis.text_id.is_(None))
+            .order_by(Analysis.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        ids = store_texts(db.session, [analysis.legacy_text for analysis in batch])
+        for analysis in batch:
+            analysis.text_id = ids[analysis.legacy_text]
+            analysis.legacy_text = None
+            emotions = {name: getattr(analysis, f'legacy_emotion_{name}') for name in EMOTION_NAMES}
+            if emotions['joy'] is not None:
+                analysis.emotion_scores = pack_emotions(emotions)
+            for name in EMOTION_NAMES:
+                setattr(analysis, f'legacy_emotion_{name}', None)
+        moved += len(batch)
+        last_id = batch[-1].id
+
+        db.session.commit()
+        db.session.expunge_all()
+    return moved
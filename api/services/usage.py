@@ -0,0 +1,125 @@
+# api/services/usage.py
+from datetime import datetime, timezone
+from .cache import TTLCache
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+class UsageCounter:
+    """
+    Per-session, per-day usage counter backed by the session_daily_usage table.
+
+    `reserve` increments the counter with a single conditional upsert, so two
+    concurrent requests can never both take the last unit of quota. Sessions
+    known to have used up their quota are remembered in-process for a short
+    time, so repeated requests from them are rejected without a query.
+    Admitted requests always go to the database: their increment has to be
+    atomic across workers.
+    """
+
+    def __init__(self):
+        self.cache_enabled = False
+        self._exhausted = TTLCache()
+
+    def init_app(self, app):
+        self.cache_enabled = app.config.get('USAGE_CACHE_ENABLED', True)
+        self._exhausted = TTLCache(
+            max_entries=app.config.get('USAGE_CACHE_MAX_ENTRIES', 10000),
+            ttl=app.config.get('USAGE_CACHE_TTL_SECONDS', 60),
+        )
+
+    def _cache_key(self, session_id, day):
+        return f"{session_id}:{day.isoformat()}"
+
+    def _known_exhausted(self, session_id, day, requested, limit):
+        if not self.cache_enabled:
+            return False
+        count = self._exhausted.get(self._cache_key(session_id, day))
+        return count is not None and count + requested > limit
+
+    def _remember(self, session_id, day, count, limit):
+        if self.cache_enabled and count >= limit:
+            self._exhausted.set(self._cache_key(session_id, day), count)
+
+    def get(self, session_id):
+        """Returns how many analyses the session has used today."""
+        from .. import db
+        from ..models import SessionDailyUsage
+
+        count = db.session.query(SessionDailyUsage.count).filter(
+            SessionDailyUsage.session_id == session_id,
+            SessionDailyUsage.usage_date == _today()
+        ).scalar()
+        return count or 0
+
+    def has_room(self, session_id, requested, limit):
+        """Read-only check: could `requested` more analyses still fit in today's quota?"""
+        day = _today()
+        if self._known_exhausted(session_id, day, requested, limit):
+            return False
+        count = self.get(session_id)
+        self._remember(session_id, day, count, limit)
+        return count + requested <= limit
+
+    def reserve(self, session_id, requested, limit):
+        """
+        Atomically takes `requested` units of today's quota. Returns the day
+        charged, for `release`, or None (and changes nothing) if that would
+        exceed `limit`.
+        """
+        from .. import db
+        from ..models import SessionDailyUsage, upsert_insert
+
+        day = _today()
+        if requested > limit or self._known_exhausted(session_id, day, requested, limit):
+            return None
+
+        table = SessionDailyUsage.__table__
+        stmt = upsert_insert(SessionDailyUsage).values(
+            session_id=session_id, usage_date=day, count=requested
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.session_id, table.c.usage_date],
+            set_={'count': table.c.count + requested},
+            where=(table.c.count + requested <= limit),
+        ).returning(table.c.count)
+
+        try:
+            count = db.session.execute(stmt).scalar()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if count is None:
+            self._remember(session_id, day, limit, limit)
+            return None
+        self._remember(session_id, day, count, limit)
+        return day
+
+    def release(self, session_id, amount=1, day=None):
+        """
+        Gives back quota taken by `reserve`, e.g. when the analysis failed.
+        `day` is the one `reserve` returned (today if omitted), so a request
+        that fails after midnight UTC is refunded to the day it was charged.
+        """
+        from .. import db
+        from ..models import SessionDailyUsage
+
+        day = day or _today()
+        self._exhausted.delete(self._cache_key(session_id, day))
+        try:
+            db.session.query(SessionDailyUsage).filter(
+                SessionDailyUsage.session_id == session_id,
+                SessionDailyUsage.usage_date == day,
+                SessionDailyUsage.count >= amount
+            ).update({SessionDailyUsage.count: SessionDailyUsage.count - amount}, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Database Error: Could not release daily usage. {e}")
+
+
+usage_counter = UsageCounter()
@@ -1,15 +1,182 @@
 # api/services/watson_service.py
 import os
-import json
-from ibm_watson import NaturalLanguageUnderstandingV1
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
-from ibm_cloud_sdk_core.api_exception import ApiException
-from ibm_watson.natural_language_understanding_v1 import Features, SentimentOptions, EmotionOptions, KeywordsOptions
+import time
+import threading
+from .payload_log import payload_log
 
-def analyze_text(text_to_analyze):
+NLU_VERSION = '2022-04-07'
+
+# The IBM SDK (and requests with it) is imported on first use, not at startup:
+# it is the heaviest import of the app. api.services.startup.preload() warms it
+# in a gunicorn --preload master.
+SDK_MODULES = (
+    'requests', 'ibm_watson', 'ibm_watson.natural_language_understanding_v1',
+    'ibm_cloud_sdk_core.authenticators', 'ibm_cloud_sdk_core.api_exception', 'ibm_cloud_sdk_core.http_adapter',
+)
+
+
+def build_nlu_client(api_key, api_url):
+    """
+    Builds a Watson NLU client whose HTTP session keeps a pool of
+    keep-alive connections to the service.
+    """
+    from ibm_watson import NaturalLanguageUnderstandingV1
+    from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+    from ibm_cloud_sdk_core.http_adapter import SSLHTTPAdapter
+
+    # WATSON_IAM_URL points token requests elsewhere (e.g. a local stand-in
+    # for benchmarks); by default the SDK uses IBM Cloud IAM.
+    authenticator = IAMAuthenticator(api_key, url=os.getenv('WATSON_IAM_URL') or None)
+    nlu_service = NaturalLanguageUnderstandingV1(
+        version=NLU_VERSION,
+        authenticator=authenticator
+    )
+    nlu_service.set_service_url(api_url)
+
+    # The SDK already creates a requests.Session; we only widen its pool so
+    # concurrent threads in one worker don't discard connections.
+    pool_maxsize = int(os.getenv('WATSON_POOL_MAXSIZE', '10'))
+    adapter = SSLHTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+    nlu_service.http_client.mount('https://', adapter)
+    nlu_service.http_client.mount('http://', adapter)
+    return nlu_service
+
+
+class WatsonClientRegistry:
+    """
+    Keeps one NLU client per process for the current credentials.
+
+    The client (and with it the IAM token and the pooled HTTP session) is
+    reused across requests. It is rebuilt when the credentials change, when
+    reset() is called, or when the registry notices it is running in a forked
+    child (e.g. a gunicorn worker), so connections are never shared between
+    processes.
+    """
+
+    def __init__(self, client_factory=build_nlu_client, refresh_ahead=True, min_refresh_interval=30):
+        self._client_factory = client_factory
+        self._refresh_ahead = refresh_ahead
+        self._min_refresh_interval = min_refresh_interval
+        self._lock = threading.Lock()
+        self._client = None
+        self._credentials = None
+        self._pid = None
+        self._refresher = None
+        self._stop_refresher = None
+
+    def get_client(self, api_key, api_url):
+        """Returns the cached client, building a new one if needed."""
+        credentials = (api_key, api_url)
+        pid = os.getpid()
+
+        client = self._client
+        if client is not None and self._pid == pid and self._credentials == credentials:
+            return client
+
+        with self._lock:
+            if self._pid != pid:
+                # Inherited from the parent process: drop it without closing,
+                # the parent still owns those sockets.
+                self._forget()
+            elif self._credentials != credentials:
+                self._discard()
+
+            if self._client is None:
+                self._client = self._client_factory(api_key, api_url)
+                self._credentials = credentials
+                self._pid = pid
+                if self._refresh_ahead:
+                    self._start_refresher(self._client)
+            return self._client
+
+    def reset(self):
+        """Drops the cached client, e.g. after rotating the API key."""
+        with self._lock:
+            if self._pid == os.getpid():
+                self._discard()
+            else:
+                self._forget()
+
+    def after_fork(self):
+        """Called in a forked child; the parent's lock may be held, so replace it."""
+        self._lock = threading.Lock()
+        self._forget()
+
+    def _discard(self):
+        client = self._client
+        self._forget()
+        http_client = getattr(client, 'http_client', None)
+        if http_client is not None:
+            http_client.close()
+
+    def _forget(self):
+        if self._stop_refresher is not None:
+            self._stop_refresher.set()
+        self._client = None
+        self._credentials = None
+        self._pid = None
+        self._refresher = None
+        self._stop_refresher = None
+
+    def _start_refresher(self, client):
+        """
+        Starts a daemon thread that renews the IAM token before it expires,
+        so no request has to wait for a token fetch.
+        """
+        token_manager = getattr(getattr(client, 'authenticator', None), 'token_manager', None)
+        if token_manager is None:
+            return
+
+        stop = threading.Event()
+        self._stop_refresher = stop
+        self._refresher = threading.Thread(
+            target=self._refresh_loop,
+            args=(token_manager, stop),
+            name='watson-token-refresher',
+            daemon=True,
+        )
+        self._refresher.start()
+
+    def _refresh_loop(self, token_manager, stop):
+        while not stop.is_set():
+            try:
+                token_manager.get_token()
+            except Exception as e:
+                print(f"Watson token refresh failed: {e}")
+            wait = token_manager.refresh_time - time.time()
+            stop.wait(max(wait, self._min_refresh_interval))
+
+
+# One registry per process; it rebuilds itself after fork.
+client_registry = WatsonClientRegistry()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=client_registry.after_fork)
+
+
+def build_features(features, keyword_limit):
+    """The NLU Features for the requested subset of sentiment, emotion and keywords."""
+    from ibm_watson.natural_language_understanding_v1 import Features, SentimentOptions, EmotionOptions, KeywordsOptions
+
+    options = {}
+    if 'sentiment' in features:
+        options['sentiment'] = SentimentOptions()
+    if 'emotion' in features:
+        options['emotion'] = EmotionOptions()
+    if 'keywords' in features:
+        options['keywords'] = KeywordsOptions(limit=keyword_limit)
+    return Features(**options)
+
+
+def analyze_text(text_to_analyze, features=('sentiment', 'emotion', 'keywords'), keyword_limit=5, timeout=None):
     """
     Analyzes the text using the IBM Watson API and returns a structured dictionary.
+    Only the requested features are asked for (and returned): a smaller
+    request is answered faster. `timeout` (seconds) bounds the HTTP call;
+    without it the SDK waits up to a minute.
     """
+    import requests
+    from ibm_cloud_sdk_core.api_exception import ApiException
+
     api_key = os.getenv('WATSON_API_KEY')
     api_url = os.getenv('WATSON_URL')
 
@@ -17,40 +184,39 @@ def analyze_text(text_to_analyze):
         return {"error": "Watson API credentials are not configured.", "status": 500}
 
     try:
-        authenticator = IAMAuthenticator(api_key)
-        nlu_service = NaturalLanguageUnderstandingV1(
-            version='2022-04-07',
-            authenticator=authenticator
-        )
-        nlu_service.set_service_url(api_url)
+        nlu_service = client_registry.get_client(api_key, api_url)
 
+        options = {'timeout': timeout} if timeout is not None else {}
         analysis = nlu_service.analyze(
             text=text_to_analyze,
-            features=Features(
-                sentiment=SentimentOptions(),
-                emotion=EmotionOptions(),
-                keywords=KeywordsOptions(limit=5)
-            )
+            features=build_features(features, keyword_limit),
+            **options
         ).get_result()
 
-        # --- DEBUGGING PRINT ---
-        print("--- RAW RESPONSE FROM IBM WATSON ---")
-        print(json.dumps(analysis, indent=2))
-        print("------------------------------------")
+        # Raw payload for debugging: opt-in and sampled (WATSON_PAYLOAD_LOG_SAMPLE_RATE)
+        payload_log.sample('Watson', analysis)
 
         # --- CORRECT LOGIC: Structure the REAL result ---
-        result = {
-            "sentiment": analysis.get("sentiment", {}).get("document", {}),
+        result = {}
+        if 'sentiment' in features:
+            result["sentiment"] = analysis.get("sentiment", {}).get("document", {})
+        if 'emotion' in features:
             # --- THIS IS THE FIX ---
             # Use "emotion" (singular) to match the actual API response key
-            "emotions": analysis.get("emotion", {}).get("document", {}).get("emotion", {}),
-            "keywords": analysis.get("keywords", [])
-        }
-        
+            result["emotions"] = analysis.get("emotion", {}).get("document", {}).get("emotion", {})
+        if 'keywords' in features:
+            result["keywords"] = analysis.get("keywords", [])
+
         return {"data": result, "status": 200}
-    
+
     except ApiException as e:
         return {"error": f"Watson API Error: {str(e)}", "status": e.code}
-    
+
+    except requests.exceptions.Timeout:
+        return {"error": "Watson API did not answer in time.", "status": 504}
+
+    except requests.exceptions.ConnectionError as e:
+        return {"error": f"Could not reach the Watson API: {str(e)}", "status": 503}
+
     except Exception as e:
         return {"error": f"An unexpected error occurred: {str(e)}", "status": 500}
@@ -0,0 +1,39 @@
+# benchmarks/__main__.py
+"""
+Runs the load test and the microbenchmarks and writes one JSON report.
+
+    python -m benchmarks --json results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.compare results/base.json results/head.json
+
+Individual suites: benchmarks.load, benchmarks.micro, benchmarks.daily_limit.
+"""
+import argparse
+import json
+
+from . import load, micro
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    load.add_arguments(parser)
+    parser.add_argument('--iterations', type=int, default=1000, help='microbenchmark iterations')
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+
+    load_report = load.run_from_args(args)
+    load.print_table(load_report)
+    micro_report = micro.run(args.iterations, args.table_sizes, args.database_url)
+
+    report = {
+        'environment': load_report.pop('environment'),
+        'load': load_report,
+        'micro': micro_report['results'],
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
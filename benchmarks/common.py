@@ -0,0 +1,100 @@
+# benchmarks/common.py
+"""Helpers shared by the benchmark scripts."""
+import os
+import platform
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
+
+from api import create_app, db
+from api.config import TestingConfig
+from api.models import Analysis
+from api.services.persistence import write_buffer
+from api.services.storage import compact_mappings
+
+SEED_BATCH = 5000
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Nearest-rank percentiles of `values`, as {'p50': ..., ...}."""
+    ordered = sorted(values)
+    if not ordered:
+        return {f'p{point}': None for point in points}
+    return {
+        f'p{point}': ordered[max(0, min(len(ordered) - 1, -(-len(ordered) * point // 100) - 1))]
+        for point in points
+    }
+
+
+def seed_history(session_id, rows):
+    """Inserts `rows` analyses for `session_id`, one minute apart going back from now."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    batch = []
+    for n in range(rows):
+        batch.append({
+            'session_id': session_id,
+            'text_content': f'benchmark text {n} ' + 'lorem ipsum ' * 20,
+            'sentiment_label': 'neutral',
+            'sentiment_score': 0.0,
+            'emotion_joy': 0.1,
+            'emotion_sadness': 0.1,
+            'emotion_fear': 0.1,
+            'emotion_disgust': 0.1,
+            'emotion_anger': 0.1,
+            'keywords': [{'text': 'benchmark', 'relevance': 0.9}],
+            'created_at': now - timedelta(minutes=n),
+        })
+        if len(batch) == SEED_BATCH:
+            db.session.execute(insert(Analysis), compact_mappings(db.session, batch))
+            batch = []
+    if batch:
+        db.session.execute(insert(Analysis), compact_mappings(db.session, batch))
+    db.session.commit()
+
+
+@contextmanager
+def benchmark_app(database_url=None, **overrides):
+    """
+    Yields an app built by create_app with its tables created. Without
+    `database_url` it uses a throwaway SQLite file (not :memory:, so every
+    thread sees the same data).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        attributes = {
+            'TESTING': False,
+            'SQLALCHEMY_DATABASE_URI': database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            **overrides,
+        }
+        config = type('BenchmarkConfig', (TestingConfig,), attributes)
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+            try:
+                yield app
+            finally:
+                # Buffered rows must land before the database goes away
+                write_buffer.stop()
+                db.session.remove()
+                if database_url:
+                    # Leave a shared database as we found it
+                    db.drop_all()
+                db.engine.dispose()
+
+
+def environment():
+    """Describes where the numbers were taken, so result files can be compared."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+    }
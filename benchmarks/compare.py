@@ -0,0 +1,72 @@
+# benchmarks/compare.py
+"""
+Compares two reports written by `python -m benchmarks --json` and lists the
+latencies that got slower (or throughputs that dropped) by more than the
+threshold. Exits with status 1 if any did, so it can gate CI.
+
+    python -m benchmarks.compare base.json head.json --threshold 0.10
+"""
+import argparse
+import json
+import sys
+
+
+def flatten(report):
+    """Maps every comparable number in a report to a readable key."""
+    metrics = {}
+    for row in report.get('load', {}).get('results', []):
+        prefix = f"load {row['endpoint']} rows={row['table_size']} c={row['concurrency']}"
+        for name, value in row['latency_ms'].items():
+            metrics[f'{prefix} {name}_ms'] = value
+        metrics[f'{prefix} throughput_rps'] = row['throughput_rps']
+
+    micro = report.get('micro', {})
+    for section in ('to_dict', 'rate_limit'):
+        for variant, timings in micro.get(section, {}).items():
+            for name, value in timings.items():
+                metrics[f'{section} {variant} {name}'] = value
+    for row in micro.get('daily_limit', []):
+        for check in ('count_query', 'usage_counter'):
+            for name, value in row[check].items():
+                metrics[f"daily_limit {check} rows={row['rows']} {name}"] = value
+    return metrics
+
+
+def compare(base, head, threshold):
+    """Returns (metric, base, head, change) for every regression beyond `threshold`."""
+    base_metrics, head_metrics = flatten(base), flatten(head)
+    regressions = []
+    for key, old in base_metrics.items():
+        new = head_metrics.get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        # Higher is worse for latencies, lower is worse for throughput
+        worse = -change if key.endswith('throughput_rps') else change
+        if worse > threshold:
+            regressions.append((key, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative change that counts as a regression')
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    regressions = compare(base, head, args.threshold)
+    for key, old, new, change in regressions:
+        print(f"{key}: {old} -> {new} ({change:+.1%})")
+    if not regressions:
+        print("No regressions above the threshold.")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
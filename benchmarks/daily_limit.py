@@ -0,0 +1,79 @@
+# benchmarks/daily_limit.py
+"""
+Compares the old daily-limit check (COUNT over analyses) with the
+session_daily_usage counter as a session's history grows.
+
+    python -m benchmarks.daily_limit --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from sqlalchemy import func
+
+from api import db
+from api.models import Analysis
+from api.services.usage import usage_counter
+from .common import benchmark_app, percentiles, seed_history
+
+SESSION_ID = 'bench-session'
+
+
+def legacy_count_check():
+    start_of_day_utc = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return db.session.query(func.count(Analysis.id)).filter(
+        Analysis.session_id == SESSION_ID,
+        Analysis.created_at >= start_of_day_utc
+    ).scalar()
+
+
+def counter_check():
+    return usage_counter.has_room(SESSION_ID, 1, limit=10 ** 9)
+
+
+def measure(check, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        check()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return {f'{name}_us': round(value, 1) for name, value in percentiles(timings).items()}
+
+
+def run(sizes, iterations, database_url=None):
+    results = []
+    with benchmark_app(database_url):
+        usage_counter.reserve(SESSION_ID, 1, limit=10 ** 9)
+        seeded = 0
+        for size in sorted(sizes):
+            seed_history(SESSION_ID, size - seeded)
+            seeded = size
+            results.append({
+                'rows': size,
+                'count_query': measure(legacy_count_check, iterations),
+                'usage_counter': measure(counter_check, iterations),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--database-url', help='default: temporary SQLite file')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.iterations, args.database_url)
+    print(f"{'rows':>10} {'COUNT p50/p95 (us)':>22} {'counter p50/p95 (us)':>22}")
+    for row in results:
+        count, counter = row['count_query'], row['usage_counter']
+        print(f"{row['rows']:>10} {count['p50_us']:>11}/{count['p95_us']:<10} {counter['p50_us']:>11}/{counter['p95_us']:<10}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
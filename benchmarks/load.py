@@ -0,0 +1,242 @@
+# benchmarks/load.py
+"""
+Load test of the HTTP API. The app is built by create_app and served by a
+threaded Werkzeug server; Watson, IAM and reCAPTCHA are replaced by the
+local stand-ins in benchmarks.stubs.
+
+For every table size the history session is seeded with that many rows, then
+each endpoint is hit at every concurrency level and p50/p95/p99 latency and
+throughput are recorded.
+
+    python -m benchmarks.load --concurrency 1 8 32 --table-sizes 0 10000 --latency-ms 80
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from api import db
+from .common import benchmark_app, environment, percentiles, seed_history
+from .stubs import StubServer
+
+HISTORY_SESSION = '00000000-0000-4000-8000-000000000000'
+ENDPOINTS = ('analyze', 'history', 'session')
+
+
+class Target:
+    """Builds the request for each endpoint; `n` is the request's sequence number."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self._counter = itertools.count()
+
+    def request(self, endpoint):
+        n = next(self._counter)
+        if endpoint == 'analyze':
+            # A fresh session and text per request: no cache hits, no daily limit
+            return 'POST', '/api/analyze', {
+                'headers': {'X-Session-ID': str(uuid.uuid4())},
+                'json': {'text': f'Benchmark request {n}: the service was great but slow.', 'captchaToken': 'benchmark'},
+            }
+        if endpoint == 'history':
+            return 'GET', '/api/history?limit=10', {'headers': {'X-Session-ID': HISTORY_SESSION}}
+        if endpoint == 'session':
+            return 'GET', '/api/session/new', {}
+        raise ValueError(f"Unknown endpoint '{endpoint}'.")
+
+
+def run_level(target, endpoint, concurrency, total_requests, warmup=0):
+    """
+    Sends `total_requests` requests from `concurrency` threads and returns the
+    summary. `warmup` requests are sent first and not measured.
+    """
+    local = threading.local()
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, kwargs = target.request(endpoint)
+        start = time.perf_counter()
+        try:
+            status = session.request(method, target.base_url + path, timeout=60, **kwargs).status_code
+        except requests.RequestException:
+            status = 'connection_error'
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed_ms)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        if warmup:
+            list(executor.map(one, range(warmup)))
+            latencies.clear()
+            statuses.clear()
+        started = time.perf_counter()
+        list(executor.map(one, range(total_requests)))
+        wall = time.perf_counter() - started
+
+    successful = sum(count for status, count in statuses.items() if status.startswith('2') or status == '304')
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': total_requests,
+        'latency_ms': {name: round(value, 3) for name, value in percentiles(latencies).items()},
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'throughput_rps': round(total_requests / wall, 2),
+        'error_rate': round(1 - successful / total_requests, 4),
+        'statuses': statuses,
+    }
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+@contextlib.contextmanager
+def serve(app):
+    """Serves `app` on a free local port for the duration of the block."""
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, name='benchmark-app', daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextlib.contextmanager
+def watson_env(stub):
+    names = ('WATSON_API_KEY', 'WATSON_URL', 'WATSON_IAM_URL')
+    saved = {name: os.environ.get(name) for name in names}
+    os.environ.update(WATSON_API_KEY='benchmark-key', WATSON_URL=stub.url, WATSON_IAM_URL=stub.url)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run(concurrency_levels=(1, 8, 32), table_sizes=(0, 10000), requests_per_level=200, warmup=10, endpoints=ENDPOINTS,
+        latency_ms=50.0, jitter_ms=10.0, error_rate=0.0, backend='watson', admission_mode='sequential',
+        database_url=None, quiet=True):
+    """Runs the whole matrix and returns a JSON-serializable result."""
+    from api.services.watson_service import client_registry
+
+    stub = StubServer(latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate, seed=0)
+    results = []
+    with stub, watson_env(stub), benchmark_app(
+        database_url,
+        SENTIMENT_BACKEND=backend,
+        ADMISSION_MODE=admission_mode,
+        RECAPTCHA_SECRET_KEY='benchmark-secret',
+        RECAPTCHA_VERIFY_URL=stub.siteverify_url,
+        DAILY_ANALYSIS_LIMIT_PER_SESSION=10 ** 9,
+        JOB_STORE='database',
+        WRITE_BEHIND_ENABLED=True,
+    ) as app:
+        client_registry.reset()
+        database = db.engine.url.get_backend_name()
+        # analyze_text prints every Watson response and failed stand-in calls
+        # are logged; keep the report readable
+        app.logger.disabled = quiet
+        output = open(os.devnull, 'w') if quiet else None
+        with serve(app) as base_url, contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            target = Target(base_url)
+            seeded = 0
+            for size in sorted(table_sizes):
+                seed_history(HISTORY_SESSION, size - seeded)
+                seeded = size
+                for endpoint in endpoints:
+                    for concurrency in concurrency_levels:
+                        result = run_level(target, endpoint, concurrency, requests_per_level, warmup)
+                        results.append({'table_size': size, **result})
+        if output is not None:
+            output.close()
+        client_registry.reset()
+
+    return {
+        'benchmark': 'load',
+        'environment': environment(),
+        'parameters': {
+            'backend': backend,
+            'admission_mode': admission_mode,
+            'database': database,
+            'requests_per_level': requests_per_level,
+            'warmup_requests': warmup,
+            'stub_latency_ms': latency_ms,
+            'stub_jitter_ms': jitter_ms,
+            'stub_error_rate': error_rate,
+        },
+        'stub_calls': dict(stub.counts),
+        'results': results,
+    }
+
+
+def print_table(report):
+    print(f"{'rows':>8} {'endpoint':>9} {'conc':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>7}")
+    for row in report['results']:
+        latency = row['latency_ms']
+        print(f"{row['table_size']:>8} {row['endpoint']:>9} {row['concurrency']:>5} {latency['p50']:>9} "
+              f"{latency['p95']:>9} {latency['p99']:>9} {row['throughput_rps']:>9} {row['error_rate']:>7}")
+
+
+def add_arguments(parser):
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--table-sizes', type=int, nargs='+', default=[0, 10000])
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint and concurrency level')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests before each level')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='stand-in response time')
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of stand-in calls that fail with 503')
+    parser.add_argument('--backend', choices=('watson', 'lexicon'), default='watson')
+    parser.add_argument('--admission-mode', choices=('sequential', 'concurrent'), default='sequential')
+    parser.add_argument('--database-url', help='e.g. postgresql://localhost/bench (default: temporary SQLite file)')
+
+
+def run_from_args(args):
+    return run(
+        concurrency_levels=args.concurrency,
+        table_sizes=args.table_sizes,
+        requests_per_level=args.requests,
+        warmup=args.warmup,
+        endpoints=args.endpoints,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        backend=args.backend,
+        admission_mode=args.admission_mode,
+        database_url=args.database_url,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    report = run_from_args(args)
+    print_table(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
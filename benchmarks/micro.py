@@ -0,0 +1,91 @@
+# benchmarks/micro.py
+"""
+Microbenchmarks of hot paths that don't need HTTP: Analysis.to_dict (full
+and projected, as used by /history), a rate-limit hit per storage backend
+and the daily-limit check at several history sizes.
+
+    python -m benchmarks.micro --iterations 2000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from api.models import Analysis
+from . import daily_limit
+from .common import environment, percentiles
+
+RESULT = {
+    "sentiment": {"label": "positive", "score": 0.73},
+    "emotions": {"joy": 0.8, "sadness": 0.05, "fear": 0.01, "disgust": 0.02, "anger": 0.03},
+    "keywords": [{"text": f"keyword {n}", "relevance": 0.9 - n / 10, "count": 1} for n in range(5)],
+}
+
+
+def time_call(function, iterations, repeat=100):
+    """Per-call time in microseconds, measured over `iterations` runs of `repeat` calls."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        timings.append((time.perf_counter() - start) * 1e6 / repeat)
+    return {f'{name}_us': round(value, 3) for name, value in percentiles(timings).items()}
+
+
+def bench_to_dict(iterations):
+    analysis = Analysis.from_result('bench-session', 'A fairly typical review text. ' * 20, RESULT)
+    analysis.id = 1
+    return {
+        'all_fields': time_call(analysis.to_dict, iterations),
+        'projected': time_call(lambda: analysis.to_dict(['id', 'sentiment_label', 'created_at']), iterations),
+    }
+
+
+def bench_rate_limit(iterations):
+    """One limiter.hit() per call, as Flask-Limiter does per request."""
+    from api.services import ratelimit  # noqa: F401 (registers mmap://)
+
+    limit = parse('15 per minute')
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, uri in (('memory', 'memory://'), ('mmap', f"mmap://{os.path.join(tmp, 'ratelimit.bin')}")):
+            limiter = FixedWindowRateLimiter(storage_from_string(uri))
+            keys = iter(range(10 ** 9))
+            results[name] = time_call(lambda: limiter.hit(limit, str(next(keys) % 1000)), iterations)
+    return results
+
+
+def run(iterations=1000, daily_limit_sizes=(1000, 10000), database_url=None):
+    return {
+        'benchmark': 'micro',
+        'environment': environment(),
+        'results': {
+            'to_dict': bench_to_dict(iterations),
+            'rate_limit': bench_rate_limit(iterations),
+            'daily_limit': daily_limit.run(daily_limit_sizes, min(iterations, 500), database_url),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--daily-limit-sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--database-url', help='default: temporary SQLite file')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    report = run(args.iterations, args.daily_limit_sizes, args.database_url)
+    print(json.dumps(report['results'], indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/near_duplicates.py
+"""
+Measures the near-duplicate lookup (band query plus Hamming check) as the
+number of indexed analyses grows, for a query that has a near-duplicate
+(3 bits away from a stored signature) and one that has none.
+
+    python -m benchmarks.near_duplicates --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+from api import db
+from api.models import Analysis
+from api.services.near_duplicates import find_near_duplicate, index_analyses, to_signed
+from .common import SEED_BATCH, benchmark_app, percentiles
+
+TEXT = 'benchmark text ' + 'lorem ipsum ' * 20
+
+
+def seed_signatures(rows, rng):
+    """Inserts `rows` analyses with random signatures and their band rows; returns the signatures."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    signatures = [rng.getrandbits(64) for _ in range(rows)]
+    for start in range(0, rows, SEED_BATCH):
+        chunk = signatures[start:start + SEED_BATCH]
+        analyses = [
+            Analysis(session_id='bench-session', text_content=TEXT, sentiment_label='neutral', sentiment_score=0.0,
+                     keywords=[], simhash=to_signed(signature), created_at=now)
+            for signature in chunk
+        ]
+        db.session.add_all(analyses)
+        db.session.flush()
+        index_analyses(analyses)
+        db.session.commit()
+        db.session.expunge_all()
+    return signatures
+
+
+def measure(lookup, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        lookup()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return {f'{name}_us': round(value, 1) for name, value in percentiles(timings).items()}
+
+
+def run(sizes, iterations, database_url=None, seed=0):
+    rng = random.Random(seed)
+    results = []
+    with benchmark_app(database_url):
+        signatures = []
+        for size in sorted(sizes):
+            signatures += seed_signatures(size - len(signatures), rng)
+            target = rng.choice(signatures)
+            near = target ^ (1 << 3) ^ (1 << 21) ^ (1 << 50)
+            absent = rng.getrandbits(64)
+            results.append({
+                'rows': size,
+                'hit': measure(lambda: find_near_duplicate(TEXT, near, 0.95), iterations),
+                'miss': measure(lambda: find_near_duplicate(TEXT, absent, 0.95), iterations),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--database-url', help='default: temporary SQLite file')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.iterations, args.database_url)
+    print(f"{'rows':>10} {'hit p50/p95/p99 (us)':>28} {'miss p50/p95/p99 (us)':>28}")
+    for row in results:
+        hit, miss = row['hit'], row['miss']
+        print(f"{row['rows']:>10} {hit['p50_us']:>10}/{hit['p95_us']}/{hit['p99_us']:<8} "
+              f"{miss['p50_us']:>10}/{miss['p95_us']}/{miss['p99_us']:<8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/startup.py
+"""
+Startup profile: how long a fresh interpreter (a new worker) takes to import
+the app and run create_app, and the import time of every module, from
+`python -X importtime`. Also lists which of the heavy, lazily loaded
+modules were imported anyway.
+
+    python -m benchmarks.startup --config api.config.ProductionConfig --runs 5 --top 25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Slow imports that shouldn't happen before the first request
+DEFERRED = ('ibm_watson', 'ibm_cloud_sdk_core', 'requests', 'flask_migrate', 'alembic', 'flask_swagger_ui', 'numpy')
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+from api import create_app
+imported = time.perf_counter()
+create_app(sys.argv[1])
+print(f"{(imported - start) * 1000:.3f} {(time.perf_counter() - imported) * 1000:.3f}")
+"""
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us)} from `python -X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def profile_once(config):
+    """Imports the app and runs create_app(config) in a new interpreter."""
+    env = {**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+    # create_app needs a database URL; nothing connects to it at startup
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, config],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    import_ms, create_app_ms = (float(value) for value in completed.stdout.split()[-2:])
+    return import_ms, create_app_ms, parse_importtime(completed.stderr)
+
+
+def run(config='api.config.ProductionConfig', runs=5):
+    samples = [profile_once(config) for _ in range(runs)]
+    modules = {}
+    for _, _, timings in samples:
+        for name, (self_us, cumulative_us) in timings.items():
+            modules.setdefault(name, []).append((self_us, cumulative_us))
+
+    return {
+        'config': config,
+        'runs': runs,
+        'import_ms': round(statistics.median(sample[0] for sample in samples), 1),
+        'create_app_ms': round(statistics.median(sample[1] for sample in samples), 1),
+        'deferred_loaded': sorted(name for name in DEFERRED if name in modules),
+        'modules': sorted(
+            (
+                {
+                    'module': name,
+                    'self_ms': round(statistics.median(t[0] for t in values) / 1000, 2),
+                    'cumulative_ms': round(statistics.median(t[1] for t in values) / 1000, 2),
+                }
+                for name, values in modules.items()
+            ),
+            key=lambda row: row['cumulative_ms'], reverse=True,
+        ),
+    }
+
+
+def print_report(report, top):
+    print(f"{report['config']}: import {report['import_ms']} ms, create_app {report['create_app_ms']} ms "
+          f"(median of {report['runs']})")
+    print(f"heavy modules loaded at startup: {', '.join(report['deferred_loaded']) or 'none'}")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    # Top-level packages only; --json has every module
+    rows = [row for row in report['modules'] if '.' not in row['module']][:top]
+    for row in rows:
+        print(f"{row['cumulative_ms']:>14} {row['self_ms']:>9}  {row['module']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='api.config.ProductionConfig', help='config class passed to create_app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=25, help='packages listed')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    report = run(args.config, args.runs)
+    print_report(report, args.top)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
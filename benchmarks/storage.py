@@ -0,0 +1,132 @@
+# benchmarks/storage.py
+"""
+Compares the legacy analysis layout (full text and five emotion floats in
+every row) with the compact one (deduplicated, compressed texts and packed
+emotions): seeds legacy rows, measures the size of the tables and the
+latency of history pages, runs the backfill and measures again.
+
+    python -m benchmarks.storage --rows 100000 --distinct 0.3
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from api import db
+from api.models import Analysis
+from api.services.history import load_page, page_keys
+from api.services.storage import EMOTION_NAMES, backfill_storage
+from .common import SEED_BATCH, benchmark_app, environment, percentiles
+
+WORDS = (
+    'the battery screen delivery support price quality camera sound service app update fast slow great '
+    'terrible love hate works broken again never always really quite order refund box product day'
+).split()
+SESSIONS = 200
+
+
+def random_text(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(10, 150))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def seed_legacy(rows, distinct, rng):
+    """Inserts `rows` legacy-layout analyses drawing from rows * distinct different texts."""
+    pool = [random_text(rng) for _ in range(max(1, int(rows * distinct)))]
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    batch = []
+    for n in range(rows):
+        batch.append({
+            'session_id': f'bench-session-{n % SESSIONS}',
+            'text_content': rng.choice(pool),
+            'sentiment_label': 'neutral',
+            'sentiment_score': round(rng.uniform(-1, 1), 6),
+            **{f'emotion_{name}': round(rng.random(), 6) for name in EMOTION_NAMES},
+            'keywords': [{'text': rng.choice(WORDS), 'relevance': 0.9}],
+            'created_at': now - timedelta(minutes=n),
+        })
+        if len(batch) == SEED_BATCH:
+            db.session.execute(Analysis.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Analysis.__table__.insert(), batch)
+    db.session.commit()
+
+
+def table_bytes():
+    """Bytes used by analyses and texts (tables, indexes, search index), after compacting."""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text("VACUUM FULL analyses"))
+            connection.execute(text("VACUUM FULL texts"))
+            return connection.execute(text(
+                "SELECT pg_total_relation_size('analyses') + pg_total_relation_size('texts')"
+            )).scalar()
+    db.session.commit()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text("VACUUM"))
+        page_size = connection.execute(text("PRAGMA page_size")).scalar()
+        pages = connection.execute(text("PRAGMA page_count")).scalar()
+        free = connection.execute(text("PRAGMA freelist_count")).scalar()
+    return (pages - free) * page_size
+
+
+def history_latency(iterations, rng):
+    timings = []
+    for _ in range(iterations):
+        session_id = f'bench-session-{rng.randrange(SESSIONS)}'
+        start = time.perf_counter()
+        keys = page_keys(Analysis.query.filter(Analysis.session_id == session_id), 10)
+        load_page(keys)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.expunge_all()
+    return {f'{name}_ms': round(value, 3) for name, value in percentiles(timings).items()}
+
+
+def run(rows, distinct, iterations, database_url=None, seed=0):
+    rng = random.Random(seed)
+    with benchmark_app(database_url):
+        seed_legacy(rows, distinct, rng)
+        before = {'bytes': table_bytes(), 'history': history_latency(iterations, rng)}
+        start = time.perf_counter()
+        backfill_storage(batch_size=SEED_BATCH)
+        backfill_seconds = round(time.perf_counter() - start, 2)
+        after = {'bytes': table_bytes(), 'history': history_latency(iterations, rng)}
+    return {
+        'environment': environment(),
+        'rows': rows,
+        'distinct_texts': distinct,
+        'legacy': before,
+        'compact': after,
+        'backfill_seconds': backfill_seconds,
+        'size_ratio': round(after['bytes'] / before['bytes'], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--distinct', type=float, default=0.3, help='share of rows with a text of their own')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--database-url', help='default: temporary SQLite file')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    report = run(args.rows, args.distinct, args.iterations, args.database_url)
+    for layout in ('legacy', 'compact'):
+        history = report[layout]['history']
+        print(f"{layout:>8}: {report[layout]['bytes'] / 1e6:8.1f} MB, history page "
+              f"p50 {history['p50_ms']} ms / p95 {history['p95_ms']} ms")
+    print(f"size ratio {report['size_ratio']}, backfill {report['backfill_seconds']} s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# benchmarks/stubs.py
+"""
+Local stand-ins for IBM Cloud IAM, Watson NLU and Google reCAPTCHA
+siteverify, with configurable latency and error rate.
+
+    python -m benchmarks.stubs --port 8900 --latency-ms 80 --error-rate 0.01
+
+Point the app at it with:
+    WATSON_URL=http://127.0.0.1:8900  WATSON_IAM_URL=http://127.0.0.1:8900
+    RECAPTCHA_VERIFY_URL=http://127.0.0.1:8900/recaptcha/api/siteverify
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import jwt
+
+EMOTIONS = ('joy', 'sadness', 'fear', 'disgust', 'anger')
+
+
+def fake_analysis(text):
+    """A Watson-shaped /v1/analyze response derived from a hash of the text."""
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    score = round(digest[0] / 127.5 - 1.0, 6)
+    if score > 0.05:
+        label = 'positive'
+    elif score < -0.05:
+        label = 'negative'
+    else:
+        label = 'neutral'
+    words = [word for word in text.split() if len(word) > 3][:5]
+    return {
+        'usage': {'text_units': 1, 'text_characters': len(text), 'features': 3},
+        'language': 'en',
+        'sentiment': {'document': {'score': score, 'label': label}},
+        'emotion': {'document': {'emotion': {
+            emotion: round(digest[n + 1] / 255, 6) for n, emotion in enumerate(EMOTIONS)
+        }}},
+        'keywords': [{'text': word, 'relevance': round(1 - n * 0.1, 2), 'count': 1} for n, word in enumerate(words)],
+    }
+
+
+class StubServer:
+    """
+    Runs the stand-ins on a background thread.
+
+    Every request waits `latency_ms` (+/- `jitter_ms`) and fails with a 503
+    with probability `error_rate`; IAM token requests never fail.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._counts_lock = threading.Lock()
+        self.counts = {'token': 0, 'analyze': 0, 'siteverify': 0, 'errors': 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def siteverify_url(self):
+        return f'{self.url}/recaptcha/api/siteverify'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='benchmark-stubs', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _count(self, name):
+        with self._counts_lock:
+            self.counts[name] += 1
+
+    def _delay_and_fail(self):
+        """Sleeps for the configured latency; returns True if this call should fail."""
+        with self._random_lock:
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self._random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if failed:
+            self._count('errors')
+        return failed
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are separate writes; don't let Nagle delay the body
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                path = urlsplit(self.path).path
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+                if path == '/identity/token':
+                    stub._count('token')
+                    now = int(time.time())
+                    # The SDK reads the expiry from the (unverified) JWT
+                    token = jwt.encode({'iat': now, 'exp': now + 3600}, 'benchmark', algorithm='HS256')
+                    return self._send(200, {
+                        'access_token': token,
+                        'refresh_token': 'benchmark-refresh',
+                        'token_type': 'Bearer',
+                        'expires_in': 3600,
+                        'expiration': now + 3600,
+                    })
+
+                if path == '/v1/analyze':
+                    stub._count('analyze')
+                    if stub._delay_and_fail():
+                        return self._send(503, {'error': 'Service unavailable', 'code': 503})
+                    text = json.loads(body or b'{}').get('text', '')
+                    return self._send(200, fake_analysis(text))
+
+                if path == '/recaptcha/api/siteverify':
+                    stub._count('siteverify')
+                    if stub._delay_and_fail():
+                        return self._send(503, {'success': False})
+                    token = parse_qs(body.decode('utf-8')).get('response', [''])[0]
+                    return self._send(200, {'success': token != 'invalid'})
+
+                self._send(404, {'error': 'Not found'})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = StubServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate).start()
+    print(f"Stand-ins listening on {stub.url} (Ctrl+C to stop)")
+    try:
+        stub._thread.join()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
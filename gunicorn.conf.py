@@ -0,0 +1,41 @@
+# gunicorn.conf.py
+# Picked up automatically by `gunicorn run:app` from the working directory.
+import os
+import shutil
+
+# Each worker writes its Prometheus metrics to files in this directory and
+# /metrics sums them, so a scrape sees every worker, not just the one serving it.
+# It has to be set before the workers import prometheus_client.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus-multiproc')
+# With preload the master imports the app (and registers metrics) before on_starting runs
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+# Threaded workers: a worker serves several requests at once, so Watson calls
+# queue at (and are shed by) the outbound limiter, and a slow client or an
+# event stream only holds a thread. Keep OUTBOUND_* and DB_* in step with these.
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '12'))
+
+# Load the app once in the master and fork warm workers from it. Database
+# pools, HTTP sessions, the Watson client and background threads are rebuilt
+# in each worker (see api/services/database.py and pools.py).
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+
+def on_starting(server):
+    # Values left over from a previous run would be added to the new ones
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    # Runs in the master before the first worker is forked
+    if server.cfg.preload_app:
+        from api.services.startup import preload
+        preload(server.app.wsgi())
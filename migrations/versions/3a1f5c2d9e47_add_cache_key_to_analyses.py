@@ -0,0 +1,28 @@
+"""Add cache_key to analyses
+
+Revision ID: 3a1f5c2d9e47
+Revises: 7fd6c77f602b
+Create Date: 2026-10-17 09:12:40.512306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a1f5c2d9e47'
+down_revision = '7fd6c77f602b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cache_key', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_analyses_cache_key'), ['cache_key'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_analyses_cache_key'))
+        batch_op.drop_column('cache_key')
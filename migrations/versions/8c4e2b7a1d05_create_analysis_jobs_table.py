@@ -0,0 +1,41 @@
+"""Create analysis_jobs table
+
+Revision ID: 8c4e2b7a1d05
+Revises: 3a1f5c2d9e47
+Create Date: 2026-10-17 10:03:11.804512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e2b7a1d05'
+down_revision = '3a1f5c2d9e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analysis_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('session_id', sa.String(length=36), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('analysis_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_analysis_jobs_session_id'), ['session_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_analysis_jobs_session_id'))
+
+    op.drop_table('analysis_jobs')
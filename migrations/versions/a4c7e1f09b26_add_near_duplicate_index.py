@@ -0,0 +1,35 @@
+"""Add simhash to analyses and the analysis_simhash_bands index
+
+Revision ID: a4c7e1f09b26
+Revises: f3a9d2c1b7e4
+Create Date: 2026-10-17 16:02:37.215408
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e1f09b26'
+down_revision = 'f3a9d2c1b7e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('simhash', sa.BigInteger(), nullable=True))
+
+    op.create_table('analysis_simhash_bands',
+    sa.Column('band', sa.SmallInteger(), nullable=False),
+    sa.Column('bucket', sa.Integer(), nullable=False),
+    sa.Column('analysis_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('band', 'bucket', 'analysis_id')
+    )
+
+
+def downgrade():
+    op.drop_table('analysis_simhash_bands')
+
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.drop_column('simhash')
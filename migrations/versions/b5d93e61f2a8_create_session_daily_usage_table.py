@@ -0,0 +1,39 @@
+"""Create session_daily_usage table
+
+Revision ID: b5d93e61f2a8
+Revises: 8c4e2b7a1d05
+Create Date: 2026-10-17 11:20:47.190233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d93e61f2a8'
+down_revision = '8c4e2b7a1d05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('session_daily_usage',
+    sa.Column('session_id', sa.String(length=36), nullable=False),
+    sa.Column('usage_date', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('session_id', 'usage_date')
+    )
+
+    # Seed today's counters from the analyses already stored, so sessions
+    # don't get a fresh quota on deploy day.
+    op.execute("""
+        INSERT INTO session_daily_usage (session_id, usage_date, count)
+        SELECT session_id, CAST(created_at AS DATE), COUNT(id)
+        FROM analyses
+        WHERE created_at >= CURRENT_DATE
+        GROUP BY session_id, CAST(created_at AS DATE)
+    """)
+
+
+def downgrade():
+    op.drop_table('session_daily_usage')
@@ -0,0 +1,84 @@
+"""Add full-text and keyword search indexes to analyses
+
+Revision ID: b9e2d4a7c013
+Revises: a4c7e1f09b26
+Create Date: 2026-10-17 16:48:05.903127
+
+On PostgreSQL search_vector is a plain column kept up to date by a trigger,
+so adding it doesn't rewrite the table. Existing rows are filled in batches
+of short transactions and the GIN indexes are built concurrently, so writes
+to analyses aren't blocked while it runs.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e2d4a7c013'
+down_revision = 'a4c7e1f09b26'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def _fill_search_vectors(bind):
+    """Fills search_vector for rows that existed before the trigger, one short transaction per id range."""
+    last_id = bind.execute(sa.text("SELECT max(id) FROM analyses")).scalar() or 0
+    for start in range(0, last_id, BATCH_SIZE):
+        bind.execute(
+            sa.text(
+                "UPDATE analyses SET search_vector = to_tsvector('english', text_content) "
+                "WHERE id > :start AND id <= :end AND search_vector IS NULL"
+            ),
+            {'start': start, 'end': start + BATCH_SIZE},
+        )
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Nullable without a default: only the catalog changes
+        op.execute("ALTER TABLE analyses ADD COLUMN search_vector tsvector")
+        op.execute(
+            "CREATE TRIGGER analyses_search_vector_update BEFORE INSERT OR UPDATE OF text_content ON analyses "
+            "FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger(search_vector, 'pg_catalog.english', text_content)"
+        )
+        with op.get_context().autocommit_block():
+            _fill_search_vectors(op.get_bind())
+            op.execute("CREATE INDEX CONCURRENTLY ix_analyses_search_vector ON analyses USING gin (search_vector)")
+            op.execute(
+                "CREATE INDEX CONCURRENTLY ix_analyses_keywords ON analyses USING gin (keywords jsonb_path_ops)"
+            )
+    elif op.get_bind().dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE analyses_fts USING fts5("
+            "text_content, content='analyses', content_rowid='id', tokenize='porter unicode61')"
+        )
+        op.execute(
+            "CREATE TRIGGER analyses_fts_insert AFTER INSERT ON analyses BEGIN "
+            "INSERT INTO analyses_fts (rowid, text_content) VALUES (new.id, new.text_content); END"
+        )
+        op.execute(
+            "CREATE TRIGGER analyses_fts_delete AFTER DELETE ON analyses BEGIN "
+            "INSERT INTO analyses_fts (analyses_fts, rowid, text_content) "
+            "VALUES ('delete', old.id, old.text_content); END"
+        )
+        op.execute(
+            "CREATE TRIGGER analyses_fts_update AFTER UPDATE OF text_content ON analyses BEGIN "
+            "INSERT INTO analyses_fts (analyses_fts, rowid, text_content) "
+            "VALUES ('delete', old.id, old.text_content); "
+            "INSERT INTO analyses_fts (rowid, text_content) VALUES (new.id, new.text_content); END"
+        )
+        op.execute("INSERT INTO analyses_fts (analyses_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX ix_analyses_keywords")
+        op.execute("DROP INDEX ix_analyses_search_vector")
+        op.execute("DROP TRIGGER analyses_search_vector_update ON analyses")
+        op.execute("ALTER TABLE analyses DROP COLUMN search_vector")
+    elif op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('analyses_fts_insert', 'analyses_fts_delete', 'analyses_fts_update'):
+            op.execute(f"DROP TRIGGER {trigger}")
+        op.execute("DROP TABLE analyses_fts")
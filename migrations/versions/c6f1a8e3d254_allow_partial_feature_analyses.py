@@ -0,0 +1,34 @@
+"""Allow analyses without sentiment and record their keyword limit
+
+Revision ID: c6f1a8e3d254
+Revises: b9e2d4a7c013
+Create Date: 2026-10-17 17:31:52.640218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f1a8e3d254'
+down_revision = 'b9e2d4a7c013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('keyword_limit', sa.SmallInteger(), nullable=True))
+        batch_op.alter_column('sentiment_label', existing_type=sa.String(length=10), nullable=True)
+        batch_op.alter_column('sentiment_score', existing_type=sa.Float(), nullable=True)
+
+    # Every analysis stored so far asked Watson for 5 keywords
+    op.execute("UPDATE analyses SET keyword_limit = 5 WHERE keywords IS NOT NULL")
+
+
+def downgrade():
+    op.execute("UPDATE analyses SET sentiment_label = 'unknown', sentiment_score = 0.0 WHERE sentiment_label IS NULL")
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.alter_column('sentiment_score', existing_type=sa.Float(), nullable=False)
+        batch_op.alter_column('sentiment_label', existing_type=sa.String(length=10), nullable=False)
+        batch_op.drop_column('keyword_limit')
@@ -0,0 +1,35 @@
+"""Add (session_id, created_at DESC, id DESC) index to analyses
+
+Revision ID: d27a6f0c8b31
+Revises: b5d93e61f2a8
+Create Date: 2026-10-17 12:41:05.377120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd27a6f0c8b31'
+down_revision = 'b5d93e61f2a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built concurrently on PostgreSQL so writes aren't blocked while it builds
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_analyses_session_created_id',
+            'analyses',
+            ['session_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True
+        )
+    # The composite index covers every lookup by session_id
+    op.drop_index('ix_analyses_session_id', table_name='analyses')
+
+
+def downgrade():
+    op.create_index('ix_analyses_session_id', 'analyses', ['session_id'], unique=False)
+    op.drop_index('ix_analyses_session_created_id', table_name='analyses')
@@ -0,0 +1,196 @@
+"""Store analysis texts deduplicated and compressed, and emotions packed
+
+Revision ID: d8a3f5b1c927
+Revises: c6f1a8e3d254
+Create Date: 2026-10-17 18:22:41.318044
+
+Existing rows are moved to texts and emotion_scores (and the new search
+index) in batches, in the same transaction that drops the old search index,
+so none of them drop out of search. Rows written by instances still running
+the previous release keep the legacy text_content and emotion_* columns (now
+nullable) until `flask storage backfill` moves them. The legacy columns
+stay in the schema (and are carried over by e1b7c3d9f420): dropping them is
+a manual follow-up, once every instance runs this release and the backfill
+has moved everything, that also needs the legacy_* attributes removed from
+models.Analysis.
+"""
+import hashlib
+import struct
+import zlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a3f5b1c927'
+down_revision = 'c6f1a8e3d254'
+branch_labels = None
+depends_on = None
+
+EMOTION_NAMES = ('joy', 'sadness', 'fear', 'disgust', 'anger')
+BATCH_SIZE = 1000
+
+# As of this revision (api/services/storage.py keeps the application's copy)
+texts = sa.table(
+    'texts',
+    sa.column('id', sa.Integer()),
+    sa.column('content_hash', sa.LargeBinary()),
+    sa.column('body', sa.LargeBinary()),
+    sa.column('compressed', sa.Boolean()),
+)
+
+
+def _compress(text):
+    raw = text.encode('utf-8')
+    packed = zlib.compress(raw, 6)
+    return (packed, True) if len(packed) < len(raw) else (raw, False)
+
+
+def _pack_emotions(scores):
+    return struct.pack('<5I', *(min(1_000_000, max(0, round((score or 0.0) * 1_000_000))) for score in scores))
+
+
+def _index_texts(bind, dialect, rows):
+    params = [{'id': text_id, 'body': body} for text_id, body in rows]
+    if not params:
+        return
+    if dialect == 'postgresql':
+        bind.execute(sa.text("UPDATE texts SET search_vector = to_tsvector('english', :body) WHERE id = :id"), params)
+    elif dialect == 'sqlite':
+        bind.execute(sa.text("INSERT INTO texts_fts (rowid, body) VALUES (:id, :body)"), params)
+
+
+def _move_legacy_rows(bind, dialect):
+    """What `flask storage backfill` does, against the schema of this revision."""
+    select_batch = sa.text(
+        "SELECT id, text_content, emotion_joy, emotion_sadness, emotion_fear, emotion_disgust, emotion_anger "
+        "FROM analyses WHERE id > :last_id AND text_id IS NULL ORDER BY id LIMIT :limit"
+    )
+    update = sa.text(
+        "UPDATE analyses SET text_id = :text_id, emotion_scores = :emotion_scores, text_content = NULL, "
+        "emotion_joy = NULL, emotion_sadness = NULL, emotion_fear = NULL, emotion_disgust = NULL, "
+        "emotion_anger = NULL WHERE id = :id"
+    )
+    last_id = 0
+    while True:
+        batch = bind.execute(select_batch, {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+        if not batch:
+            break
+        digests = {row.id: hashlib.sha256(row.text_content.encode('utf-8')).digest() for row in batch}
+        by_hash = {digests[row.id]: row.text_content for row in batch}
+        stored = sa.select(texts.c.content_hash, texts.c.id).where(texts.c.content_hash.in_(list(by_hash)))
+
+        ids = dict(bind.execute(stored).all())
+        missing = [digest for digest in by_hash if digest not in ids]
+        if missing:
+            bind.execute(texts.insert(), [
+                dict(zip(('content_hash', 'body', 'compressed'), (digest, *_compress(by_hash[digest]))))
+                for digest in missing
+            ])
+            ids = dict(bind.execute(stored).all())
+            _index_texts(bind, dialect, [(ids[digest], by_hash[digest]) for digest in missing])
+
+        bind.execute(update, [
+            {
+                'id': row.id,
+                'text_id': ids[digests[row.id]],
+                'emotion_scores': _pack_emotions(row[2:]) if row.emotion_joy is not None else None,
+            }
+            for row in batch
+        ])
+        last_id = batch[-1].id
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    op.create_table(
+        'texts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.LargeBinary(length=32), nullable=False),
+        sa.Column('body', sa.LargeBinary(), nullable=False),
+        sa.Column('compressed', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash'),
+    )
+
+    # The text search index moves to texts; texts are indexed as they are stored
+    if dialect == 'postgresql':
+        op.execute("ALTER TABLE texts ADD COLUMN search_vector tsvector")
+        op.execute("CREATE INDEX ix_texts_search_vector ON texts USING gin (search_vector)")
+        op.execute("DROP INDEX ix_analyses_search_vector")
+        op.execute("DROP TRIGGER analyses_search_vector_update ON analyses")
+        op.execute("ALTER TABLE analyses DROP COLUMN search_vector")
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE texts_fts USING fts5(body, content='', tokenize='porter unicode61')")
+        for trigger in ('analyses_fts_insert', 'analyses_fts_delete', 'analyses_fts_update'):
+            op.execute(f"DROP TRIGGER {trigger}")
+        op.execute("DROP TABLE analyses_fts")
+
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('text_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('emotion_scores', sa.LargeBinary(length=20), nullable=True))
+        batch_op.alter_column('text_content', existing_type=sa.Text(), nullable=True)
+
+    _move_legacy_rows(op.get_bind(), dialect)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    bind = op.get_bind()
+
+    # Move rows saved in the compact layout back to the legacy columns
+    rows = bind.execute(sa.text(
+        "SELECT analyses.id, texts.body, texts.compressed, analyses.emotion_scores "
+        "FROM analyses JOIN texts ON texts.id = analyses.text_id"
+    )).fetchall()
+    update = sa.text(
+        "UPDATE analyses SET text_content = :text, emotion_joy = :joy, emotion_sadness = :sadness, "
+        "emotion_fear = :fear, emotion_disgust = :disgust, emotion_anger = :anger WHERE id = :id"
+    )
+    for analysis_id, body, compressed, packed in rows:
+        raw = zlib.decompress(body) if compressed else bytes(body)
+        scores = struct.unpack('<5I', packed) if packed is not None else (None,) * 5
+        bind.execute(update, {
+            'id': analysis_id, 'text': raw.decode('utf-8'),
+            **{name: (None if score is None else score / 1_000_000) for name, score in zip(EMOTION_NAMES, scores)},
+        })
+
+    with op.batch_alter_table('analyses', schema=None) as batch_op:
+        batch_op.alter_column('text_content', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column('emotion_scores')
+        batch_op.drop_column('text_id')
+
+    if dialect == 'postgresql':
+        # As b9e2d4a7c013 creates it
+        op.execute("ALTER TABLE analyses ADD COLUMN search_vector tsvector")
+        op.execute(
+            "CREATE TRIGGER analyses_search_vector_update BEFORE INSERT OR UPDATE OF text_content ON analyses "
+            "FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger(search_vector, 'pg_catalog.english', text_content)"
+        )
+        op.execute("UPDATE analyses SET search_vector = to_tsvector('english', text_content)")
+        op.execute("CREATE INDEX ix_analyses_search_vector ON analyses USING gin (search_vector)")
+    elif dialect == 'sqlite':
+        op.execute("DROP TABLE texts_fts")
+        op.execute(
+            "CREATE VIRTUAL TABLE analyses_fts USING fts5("
+            "text_content, content='analyses', content_rowid='id', tokenize='porter unicode61')"
+        )
+        op.execute(
+            "CREATE TRIGGER analyses_fts_insert AFTER INSERT ON analyses BEGIN "
+            "INSERT INTO analyses_fts (rowid, text_content) VALUES (new.id, new.text_content); END"
+        )
+        op.execute(
+            "CREATE TRIGGER analyses_fts_delete AFTER DELETE ON analyses BEGIN "
+            "INSERT INTO analyses_fts (analyses_fts, rowid, text_content) "
+            "VALUES ('delete', old.id, old.text_content); END"
+        )
+        op.execute(
+            "CREATE TRIGGER analyses_fts_update AFTER UPDATE OF text_content ON analyses BEGIN "
+            "INSERT INTO analyses_fts (analyses_fts, rowid, text_content) "
+            "VALUES ('delete', old.id, old.text_content); "
+            "INSERT INTO analyses_fts (rowid, text_content) VALUES (new.id, new.text_content); END"
+        )
+        op.execute("INSERT INTO analyses_fts (analyses_fts) VALUES ('rebuild')")
+
+    op.drop_table('texts')
@@ -0,0 +1,87 @@
+"""Partition analyses by month of created_at
+
+Revision ID: e1b7c3d9f420
+Revises: d8a3f5b1c927
+Create Date: 2026-10-17 19:05:12.774190
+
+PostgreSQL only: analyses is rebuilt as a table partitioned by range of
+created_at, with one partition per month from the oldest row to three months
+ahead and a default partition. The rows are copied, so run it in a quiet
+period. Other databases only get the index on text_id.
+"""
+from datetime import date, datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b7c3d9f420'
+down_revision = 'd8a3f5b1c927'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes():
+    op.execute("CREATE INDEX ix_analyses_session_created_id ON analyses (session_id, created_at DESC, id DESC)")
+    op.execute("CREATE INDEX ix_analyses_cache_key ON analyses (cache_key)")
+    op.execute("CREATE INDEX ix_analyses_text_id ON analyses (text_id)")
+    op.execute("CREATE INDEX ix_analyses_keywords ON analyses USING gin (keywords jsonb_path_ops)")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.create_index('ix_analyses_text_id', 'analyses', ['text_id'])
+        return
+
+    op.execute("ALTER TABLE analyses RENAME TO analyses_unpartitioned")
+    # Same columns, defaults (the id sequence) and NOT NULLs. The primary key
+    # of a partitioned table must include the partition key.
+    op.execute(
+        "CREATE TABLE analyses (LIKE analyses_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER TABLE analyses ADD PRIMARY KEY (id, created_at)")
+    op.execute("ALTER SEQUENCE analyses_id_seq OWNED BY analyses.id")
+
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM analyses_unpartitioned")).scalar()
+    today = datetime.now(timezone.utc).date()
+    month = date(oldest.year, oldest.month, 1) if oldest else date(today.year, today.month, 1)
+    last = _add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE analyses_y{month.year:04d}m{month.month:02d} PARTITION OF analyses "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+        month = following
+    op.execute("CREATE TABLE analyses_default PARTITION OF analyses DEFAULT")
+
+    op.execute("INSERT INTO analyses SELECT * FROM analyses_unpartitioned")
+    op.execute("DROP TABLE analyses_unpartitioned")
+    _create_indexes()
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_index('ix_analyses_text_id', table_name='analyses')
+        return
+
+    op.execute("ALTER TABLE analyses RENAME TO analyses_partitioned")
+    op.execute(
+        "CREATE TABLE analyses (LIKE analyses_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    op.execute("ALTER TABLE analyses ADD PRIMARY KEY (id)")
+    op.execute("ALTER SEQUENCE analyses_id_seq OWNED BY analyses.id")
+    op.execute("INSERT INTO analyses SELECT * FROM analyses_partitioned")
+    # Drops the partitions with it
+    op.execute("DROP TABLE analyses_partitioned")
+    _create_indexes()
+    op.execute("DROP INDEX ix_analyses_text_id")
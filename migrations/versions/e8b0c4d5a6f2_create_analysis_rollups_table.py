@@ -0,0 +1,42 @@
+"""Create analysis_rollups table
+
+Revision ID: e8b0c4d5a6f2
+Revises: d27a6f0c8b31
+Create Date: 2026-10-17 14:02:51.640118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b0c4d5a6f2'
+down_revision = 'd27a6f0c8b31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analysis_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('session_id', sa.String(length=36), nullable=False),
+    sa.Column('total_count', sa.Integer(), nullable=False),
+    sa.Column('positive_count', sa.Integer(), nullable=False),
+    sa.Column('negative_count', sa.Integer(), nullable=False),
+    sa.Column('neutral_count', sa.Integer(), nullable=False),
+    sa.Column('sentiment_score_sum', sa.Float(), nullable=False),
+    sa.Column('emotion_count', sa.Integer(), nullable=False),
+    sa.Column('joy_sum', sa.Float(), nullable=False),
+    sa.Column('sadness_sum', sa.Float(), nullable=False),
+    sa.Column('fear_sum', sa.Float(), nullable=False),
+    sa.Column('disgust_sum', sa.Float(), nullable=False),
+    sa.Column('anger_sum', sa.Float(), nullable=False),
+    sa.Column('keyword_counts', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'session_id')
+    )
+    # Populate from existing analyses with: flask rollups rebuild
+
+
+def downgrade():
+    op.drop_table('analysis_rollups')
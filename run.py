@@ -1,9 +1,11 @@
+import os
 from api import create_app
 from api.models import Analysis
 
 # When running locally, we use the DevelopmentConfig
 # This enables debug mode and other development-friendly features
-app = create_app('api.config.DevelopmentConfig')
+# APP_CONFIG selects another config class (e.g. api.config.ProductionConfig)
+app = create_app(os.getenv('APP_CONFIG', 'api.config.DevelopmentConfig'))
 
 if __name__ == '__main__':
     # We run on 0.0.0.0 to make it accessible from outside the container in the future
@@ -0,0 +1,35 @@
+# tests/conftest.py
+import pytest
+from api import create_app
+from api.models import db
+
+
+@pytest.fixture
+def app():
+    """Create and configure a new app instance for each test."""
+    # TestingConfig uses an in-memory SQLite database to keep tests fast and isolated
+    app = create_app('api.config.TestingConfig')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """A test client for the app."""
+    return app.test_client()
+
+
+@pytest.fixture
+def session_headers():
+    """Headers identifying an anonymous user session."""
+    return {'X-Session-ID': '11111111-2222-3333-4444-555555555555'}
+
+
+@pytest.fixture
+def captcha_ok(mocker):
+    """Treat every reCAPTCHA token as valid."""
+    return mocker.patch('api.routes.verify_recaptcha', return_value=True)
@@ -0,0 +1,107 @@
+# tests/test_admission.py
+import threading
+import pytest
+from api.services.pools import get_http_session
+from api.services.usage import usage_counter
+from api.routes import verify_recaptcha
+
+RESULT = {
+    "data": {"sentiment": {"label": "positive", "score": 0.9}, "emotions": {}, "keywords": []},
+    "status": 200
+}
+
+
+@pytest.fixture(params=['sequential', 'concurrent'])
+def admission_mode(request, app):
+    app.config['ADMISSION_MODE'] = request.param
+    return request.param
+
+
+@pytest.mark.parametrize('kwargs, captcha, status', [
+    ({'data': 'plain text'}, True, 415),
+    ({'data': '{not json', 'content_type': 'application/json'}, True, 400),
+    ({'json': ['a list']}, True, 400),
+    ({'json': {'text': '', 'captchaToken': 't'}}, True, 400),
+    ({'json': {'text': 'x' * 1001, 'captchaToken': 't'}}, True, 413),
+    ({'json': {'text': 'fine'}}, True, 403),
+    ({'json': {'text': 'fine', 'captchaToken': 't'}}, False, 403),
+    ({'json': {'text': 'fine', 'captchaToken': 't'}}, True, 200),
+])
+def test_status_codes_are_the_same_in_both_modes(client, mocker, session_headers, admission_mode, kwargs, captcha,
+                                                 status):
+    mocker.patch('api.routes.verify_recaptcha', return_value=captcha)
+    mocker.patch('api.routes.analyze_text', return_value=RESULT)
+
+    response = client.post('/api/analyze', headers=session_headers, **kwargs)
+
+    assert response.status_code == status
+
+
+def test_daily_limit_status_in_both_modes(app, client, mocker, session_headers, captcha_ok, admission_mode):
+    app.config['DAILY_ANALYSIS_LIMIT_PER_SESSION'] = 0
+    response = client.post('/api/analyze', json={'text': 'fine', 'captchaToken': 't'}, headers=session_headers)
+    assert response.status_code == 429
+
+
+def test_concurrent_mode_overlaps_the_blocking_checks(app, client, mocker, session_headers):
+    app.config['ADMISSION_MODE'] = 'concurrent'
+    barrier = threading.Barrier(2, timeout=5)
+
+    def captcha(token):
+        # Only passes if the daily-limit check is running at the same time
+        barrier.wait()
+        return True
+
+    real_has_room = usage_counter.has_room
+
+    def has_room(*args):
+        barrier.wait()
+        return real_has_room(*args)
+
+    mocker.patch('api.routes.verify_recaptcha', side_effect=captcha)
+    mocker.patch('api.routes.usage_counter.has_room', side_effect=has_room)
+    mocker.patch('api.routes.analyze_text', return_value=RESULT)
+
+    response = client.post('/api/analyze', json={'text': 'fine', 'captchaToken': 't'}, headers=session_headers)
+
+    assert response.status_code == 200
+    assert 'daily_limit' in response.headers['Server-Timing']
+
+
+def test_concurrent_mode_returns_the_first_failure_without_waiting(app, client, mocker, session_headers):
+    app.config['ADMISSION_MODE'] = 'concurrent'
+    app.config['DAILY_ANALYSIS_LIMIT_PER_SESSION'] = 0
+    release = threading.Event()
+    mocker.patch('api.routes.verify_recaptcha', side_effect=lambda token: release.wait(5))
+
+    try:
+        response = client.post('/api/analyze', json={'text': 'fine', 'captchaToken': 't'}, headers=session_headers)
+        # Answered while reCAPTCHA is still "in flight"
+        assert response.status_code == 429
+        assert not release.is_set()
+    finally:
+        release.set()
+
+
+def test_batch_keeps_its_status_codes_in_concurrent_mode(app, client, session_headers, captcha_ok):
+    app.config['ADMISSION_MODE'] = 'concurrent'
+    assert client.post('/api/analyze/batch', json={'texts': []}, headers=session_headers).status_code == 400
+    assert client.post('/api/analyze/batch', json={'texts': ['a'] * 26}, headers=session_headers).status_code == 413
+    app.config['DAILY_ANALYSIS_LIMIT_PER_SESSION'] = 1
+    response = client.post('/api/analyze/batch', json={'texts': ['a', 'b'], 'captchaToken': 't'}, headers=session_headers)
+    assert response.status_code == 429
+
+
+def test_recaptcha_reuses_one_pooled_session(app, mocker):
+    app.config['RECAPTCHA_SECRET_KEY'] = 'secret'
+    session = get_http_session('recaptcha')
+    post = mocker.patch.object(session, 'post')
+    post.return_value.json.return_value = {'success': True}
+
+    with app.test_request_context():
+        assert verify_recaptcha('token-1')
+        assert verify_recaptcha('token-2')
+
+    assert get_http_session('recaptcha') is session
+    assert post.call_count == 2
+    assert post.call_args.kwargs['data'] == {'secret': 'secret', 'response': 'token-2'}
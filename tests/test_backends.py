@@ -0,0 +1,83 @@
+# tests/test_backends.py
+import pytest
+from api.models import Analysis
+from api.services.backends import get_backend, WatsonBackend
+from api.services.lexicon_service import LexiconBackend, EMOTIONS
+
+
+@pytest.fixture
+def lexicon():
+    return LexiconBackend()
+
+
+def test_lexicon_scores_sentiment(lexicon):
+    positive, negative, neutral = lexicon.analyze_many([
+        "I love this phone, the camera is great!",
+        "Terrible service, I hate waiting.",
+        "The package arrived on Tuesday.",
+    ])
+
+    assert positive["data"]["sentiment"]["label"] == "positive"
+    assert positive["data"]["sentiment"]["score"] > 0.5
+    assert negative["data"]["sentiment"]["label"] == "negative"
+    assert neutral["data"]["sentiment"] == {"label": "neutral", "score": 0.0}
+
+
+def test_lexicon_handles_negation(lexicon):
+    result = lexicon.analyze("I am not happy with it")
+    assert result["data"]["sentiment"]["label"] == "negative"
+    assert result["data"]["emotions"]["joy"] == 0.0
+
+
+def test_lexicon_result_matches_watson_shape(lexicon):
+    data = lexicon.analyze("I was scared and angry, the food was disgusting")["data"]
+
+    assert set(data) == {"sentiment", "emotions", "keywords"}
+    assert set(data["emotions"]) == set(EMOTIONS)
+    assert all(0.0 <= value < 1.0 for value in data["emotions"].values())
+    assert data["emotions"]["fear"] > 0 and data["emotions"]["anger"] > 0 and data["emotions"]["disgust"] > 0
+    assert data["emotions"]["joy"] == 0.0
+
+
+def test_lexicon_keywords_are_ranked_by_frequency(lexicon):
+    keywords = lexicon.analyze("Battery battery BATTERY. The screen is fine, the screen is bright.")["data"]["keywords"]
+
+    assert keywords[0] == {"text": "battery", "relevance": 1.0, "count": 3}
+    assert keywords[1]["text"] == "screen"
+    assert all(keyword["text"] not in ("the", "is") for keyword in keywords)
+
+
+def test_lexicon_batch_matches_single_calls(lexicon):
+    texts = ["Great day", "", "Awful awful weather", "nothing to see"]
+    assert lexicon.analyze_many(texts) == [lexicon.analyze(text) for text in texts]
+
+
+def test_backend_is_selected_from_config(app):
+    assert isinstance(get_backend(), WatsonBackend)
+    app.config['SENTIMENT_BACKEND'] = 'lexicon'
+    assert isinstance(get_backend(), LexiconBackend)
+    with pytest.raises(ValueError):
+        get_backend('missing')
+
+
+def test_analyze_route_with_lexicon_backend(app, client, session_headers, captcha_ok):
+    app.config['SENTIMENT_BACKEND'] = 'lexicon'
+
+    response = client.post('/api/analyze', json={'text': 'What a wonderful, happy day', 'captchaToken': 't'},
+                           headers=session_headers)
+
+    assert response.status_code == 200
+    assert response.json['sentiment']['label'] == 'positive'
+    saved = Analysis.query.one()
+    assert saved.emotion_joy == response.json['emotions']['joy']
+
+
+def test_batch_route_with_lexicon_backend(app, client, session_headers, captcha_ok):
+    app.config['SENTIMENT_BACKEND'] = 'lexicon'
+
+    response = client.post('/api/analyze/batch', json={'texts': ['I love it', 'I hate it'], 'captchaToken': 't'},
+                           headers=session_headers)
+
+    labels = [item['data']['sentiment']['label'] for item in response.json['results']]
+    assert labels == ['positive', 'negative']
+    assert Analysis.query.count() == 2
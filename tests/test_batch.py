@@ -0,0 +1,88 @@
+# tests/test_batch.py
+import threading
+from api.models import Analysis
+
+
+def fake_analyze_text(text, features=None, keyword_limit=None, timeout=None):
+    if text == "boom":
+        return {"error": "Watson API Error: boom", "status": 502}
+    return {
+        "data": {"sentiment": {"label": "positive", "score": len(text) / 100}, "emotions": {}, "keywords": []},
+        "status": 200
+    }
+
+
+def test_batch_returns_results_in_input_order(client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.services.watson_service.analyze_text', side_effect=fake_analyze_text)
+    texts = ["a" * n for n in range(1, 8)]
+
+    response = client.post('/api/analyze/batch', json={'texts': texts, 'captchaToken': 't'}, headers=session_headers)
+
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [item['index'] for item in results] == list(range(len(texts)))
+    assert [item['data']['sentiment']['score'] for item in results] == [n / 100 for n in range(1, 8)]
+    assert Analysis.query.count() == len(texts)
+    assert captcha_ok.call_count == 1
+
+
+def test_batch_runs_watson_calls_concurrently(app, client, mocker, session_headers, captcha_ok):
+    app.config['BATCH_MAX_WORKERS'] = 4
+    barrier = threading.Barrier(4, timeout=5)
+
+    def slow_analyze(text, features=None, keyword_limit=None, timeout=None):
+        # Only passes if four calls are in flight at the same time
+        barrier.wait()
+        return fake_analyze_text(text)
+
+    mocker.patch('api.services.watson_service.analyze_text', side_effect=slow_analyze)
+    texts = [f"text {n}" for n in range(4)]
+
+    response = client.post('/api/analyze/batch', json={'texts': texts, 'captchaToken': 't'}, headers=session_headers)
+
+    assert response.status_code == 200
+    assert all(item['status'] == 200 for item in response.json['results'])
+
+
+def test_batch_reports_per_item_errors(client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.services.watson_service.analyze_text', side_effect=fake_analyze_text)
+
+    response = client.post(
+        '/api/analyze/batch',
+        json={'texts': ["fine", "boom", "   ", "x" * 1001], 'captchaToken': 't'},
+        headers=session_headers
+    )
+
+    statuses = [item['status'] for item in response.json['results']]
+    assert statuses == [200, 502, 400, 413]
+    assert Analysis.query.count() == 1
+
+
+def test_batch_counts_whole_batch_against_daily_limit(app, client, mocker, session_headers, captcha_ok):
+    app.config['DAILY_ANALYSIS_LIMIT_PER_SESSION'] = 5
+    watson = mocker.patch('api.services.watson_service.analyze_text', side_effect=fake_analyze_text)
+
+    ok = client.post('/api/analyze/batch', json={'texts': ["one", "two", "three"], 'captchaToken': 't'}, headers=session_headers)
+    too_many = client.post('/api/analyze/batch', json={'texts': ["four", "five", "six"], 'captchaToken': 't'}, headers=session_headers)
+
+    assert ok.status_code == 200
+    assert too_many.status_code == 429
+    assert watson.call_count == 3
+
+
+def test_batch_gives_failed_items_back_to_the_daily_limit(app, client, mocker, session_headers, captcha_ok):
+    app.config['DAILY_ANALYSIS_LIMIT_PER_SESSION'] = 4
+    mocker.patch('api.services.watson_service.analyze_text', side_effect=fake_analyze_text)
+
+    first = client.post('/api/analyze/batch', json={'texts': ["one", "boom", "   "], 'captchaToken': 't'}, headers=session_headers)
+    second = client.post('/api/analyze/batch', json={'texts': ["two", "three", "four"], 'captchaToken': 't'}, headers=session_headers)
+
+    assert [item['status'] for item in first.json['results']] == [200, 502, 400]
+    assert second.status_code == 200
+    assert Analysis.query.count() == 4
+
+
+def test_batch_rejects_oversized_batches(app, client, session_headers, captcha_ok):
+    app.config['BATCH_MAX_ITEMS'] = 2
+    response = client.post('/api/analyze/batch', json={'texts': ["a", "b", "c"], 'captchaToken': 't'}, headers=session_headers)
+    assert response.status_code == 413
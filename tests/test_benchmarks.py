@@ -0,0 +1,48 @@
+# tests/test_benchmarks.py
+from benchmarks import load
+from benchmarks.common import percentiles
+from benchmarks.compare import compare
+
+
+def test_percentiles_use_nearest_rank():
+    values = list(range(1, 101))
+    assert percentiles(values) == {'p50': 50, 'p95': 95, 'p99': 99}
+    assert percentiles([]) == {'p50': None, 'p95': None, 'p99': None}
+
+
+def test_load_run_against_stand_ins():
+    report = load.run(
+        concurrency_levels=[2], table_sizes=[0, 20], requests_per_level=4, warmup=1, latency_ms=0, jitter_ms=0
+    )
+
+    assert {(row['endpoint'], row['table_size']) for row in report['results']} == {
+        (endpoint, size) for endpoint in load.ENDPOINTS for size in (0, 20)
+    }
+    for row in report['results']:
+        assert row['error_rate'] == 0.0
+        assert row['latency_ms']['p50'] <= row['latency_ms']['p99']
+    # The app really went through the Watson and reCAPTCHA stand-ins
+    assert report['stub_calls']['analyze'] >= 8
+    assert report['stub_calls']['siteverify'] >= 8
+
+
+def test_compare_flags_slower_latency_and_lower_throughput():
+    def report(p95, rps):
+        return {'load': {'results': [{
+            'endpoint': 'history', 'table_size': 0, 'concurrency': 1,
+            'latency_ms': {'p95': p95}, 'throughput_rps': rps,
+        }]}}
+
+    assert compare(report(10, 100), report(10.5, 98), threshold=0.1) == []
+    regressions = {key for key, *_ in compare(report(10, 100), report(12, 80), threshold=0.1)}
+    assert regressions == {'load history rows=0 c=1 p95_ms', 'load history rows=0 c=1 throughput_rps'}
+
+
+def test_startup_profile_defers_heavy_imports():
+    from benchmarks import startup
+
+    report = startup.run('api.config.TestingConfig', runs=1)
+
+    assert report['deferred_loaded'] == []
+    assert report['modules'][0]['module'] == 'api'
+    assert report['create_app_ms'] > 0
@@ -0,0 +1,32 @@
+# tests/test_cache.py
+from api.services.cache import TTLCache, make_cache_key
+
+
+def test_cache_key_ignores_whitespace_differences():
+    assert make_cache_key("Great  product!\n") == make_cache_key(" Great product!")
+    assert make_cache_key("Great product!") != make_cache_key("Great product?")
+
+
+def test_cache_key_depends_on_features():
+    assert make_cache_key("text", "sentiment") != make_cache_key("text", "sentiment,emotion")
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('api.services.cache.time.monotonic', lambda: now[0])
+    cache = TTLCache(max_entries=10, ttl=5)
+    cache.set('a', 1)
+    now[0] += 6
+    assert cache.get('a') is None
+    assert len(cache) == 0
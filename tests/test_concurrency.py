@@ -0,0 +1,191 @@
+# tests/test_concurrency.py
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import requests
+from api import create_app, db
+from api.config import ProductionConfig, TestingConfig
+from api.services.concurrency import ConcurrencyLimiter, Overloaded, watson_limiter
+from api.services.usage import usage_counter
+
+TEXT = 'The support team solved my problem in minutes.'
+
+
+def hold_slots(limiter, count):
+    """Occupies `count` slots from other threads until the returned event is set."""
+    release, held = threading.Event(), threading.Semaphore(0)
+
+    def worker():
+        with limiter.slot():
+            held.release()
+            release.wait(5)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        held.acquire(timeout=5)
+    return release, threads
+
+
+def test_callers_wait_in_line_for_a_free_slot():
+    limiter = ConcurrencyLimiter('test', max_concurrency=1, max_queue=1, queue_timeout=2)
+    release, threads = hold_slots(limiter, 1)
+    threading.Timer(0.05, release.set).start()
+
+    with limiter.slot():
+        assert limiter.stats()['in_flight'] == 1
+    for thread in threads:
+        thread.join()
+    assert limiter.stats()['queued'] == 1
+    assert limiter.stats()['in_flight'] == 0
+
+
+def test_full_queue_and_timeouts_are_shed():
+    limiter = ConcurrencyLimiter('test', max_concurrency=1, max_queue=0, queue_timeout=0.05)
+    release, threads = hold_slots(limiter, 1)
+    try:
+        with pytest.raises(Overloaded) as shed:
+            limiter.acquire()
+        assert shed.value.reason == 'queue_full'
+        assert shed.value.retry_after >= 1
+
+        limiter.max_queue = 1
+        with pytest.raises(Overloaded) as shed:
+            limiter.acquire()
+        assert shed.value.reason == 'timeout'
+        assert limiter.stats()['shed'] == 2
+        assert limiter.stats()['queue_depth'] == 0
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_a_wait_longer_than_the_deadline_is_shed_at_once():
+    limiter = ConcurrencyLimiter('test', max_concurrency=1, max_queue=5, queue_timeout=1)
+    # Calls take ~3s, so a second caller would wait longer than it may
+    limiter._avg_seconds = 3.0
+    release, threads = hold_slots(limiter, 1)
+    try:
+        started = time.monotonic()
+        with pytest.raises(Overloaded) as shed:
+            limiter.acquire()
+        assert time.monotonic() - started < 0.5
+        assert shed.value.reason == 'deadline'
+        assert shed.value.retry_after == 3
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_host_slots_are_shared_between_limiters(tmp_path):
+    # Two limiters stand in for two workers: each opens the slot files itself
+    first, second = (ConcurrencyLimiter('watson', max_concurrency=4, queue_timeout=0.05) for _ in range(2))
+    for limiter in (first, second):
+        limiter.host_slots, limiter.slot_dir = 1, str(tmp_path)
+
+    with first.slot():
+        with pytest.raises(Overloaded) as shed:
+            with second.slot():
+                pass
+        assert shed.value.reason == 'host_busy'
+        assert second.stats()['in_flight'] == 0
+    with second.slot():
+        pass
+
+
+def test_shed_analysis_is_answered_with_retry_after(client, mocker, session_headers, captcha_ok):
+    watson = mocker.patch('api.services.watson_service.analyze_text')
+    mocker.patch.object(watson_limiter, 'acquire', side_effect=Overloaded('queue_full', 7))
+
+    response = client.post('/api/analyze', headers=session_headers, json={'text': TEXT, 'captchaToken': 't'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '7'
+    watson.assert_not_called()
+    # Shedding isn't Watson's fault, and the quota unit is given back
+    assert client.get('/api/circuit/stats').json['state'] == 'closed'
+    assert usage_counter.get(session_headers['X-Session-ID']) == 0
+
+
+def test_concurrency_stats(client):
+    stats = client.get('/api/concurrency/stats').json
+    assert stats['in_flight'] == 0
+    assert stats['max_concurrency'] == 4
+
+
+class GunicornConfig(ProductionConfig):
+    """Loaded by the gunicorn workers of the test below (APP_CONFIG)."""
+    RATELIMIT_ENABLED = False
+    FALLBACK_BACKEND = None
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def test_shedding_under_gunicorn_workers(tmp_path):
+    from benchmarks.stubs import StubServer
+
+    database_url = f"sqlite:///{tmp_path / 'app.db'}"
+
+    class SchemaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    with create_app(SchemaConfig).app_context():
+        db.create_all()
+
+    port = free_port()
+    with StubServer(latency_ms=300) as stub:
+        env = {
+            **os.environ,
+            'APP_CONFIG': 'tests.test_concurrency.GunicornConfig', 'DATABASE_URL': database_url,
+            'WATSON_API_KEY': 'key', 'WATSON_URL': stub.url, 'WATSON_IAM_URL': stub.url,
+            'RECAPTCHA_SECRET_KEY': 'secret', 'RECAPTCHA_VERIFY_URL': stub.siteverify_url,
+            'PROMETHEUS_MULTIPROC_DIR': str(tmp_path / 'metrics'), 'OUTBOUND_SLOT_DIR': str(tmp_path / 'slots'),
+            # gunicorn.conf.py's threaded workers, with one Watson call per host
+            'WEB_CONCURRENCY': '2', 'OUTBOUND_MAX_CONCURRENCY': '1', 'OUTBOUND_MAX_QUEUE': '1',
+            'OUTBOUND_HOST_CONCURRENCY': '1',
+        }
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', 'run:app'],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        try:
+            base = f'http://127.0.0.1:{port}/api'
+            for _ in range(100):
+                try:
+                    requests.get(f'{base}/health', timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.1)
+
+            def analyze(n):
+                return requests.post(
+                    f'{base}/analyze', timeout=30,
+                    json={'text': f'{TEXT} ({n})', 'captchaToken': 't'},
+                    headers={'X-Session-ID': f'00000000-0000-0000-0000-{n:012d}'},
+                )
+
+            with ThreadPoolExecutor(max_workers=12) as pool:
+                responses = list(pool.map(analyze, range(12)))
+        finally:
+            server.terminate()
+            server.wait(10)
+
+    statuses = [response.status_code for response in responses]
+    assert 200 in statuses
+    shed = [response for response in responses if response.status_code == 503]
+    # At most one call waits per worker: the rest are shed at once
+    assert len(shed) >= 12 - 2 * 2
+    assert all(int(response.headers['Retry-After']) >= 1 for response in shed)
+    assert set(statuses) <= {200, 503}
@@ -0,0 +1,100 @@
+# tests/test_database.py
+from datetime import datetime
+import pytest
+from sqlalchemy import text
+from api import create_app, db
+from api.config import TestingConfig
+from api.models import Analysis, SessionDailyUsage
+from api.services.database import _dispose_after_fork, engine_options, get_replica_engine
+from api.services.usage import _today
+
+SESSION = '11111111-2222-3333-4444-555555555555'
+WATSON_RESULT = {"data": {"sentiment": {"label": "positive", "score": 0.9}, "emotions": {}, "keywords": []},
+                 "status": 200}
+
+
+@pytest.fixture
+def split_app(tmp_path):
+    """An app whose primary and read replica are two separate SQLite files."""
+    class ReplicaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        DATABASE_REPLICA_URL = f"sqlite:///{tmp_path / 'replica.db'}"
+
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(get_replica_engine())
+        yield app
+        db.session.remove()
+        for engine in (*db.engines.values(), get_replica_engine()):
+            engine.dispose()
+
+
+def replica_count(table):
+    with get_replica_engine().connect() as connection:
+        return connection.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+
+
+def add_to_replica(*rows):
+    with get_replica_engine().begin() as connection:
+        for table, values in rows:
+            connection.execute(table.__table__.insert().values(**values))
+
+
+def test_engine_options_for_postgresql():
+    config = {'DATABASE_SSLMODE': 'require', 'DB_POOL_SIZE': 3, 'DB_MAX_OVERFLOW': 2}
+
+    options = engine_options(config, 'postgresql://user@db.example.com/sentiment')
+    assert options['pool_pre_ping'] is True
+    assert (options['pool_size'], options['max_overflow']) == (3, 2)
+    assert options['connect_args']['sslmode'] == 'require'
+    # The URL's own sslmode wins
+    assert 'sslmode' not in engine_options(config, 'postgresql://db/sentiment?sslmode=disable')['connect_args']
+    assert 'pool_size' not in engine_options(config, 'sqlite:///:memory:')
+
+
+def test_reads_go_to_the_replica(split_app, session_headers):
+    client = split_app.test_client()
+    add_to_replica((Analysis, {'session_id': SESSION, 'text_content': 'only on the replica',
+                               'sentiment_label': 'neutral', 'sentiment_score': 0.0,
+                               'created_at': datetime(2026, 10, 1)}))
+
+    history = client.get('/api/history', headers=session_headers)
+
+    assert [item['text_content'] for item in history.json] == ['only on the replica']
+    assert Analysis.query.count() == 0
+
+
+def test_daily_limit_check_reads_the_replica(split_app, session_headers, mocker, captcha_ok):
+    client = split_app.test_client()
+    add_to_replica((SessionDailyUsage, {'session_id': SESSION, 'usage_date': _today(), 'count': 10}))
+    analyze = mocker.patch('api.routes.analyze_text', return_value=WATSON_RESULT)
+
+    response = client.post('/api/analyze', json={'text': 'limited', 'captchaToken': 't'}, headers=session_headers)
+
+    assert response.status_code == 429
+    analyze.assert_not_called()
+
+
+def test_writes_go_to_the_primary(split_app, session_headers, mocker, captcha_ok):
+    client = split_app.test_client()
+    mocker.patch('api.routes.analyze_text', return_value=WATSON_RESULT)
+
+    response = client.post('/api/analyze', json={'text': 'a great day', 'captchaToken': 't'}, headers=session_headers)
+
+    assert response.status_code == 200
+    assert [analysis.text_content for analysis in Analysis.query] == ['a great day']
+    assert replica_count('analyses') == 0
+    # Nothing replicates in the test, so the replica still shows no history
+    assert client.get('/api/history', headers=session_headers).json == []
+
+
+def test_forked_children_drop_pooled_connections(split_app):
+    db.session.execute(text("SELECT 1"))
+    db.session.remove()
+    engines = [db.engine, get_replica_engine()]
+    pools = [engine.pool for engine in engines]
+
+    _dispose_after_fork()
+
+    assert all(engine.pool is not pool for engine, pool in zip(engines, pools))
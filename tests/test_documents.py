@@ -0,0 +1,95 @@
+# tests/test_documents.py
+import pytest
+from api.models import Analysis
+from api.services.documents import chunk_text, merge_results, split_sentences
+from api.services.usage import usage_counter
+
+SESSION = '11111111-2222-3333-4444-555555555555'
+
+
+def test_split_sentences_keeps_offsets():
+    text = 'First one. Second "quoted!" Third?\n\nNew paragraph without a stop'
+    sentences = [text[start:end] for start, end in split_sentences(text)]
+    assert sentences == ['First one.', 'Second "quoted!"', 'Third?', 'New paragraph without a stop']
+
+
+def test_chunks_follow_sentence_boundaries():
+    text = ' '.join(f'Sentence number {n} is here.' for n in range(40))
+    chunks = chunk_text(text, 100)
+    assert all(end - start <= 100 for start, end in chunks)
+    assert all(text[start:end].endswith('.') for start, end in chunks)
+    # Nothing is lost between chunks
+    assert ' '.join(text[start:end] for start, end in chunks) == text
+
+
+def test_a_sentence_longer_than_a_chunk_is_cut_at_spaces():
+    text = 'word ' * 50
+    chunks = chunk_text(text, 32)
+    assert all(end - start <= 32 for start, end in chunks)
+    assert all(not text[start:end].startswith(' ') for start, end in chunks)
+    assert ''.join(text[start:end] for start, end in chunks).replace(' ', '') == text.replace(' ', '')
+
+
+def test_merge_weights_by_chunk_length():
+    merged = merge_results([300, 100], [
+        {"sentiment": {"label": "positive", "score": 0.8}, "emotions": {"joy": 0.8, "anger": 0.0},
+         "keywords": [{"text": "Battery", "relevance": 0.9, "count": 2}]},
+        {"sentiment": {"label": "negative", "score": -0.4}, "emotions": {"joy": 0.0, "anger": 0.8},
+         "keywords": [{"text": "battery", "relevance": 0.5, "count": 1}, {"text": "screen", "relevance": 1.0}]},
+    ])
+    assert merged["sentiment"] == {"label": "positive", "score": pytest.approx(0.5)}
+    assert merged["emotions"] == {"joy": pytest.approx(0.6), "anger": pytest.approx(0.2)}
+    assert merged["keywords"][0] == {"text": "Battery", "relevance": pytest.approx(0.8), "count": 3}
+    assert merged["keywords"][1]["text"] == "screen"
+
+
+def fake_analyze_text(text, features=None, keyword_limit=None, timeout=None):
+    score = 0.9 if 'good' in text else -0.9
+    return {"data": {"sentiment": {"label": "x", "score": score}, "emotions": {"joy": 0.5}, "keywords": []},
+            "status": 200}
+
+
+@pytest.fixture
+def document_app(app, mocker):
+    app.config.update(LONG_DOCUMENT_CHUNK_CHARS=100)
+    return mocker.patch('api.services.watson_service.analyze_text', side_effect=fake_analyze_text)
+
+
+def test_long_document_is_analyzed_in_chunks_and_counts_once(app, client, session_headers, captcha_ok, document_app):
+    text = 'This part is good. ' * 15 + 'This part is bad. ' * 5
+
+    response = client.post('/api/analyze/document', json={'text': text, 'captchaToken': 't', 'includeChunks': True},
+                           headers=session_headers)
+
+    assert response.status_code == 200
+    body = response.json
+    assert document_app.call_count == len(body['chunks']) > 1
+    assert body['sentiment']['label'] == 'positive'
+    assert 0 < body['sentiment']['score'] < 0.9
+    assert [chunk['index'] for chunk in body['chunks']] == list(range(len(body['chunks'])))
+    assert Analysis.query.count() == 1
+    assert Analysis.query.one().text_content == text
+    assert usage_counter.get(SESSION) == 1
+
+
+def test_document_without_breakdown_is_cached(client, session_headers, captcha_ok, document_app):
+    payload = {'text': 'A good sentence. ' * 20, 'captchaToken': 't'}
+    first = client.post('/api/analyze/document', json=payload, headers=session_headers)
+    calls = document_app.call_count
+    second = client.post('/api/analyze/document', json=payload, headers=session_headers)
+
+    assert 'chunks' not in first.json
+    assert second.json == first.json
+    assert document_app.call_count == calls
+
+
+def test_document_limits_and_failures(app, client, session_headers, captcha_ok, mocker):
+    app.config['LONG_DOCUMENT_MAX_CHARS'] = 50
+    response = client.post('/api/analyze/document', json={'text': 'x' * 51, 'captchaToken': 't'}, headers=session_headers)
+    assert response.status_code == 413
+
+    mocker.patch('api.services.watson_service.analyze_text', return_value={"error": "Watson down", "status": 502})
+    response = client.post('/api/analyze/document', json={'text': 'Short text.', 'captchaToken': 't'},
+                           headers=session_headers)
+    assert response.status_code == 502
+    assert usage_counter.get(SESSION) == 0
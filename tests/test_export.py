@@ -0,0 +1,81 @@
+# tests/test_export.py
+import csv
+import io
+import json
+import tracemalloc
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from api import db
+from api.models import Analysis
+from api.services.storage import compact_mappings
+
+SESSION = '11111111-2222-3333-4444-555555555555'
+
+
+def seed(count, text_length=20):
+    base = datetime(2026, 1, 1)
+    rows = [
+        {
+            'session_id': SESSION,
+            'text_content': f"{n:06d} " + "y" * text_length,
+            'sentiment_label': 'positive',
+            'sentiment_score': 0.5,
+            'emotion_joy': 0.25,
+            'keywords': [{"text": "y", "relevance": 0.9}],
+            'created_at': base + timedelta(seconds=n),
+        }
+        for n in range(count)
+    ]
+    db.session.execute(insert(Analysis), compact_mappings(db.session, rows))
+    db.session.execute(insert(Analysis), compact_mappings(db.session, [{**rows[0], 'session_id': 'other'}]))
+    db.session.commit()
+
+
+def test_ndjson_export_matches_to_dict(client, app, session_headers):
+    seed(3)
+
+    response = client.get('/api/history/export?format=ndjson', headers=session_headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    expected = Analysis.query.filter_by(session_id=SESSION).order_by(Analysis.created_at).all()
+    assert [json.loads(line) for line in lines] == [analysis.to_dict() for analysis in expected]
+
+
+def test_csv_export(client, app, session_headers):
+    seed(3)
+
+    response = client.get('/api/history/export?format=csv', headers=session_headers)
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 3
+    assert rows[0]['text_content'].startswith('000000')
+    assert json.loads(rows[0]['keywords']) == [{"text": "y", "relevance": 0.9}]
+    assert 'attachment' in response.headers['Content-Disposition']
+
+
+def test_export_rejects_unknown_format(client, session_headers):
+    assert client.get('/api/history/export?format=xml', headers=session_headers).status_code == 400
+
+
+def test_large_export_streams_in_bounded_memory(client, app, session_headers):
+    """Exporting ~20 MB of rows must not hold the whole result set in memory."""
+    rows = 10000
+    seed(rows, text_length=2000)
+
+    tracemalloc.start()
+    try:
+        response = client.get('/api/history/export?format=ndjson', headers=session_headers, buffered=False)
+        total_bytes, lines = 0, 0
+        for chunk in response.response:
+            total_bytes += len(chunk)
+            lines += chunk.count(b'\n') if isinstance(chunk, bytes) else chunk.count('\n')
+        response.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert lines == rows
+    assert total_bytes > 20 * 1024 * 1024
+    assert peak < 5 * 1024 * 1024
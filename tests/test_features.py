@@ -0,0 +1,90 @@
+# tests/test_features.py
+from api.models import Analysis
+from api.services.cache import result_cache
+from api.services.lexicon_service import LexiconBackend
+from api.services.watson_service import build_features
+
+TEXT = 'The delivery was quick and the packaging was lovely.'
+DATA = {
+    "sentiment": {"label": "positive", "score": 0.8},
+    "emotions": {"joy": 0.9, "sadness": 0.0, "fear": 0.0, "disgust": 0.0, "anger": 0.0},
+    "keywords": [{"text": f"keyword {n}", "relevance": 1 - n / 10} for n in range(10)],
+}
+
+
+def fake_analyze_text(text, features, keyword_limit):
+    """Returns only what was asked for, like the Watson backend."""
+    data = {}
+    if 'sentiment' in features:
+        data["sentiment"] = DATA["sentiment"]
+    if 'emotion' in features:
+        data["emotions"] = DATA["emotions"]
+    if 'keywords' in features:
+        data["keywords"] = DATA["keywords"][:keyword_limit]
+    return {"data": data, "status": 200}
+
+
+def analyze(client, headers, **options):
+    return client.post('/api/analyze', headers=headers, json={'text': TEXT, 'captchaToken': 't', **options})
+
+
+def test_only_requested_features_are_fetched_and_stored(client, mocker, session_headers, captcha_ok):
+    watson = mocker.patch('api.routes.analyze_text', side_effect=fake_analyze_text)
+
+    response = analyze(client, session_headers, features=['sentiment'])
+
+    assert response.status_code == 200
+    assert response.json == {"sentiment": DATA["sentiment"]}
+    assert watson.call_args.kwargs['features'] == ('sentiment',)
+    row = Analysis.query.one()
+    assert row.sentiment_label == 'positive'
+    assert (row.emotion_joy, row.keywords, row.keyword_limit) == (None, None, None)
+    assert row.to_dict()['emotions'] is None
+
+
+def test_a_wider_request_only_fetches_the_missing_features(client, mocker, session_headers, captcha_ok):
+    watson = mocker.patch('api.routes.analyze_text', side_effect=fake_analyze_text)
+    analyze(client, session_headers, features=['sentiment'])
+
+    response = analyze(client, session_headers, keywordLimit=3)
+
+    assert watson.call_args.kwargs == {'features': ('emotion', 'keywords'), 'keyword_limit': 3}
+    assert response.json == {"sentiment": DATA["sentiment"], "emotions": DATA["emotions"], "keywords": DATA["keywords"][:3]}
+
+    # Everything is cached now, per feature and keyword limit
+    analyze(client, session_headers, features=['keywords', 'emotion'], keywordLimit=3)
+    assert watson.call_count == 2
+
+
+def test_features_are_read_back_from_stored_rows(client, mocker, session_headers, captcha_ok):
+    watson = mocker.patch('api.routes.analyze_text', side_effect=fake_analyze_text)
+    analyze(client, session_headers, features=['sentiment'])
+    analyze(client, session_headers, features=['emotion', 'keywords'], keywordLimit=8)
+    # Only the database tier is left
+    result_cache._memory.clear()
+
+    response = analyze(client, session_headers, keywordLimit=5)
+
+    assert watson.call_count == 2
+    assert response.json["keywords"] == DATA["keywords"][:5]
+    assert response.json["sentiment"] == DATA["sentiment"]
+
+
+def test_invalid_feature_requests_are_rejected(client, mocker, session_headers, captcha_ok):
+    watson = mocker.patch('api.routes.analyze_text', side_effect=fake_analyze_text)
+    assert analyze(client, session_headers, features=['sentiment', 'syntax']).status_code == 400
+    assert analyze(client, session_headers, features=[]).status_code == 400
+    assert analyze(client, session_headers, keywordLimit=0).status_code == 400
+    assert analyze(client, session_headers, keywordLimit='5').status_code == 400
+    watson.assert_not_called()
+
+
+def test_watson_request_names_only_the_requested_features():
+    assert build_features(('sentiment',), 5)._to_dict() == {'sentiment': {}}
+    assert build_features(('emotion', 'keywords'), 3)._to_dict() == {'emotion': {}, 'keywords': {'limit': 3}}
+
+
+def test_lexicon_backend_returns_only_requested_features():
+    data = LexiconBackend().analyze('great great product, terrible box', ('keywords',), 1)["data"]
+    assert list(data) == ['keywords']
+    assert len(data['keywords']) == 1
@@ -0,0 +1,92 @@
+# tests/test_history.py
+from datetime import datetime, timedelta
+import pytest
+from api import db
+from api.models import Analysis
+
+SESSION = '11111111-2222-3333-4444-555555555555'
+
+
+@pytest.fixture
+def history(app):
+    """25 analyses for the session (two share a timestamp) and one for another session."""
+    base = datetime(2026, 10, 1, 12, 0, 0)
+    rows = [
+        Analysis(
+            session_id=SESSION,
+            text_content=f"analysis number {n} " + "x" * 80,
+            sentiment_label='positive',
+            sentiment_score=n / 100,
+            emotion_joy=0.5,
+            keywords=[{"text": f"kw{n}", "relevance": 0.5}],
+            created_at=base + timedelta(minutes=n if n != 24 else 23),
+        )
+        for n in range(25)
+    ]
+    rows.append(Analysis(session_id='other', text_content='not mine', sentiment_label='neutral',
+                         sentiment_score=0.0, created_at=base))
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+def test_history_default_page_matches_to_dict(client, history, session_headers):
+    response = client.get('/api/history', headers=session_headers)
+
+    assert response.status_code == 200
+    newest_first = sorted(history[:25], key=lambda a: (a.created_at, a.id), reverse=True)
+    assert response.json == [analysis.to_dict() for analysis in newest_first[:10]]
+    assert 'X-Next-Cursor' in response.headers
+
+
+def test_history_cursor_walks_every_row_once(client, history, session_headers):
+    seen, cursor = [], None
+    while True:
+        query = '/api/history?limit=7' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(query, headers=session_headers)
+        seen.extend(item['id'] for item in response.json)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+
+    assert len(seen) == 25
+    assert len(set(seen)) == 25
+    assert 'not mine' not in [a.text_content for a in Analysis.query.filter(Analysis.id.in_(seen))]
+
+
+def test_history_returns_only_requested_fields(client, history, session_headers):
+    response = client.get('/api/history?fields=id,sentiment_label,text_snippet&limit=2', headers=session_headers)
+
+    assert response.status_code == 200
+    assert set(response.json[0]) == {'id', 'sentiment_label', 'text_snippet'}
+    assert response.json[0]['text_snippet'].endswith('...')
+
+
+def test_history_rejects_bad_parameters(client, session_headers):
+    assert client.get('/api/history?fields=password', headers=session_headers).status_code == 400
+    assert client.get('/api/history?cursor=not-a-cursor', headers=session_headers).status_code == 400
+    assert client.get('/api/history?limit=1000', headers=session_headers).status_code == 400
+
+
+def test_history_supports_conditional_get(client, history, session_headers):
+    first = client.get('/api/history', headers=session_headers)
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified']
+
+    unchanged = client.get('/api/history', headers={**session_headers, 'If-None-Match': etag})
+    assert unchanged.status_code == 304
+    assert unchanged.get_data() == b''
+
+    db.session.add(Analysis(session_id=SESSION, text_content='new one', sentiment_label='neutral',
+                            sentiment_score=0.0, created_at=datetime(2026, 10, 2)))
+    db.session.commit()
+
+    changed = client.get('/api/history', headers={**session_headers, 'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.json[0]['text_content'] == 'new one'
+
+
+def test_history_etag_depends_on_fields(client, history, session_headers):
+    full = client.get('/api/history', headers=session_headers)
+    projected = client.get('/api/history?fields=id', headers={**session_headers, 'If-None-Match': full.headers['ETag']})
+    assert projected.status_code == 200
@@ -0,0 +1,142 @@
+# tests/test_jobs.py
+import json
+import threading
+import time
+import pytest
+from api.models import Analysis
+from api.services.jobs import DatabaseJobStore, MemoryJobStore, job_manager, JOB_SUCCEEDED, JOB_FAILED
+
+WATSON_RESULT = {
+    "data": {"sentiment": {"label": "negative", "score": -0.4}, "emotions": {"anger": 0.6}, "keywords": []},
+    "status": 200
+}
+
+
+def wait_until_finished(client, job_id, headers, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = client.get(f'/api/jobs/{job_id}', headers=headers)
+        if response.json['status'] in (JOB_SUCCEEDED, JOB_FAILED):
+            return response
+        time.sleep(0.01)
+    raise AssertionError("job did not finish in time")
+
+
+@pytest.mark.parametrize('store_factory', [MemoryJobStore, DatabaseJobStore])
+def test_job_store_round_trip(app, store_factory):
+    store = store_factory()
+    job = store.create('session-1')
+    assert store.get(job['id'])['status'] == 'queued'
+
+    store.update(job['id'], status=JOB_SUCCEEDED, status_code=200, result={"ok": True})
+
+    stored = store.get(job['id'])
+    assert stored['status'] == JOB_SUCCEEDED
+    assert stored['result'] == {"ok": True}
+    assert stored['session_id'] == 'session-1'
+    assert store.get('missing') is None
+
+
+def test_async_analyze_returns_202_and_result_can_be_polled(client, mocker, session_headers, captcha_ok):
+    release = threading.Event()
+
+    def slow_analyze(text, **options):
+        release.wait(timeout=5)
+        return WATSON_RESULT
+
+    mocker.patch('api.routes.analyze_text', side_effect=slow_analyze)
+
+    response = client.post('/api/analyze?async=1', json={'text': 'Slow text', 'captchaToken': 't'}, headers=session_headers)
+
+    assert response.status_code == 202
+    job_id = response.json['job_id']
+    assert response.headers['Location'] == f'/api/jobs/{job_id}'
+    assert client.get(f'/api/jobs/{job_id}', headers=session_headers).json['status'] in ('queued', 'running')
+
+    release.set()
+    finished = wait_until_finished(client, job_id, session_headers)
+
+    assert finished.json['status'] == JOB_SUCCEEDED
+    assert finished.json['result'] == WATSON_RESULT['data']
+    assert Analysis.query.count() == 1
+    assert finished.json['analysis_id'] == Analysis.query.first().id
+
+
+def test_async_analyze_reports_watson_errors(client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.routes.analyze_text', return_value={"error": "Watson API Error: down", "status": 503})
+
+    response = client.post('/api/analyze', json={'text': 'Text', 'captchaToken': 't'},
+                           headers={**session_headers, 'Prefer': 'respond-async'})
+    finished = wait_until_finished(client, response.json['job_id'], session_headers)
+
+    assert finished.json['status'] == JOB_FAILED
+    assert finished.json['status_code'] == 503
+    assert Analysis.query.count() == 0
+
+
+def test_jobs_are_scoped_to_their_session(client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.routes.analyze_text', return_value=WATSON_RESULT)
+    response = client.post('/api/analyze?async=1', json={'text': 'Text', 'captchaToken': 't'}, headers=session_headers)
+
+    wait_until_finished(client, response.json['job_id'], session_headers)
+
+    other = client.get(f"/api/jobs/{response.json['job_id']}", headers={'X-Session-ID': 'someone-else'})
+    assert other.status_code == 404
+
+
+def test_job_events_stream_until_finished(client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.routes.analyze_text', return_value=WATSON_RESULT)
+    response = client.post('/api/analyze?async=1', json={'text': 'Text', 'captchaToken': 't'}, headers=session_headers)
+    job_id = response.json['job_id']
+
+    events = client.get(f"/api/jobs/{job_id}/events?session_id={session_headers['X-Session-ID']}")
+
+    assert events.mimetype == 'text/event-stream'
+    messages = [block for block in events.get_data(as_text=True).split('\n\n') if block]
+    last_event, last_data = messages[-1].split('\n')
+    assert last_event == f'event: {JOB_SUCCEEDED}'
+    assert json.loads(last_data[len('data: '):])['result'] == WATSON_RESULT['data']
+
+
+def test_database_job_store_is_used_when_configured(app):
+    app.config['JOB_STORE'] = 'database'
+    job_manager.init_app(app)
+    try:
+        assert isinstance(job_manager.store, DatabaseJobStore)
+    finally:
+        app.config['JOB_STORE'] = 'memory'
+        job_manager.init_app(app)
+
+
+@pytest.mark.parametrize('store_factory', [MemoryJobStore, DatabaseJobStore])
+def test_jobs_left_running_past_the_ttl_are_reported_failed(app, store_factory):
+    store = store_factory(ttl=0.05)
+    job = store.create('session-1')
+    store.update(job['id'], status='running')
+
+    assert store.get(job['id'])['status'] == 'running'
+    time.sleep(0.1)
+    stale = store.get(job['id'])
+    assert stale['status'] == JOB_FAILED
+    assert stale['status_code'] == 500
+
+
+def test_job_events_are_capped_per_worker(app, client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.routes.analyze_text', return_value=WATSON_RESULT)
+    response = client.post('/api/analyze?async=1', json={'text': 'Text', 'captchaToken': 't'}, headers=session_headers)
+    job_id = response.json['job_id']
+    wait_until_finished(client, job_id, session_headers)
+    url = f"/api/jobs/{job_id}/events?session_id={session_headers['X-Session-ID']}"
+
+    held = job_manager.event_streams
+    job_manager.event_streams = threading.BoundedSemaphore(1)
+    try:
+        open_stream = client.get(url, buffered=False)
+        refused = client.get(url)
+        assert refused.status_code == 503
+        assert refused.headers['Location'] == f'/api/jobs/{job_id}'
+
+        open_stream.close()
+        assert client.get(url).status_code == 200
+    finally:
+        job_manager.event_streams = held
@@ -0,0 +1,82 @@
+# tests/test_metrics.py
+import os
+import subprocess
+import sys
+import textwrap
+from prometheus_client import REGISTRY
+
+RESULT = {
+    "data": {"sentiment": {"label": "positive", "score": 0.9}, "emotions": {}, "keywords": []},
+    "status": 200
+}
+
+
+def server_timing(response):
+    """Parses a Server-Timing header into {name: milliseconds}."""
+    entries = {}
+    for entry in response.headers['Server-Timing'].split(', '):
+        name, duration = entry.split(';dur=')
+        entries[name] = float(duration)
+    return entries
+
+
+def stage_count(stage):
+    return REGISTRY.get_sample_value('sentiment_stage_duration_seconds_count', {'stage': stage}) or 0
+
+
+def test_analyze_reports_each_stage_in_server_timing(client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.services.watson_service.analyze_text', return_value=RESULT)
+
+    response = client.post('/api/analyze', json={'text': 'Timed text', 'captchaToken': 't'}, headers=session_headers)
+
+    assert response.status_code == 200
+    timings = server_timing(response)
+    assert {'daily_limit', 'quota', 'analysis', 'db_write', 'total'} <= set(timings)
+    assert timings['total'] >= timings['analysis']
+
+
+def test_recaptcha_call_is_timed(app, client, mocker, session_headers):
+    app.config['RECAPTCHA_SECRET_KEY'] = 'secret'
+    session = mocker.patch('api.routes.get_http_session').return_value
+    session.post.return_value.json.return_value = {'success': False}
+
+    response = client.post('/api/analyze', json={'text': 'x', 'captchaToken': 't'}, headers=session_headers)
+
+    assert response.status_code == 403
+    assert 'recaptcha' in server_timing(response)
+
+
+def test_metrics_endpoint_exposes_stage_histograms(client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.services.watson_service.analyze_text', return_value=RESULT)
+    before = stage_count('analysis')
+    client.post('/api/analyze', json={'text': 'Counted text', 'captchaToken': 't'}, headers=session_headers)
+    assert stage_count('analysis') == before + 1
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'sentiment_stage_duration_seconds_bucket{le="0.001",stage="analysis"}' in body
+    assert 'sentiment_http_request_duration_seconds_count{endpoint="main.analyze_route",method="POST",status="200"}' in body
+    assert 'Server-Timing' not in response.headers
+
+
+def test_metrics_are_summed_across_worker_processes(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    worker = textwrap.dedent("""
+        from api.services.metrics import timed
+        with timed('analysis'):
+            pass
+    """)
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', worker], env=env, check=True, cwd=os.getcwd())
+
+    scrape = textwrap.dedent("""
+        from api import create_app
+        app = create_app('api.config.TestingConfig')
+        print(app.test_client().get('/metrics').get_data(as_text=True))
+    """)
+    output = subprocess.run(
+        [sys.executable, '-c', scrape], env=env, check=True, capture_output=True, text=True, cwd=os.getcwd()
+    ).stdout
+    assert 'sentiment_stage_duration_seconds_count{stage="analysis"} 2.0' in output
@@ -0,0 +1,109 @@
+# tests/test_near_duplicates.py
+from unittest.mock import patch
+from api.models import db, Analysis, AnalysisSimhashBand
+from api.services.backends import get_backend
+from api.services.near_duplicates import find_near_duplicate, similarity, simhash, stored_signature
+from api.services.persistence import save_analyses
+
+SESSION = '11111111-2222-3333-4444-555555555555'
+REVIEW = ('The battery lasts two full days and the screen is bright and sharp even outdoors, '
+          'but the speakers sound thin at high volume and the charger gets warm.')
+RESULT = {
+    "sentiment": {"label": "positive", "score": 0.6},
+    "emotions": {"joy": 0.7, "sadness": 0.1, "fear": 0.0, "disgust": 0.0, "anger": 0.1},
+    "keywords": [{"text": "battery", "relevance": 0.9}],
+}
+
+
+def save(text):
+    # Signed in the namespace of the backend the routes use
+    signature = stored_signature(text, get_backend().cache_namespace)
+    analysis = Analysis.from_result(SESSION, text, RESULT, simhash=signature, keyword_limit=5)
+    save_analyses([analysis])
+    return analysis
+
+
+def test_signature_ignores_casing_and_punctuation():
+    assert simhash(REVIEW) == simhash(REVIEW.upper().replace(',', ' ').replace('.', '!!'))
+    assert simhash('too short') is None
+
+
+def test_small_edits_stay_similar_and_namespaces_never_match():
+    edited = REVIEW.replace('two full days', 'two whole days')
+    assert similarity(simhash(REVIEW), simhash(edited)) >= 0.9
+    assert similarity(simhash(REVIEW), simhash('A completely different sentence about the weather today.')) < 0.8
+    assert similarity(simhash(REVIEW, 'watson'), simhash(REVIEW, 'lexicon')) < 0.8
+
+
+def test_saving_indexes_one_row_per_band(app):
+    analysis = save(REVIEW)
+    assert AnalysisSimhashBand.query.filter_by(analysis_id=analysis.id).count() == 4
+
+    match = find_near_duplicate(REVIEW + '!', stored_signature(REVIEW + '!', get_backend().cache_namespace), 0.95)
+    assert match is not None
+    assert match[0].id == analysis.id
+
+
+def test_a_different_negation_is_never_reused(app):
+    save(REVIEW)
+    negated = REVIEW.replace('is bright', 'is not bright')
+    signature = stored_signature(negated, get_backend().cache_namespace)
+    # Close enough to match on the signature alone
+    assert similarity(signature, db.session.get(Analysis, 1).simhash) >= 0.8
+    assert find_near_duplicate(negated, signature, 0.8) is None
+
+
+def test_only_edits_of_neutral_words_are_reused(app):
+    from sqlalchemy import inspect
+
+    save(REVIEW)
+    namespace = get_backend().cache_namespace
+    flipped = REVIEW.replace('lasts', 'dies after')
+    signature = stored_signature(flipped, namespace)
+    assert similarity(signature, db.session.get(Analysis, 1).simhash) >= 0.8
+    assert find_near_duplicate(flipped, signature, 0.8) is None
+
+    db.session.expunge_all()
+    reworded = REVIEW.replace('the screen', 'its screen')
+    match = find_near_duplicate(reworded, stored_signature(reworded, namespace), 0.8)
+    assert match is not None
+    # The candidate's text came with it
+    assert 'text' not in inspect(match[0]).unloaded
+
+
+def test_analyze_reuses_a_near_duplicate(client, session_headers, captcha_ok, app):
+    stored = save(REVIEW)
+    with patch('api.routes.analyze_text') as analyze:
+        response = client.post('/api/analyze', headers=session_headers,
+                               json={'text': REVIEW.replace('.', '!'), 'captchaToken': 't'})
+    assert response.status_code == 200
+    analyze.assert_not_called()
+    body = response.get_json()
+    assert body['sentiment'] == RESULT['sentiment']
+    assert body['meta']['reused'] == 'near_duplicate'
+    assert body['meta']['analysis_id'] == stored.id
+
+    # The reused result is stored as a new analysis of the submitted text
+    assert Analysis.query.count() == 2
+
+
+def test_analyze_without_near_duplicates_has_no_meta(client, session_headers, captcha_ok, app):
+    app.config['NEAR_DUPLICATE_ENABLED'] = False
+    save(REVIEW)
+    with patch('api.routes.analyze_text', return_value={"data": RESULT, "status": 200}) as analyze:
+        response = client.post('/api/analyze', headers=session_headers,
+                               json={'text': REVIEW.replace('.', '!'), 'captchaToken': 't'})
+    analyze.assert_called_once()
+    assert 'meta' not in response.get_json()
+
+
+def test_backfill_command_indexes_old_rows(app):
+    old = Analysis.from_result(SESSION, REVIEW, RESULT)
+    short = Analysis.from_result(SESSION, 'ok', RESULT)
+    save_analyses([old, short])
+    old_id = old.id
+
+    result = app.test_cli_runner().invoke(args=['near-duplicates', 'backfill', '--batch-size', '1'])
+    assert 'Indexed 1 of 2 analyses' in result.output
+    assert db.session.get(Analysis, old_id).simhash is not None
+    assert AnalysisSimhashBand.query.count() == 4
@@ -0,0 +1,130 @@
+# tests/test_partitions.py
+import gzip
+import json
+import os
+from datetime import date, datetime
+import pytest
+from sqlalchemy import text
+from api import create_app, db
+from api.config import TestingConfig
+from api.models import Analysis, AnalysisSimhashBand, AnalysisText
+from api.services.history import page_keys
+from api.services.partitions import (
+    add_months, apply_retention, create_partitions, expired_months, list_partitions, partition_name
+)
+
+SESSION = '11111111-2222-3333-4444-555555555555'
+TODAY = date(2026, 10, 17)
+# Partitioning only exists on PostgreSQL; these tests need a scratch database
+POSTGRES_URL = os.getenv('TEST_POSTGRES_URL')
+
+
+class PostgresConfig(TestingConfig):
+    SQLALCHEMY_DATABASE_URI = POSTGRES_URL
+
+
+def add(text, created_at, session_id=SESSION):
+    analysis = Analysis.from_result(session_id, text, {"sentiment": {"label": "neutral", "score": 0.0}},
+                                    cache_key='k', simhash=1, keyword_limit=None)
+    analysis.created_at = created_at
+    db.session.add(analysis)
+    db.session.flush()
+    db.session.add(AnalysisSimhashBand(band=0, bucket=1, analysis_id=analysis.id))
+    return analysis
+
+
+def test_month_arithmetic():
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partition_name(date(2026, 3, 1)) == 'analyses_y2026m03'
+
+
+def test_retention_archives_and_drops_expired_months(app, tmp_path):
+    add('only in january', datetime(2026, 1, 31, 23, 59))
+    add('shared text', datetime(2026, 2, 1))
+    kept = add('shared text', datetime(2026, 4, 1))
+    add('recent', datetime(2026, 10, 2))
+    db.session.commit()
+
+    assert expired_months(6, today=TODAY) == [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)]
+    # One row per batch: every delete loop runs more than once
+    archived = apply_retention(6, str(tmp_path), batch_size=1, today=TODAY)
+
+    assert [(month, rows) for month, _, rows in archived] == [
+        (date(2026, 1, 1), 1), (date(2026, 2, 1), 1), (date(2026, 3, 1), 0)
+    ]
+    with gzip.open(tmp_path / 'analyses-2026-01.ndjson.gz', 'rt', encoding='utf-8') as archive:
+        records = [json.loads(line) for line in archive]
+    assert len(records) == 1
+    assert records[0]['text_content'] == 'only in january'
+    assert records[0]['session_id'] == SESSION
+    assert records[0]['created_at'] == '2026-01-31T23:59:00+00:00'
+
+    assert [row.text_content for row in Analysis.query.order_by(Analysis.id)] == ['shared text', 'recent']
+    # Unused texts and index rows go with their analyses; shared texts stay
+    assert sorted(text.content for text in AnalysisText.query) == ['recent', 'shared text']
+    assert AnalysisSimhashBand.query.count() == 2
+    assert AnalysisSimhashBand.query.filter_by(analysis_id=kept.id).count() == 1
+    assert expired_months(6, today=TODAY) == []
+
+
+def test_history_pages_span_months(app):
+    for day in (1, 2):
+        add(f'september {day}', datetime(2026, 9, day))
+    add('october', datetime(2026, 10, 1))
+    db.session.commit()
+    query = Analysis.query.filter(Analysis.session_id == SESSION)
+
+    first = page_keys(query, 2, (datetime(2026, 10, 31), 10 ** 9))
+    second = page_keys(query, 2, (first[-1].created_at, first[-1].id))
+
+    assert [key.created_at.day for key in first + second] == [1, 2, 1]
+
+
+def test_partition_commands_on_an_unpartitioned_database(app, tmp_path):
+    add('old', datetime(2020, 5, 1))
+    db.session.commit()
+    runner = app.test_cli_runner()
+
+    assert 'not partitioned' in runner.invoke(args=['partitions', 'create']).output
+    dry_run = runner.invoke(args=['partitions', 'retain', '--keep-months', '1200', '--dry-run'])
+    assert 'Would archive 0 months' in dry_run.output
+
+
+@pytest.fixture
+def partitioned_app():
+    """analyses partitioned as migration e1b7c3d9f420 leaves it, with only the default partition."""
+    app = create_app(PostgresConfig)
+    with app.app_context():
+        db.create_all()
+        for statement in (
+            "ALTER TABLE analyses RENAME TO analyses_unpartitioned",
+            "CREATE TABLE analyses (LIKE analyses_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (created_at)",
+            "ALTER TABLE analyses ADD PRIMARY KEY (id, created_at)",
+            "ALTER SEQUENCE analyses_id_seq OWNED BY analyses.id",
+            "DROP TABLE analyses_unpartitioned",
+            "CREATE TABLE analyses_default PARTITION OF analyses DEFAULT",
+        ):
+            db.session.execute(text(statement))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason='needs a PostgreSQL database in TEST_POSTGRES_URL')
+def test_late_partitions_take_their_rows_from_the_default_partition(partitioned_app):
+    add('before its partition', datetime(2026, 10, 5))
+    db.session.commit()
+
+    created = create_partitions(months_ahead=1, today=TODAY)
+
+    assert created == ['analyses_y2026m10', 'analyses_y2026m11']
+    assert list_partitions() == [date(2026, 10, 1), date(2026, 11, 1)]
+    assert db.session.execute(text("SELECT count(*) FROM analyses_y2026m10")).scalar() == 1
+    assert db.session.execute(text("SELECT count(*) FROM analyses_default")).scalar() == 0
+    # The default partition is attached again
+    add('far ahead', datetime(2030, 1, 1))
+    db.session.commit()
+    assert db.session.execute(text("SELECT count(*) FROM analyses_default")).scalar() == 1
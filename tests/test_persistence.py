@@ -0,0 +1,94 @@
+# tests/test_persistence.py
+import time
+import pytest
+from api.models import Analysis
+from api.services.persistence import write_buffer
+
+RESULT = {"sentiment": {"label": "positive", "score": 0.5}, "emotions": {}, "keywords": []}
+
+
+def make_rows(count):
+    return [Analysis.from_result('session', f'text {n}', RESULT) for n in range(count)]
+
+
+@pytest.fixture
+def buffered_app(app):
+    app.config.update(
+        WRITE_BEHIND_ENABLED=True,
+        WRITE_BEHIND_MAX_QUEUE=5,
+        WRITE_BEHIND_BATCH_SIZE=10,
+        WRITE_BEHIND_FLUSH_INTERVAL=0.05,
+    )
+    write_buffer.init_app(app)
+    yield app
+    write_buffer.stop()
+    app.config['WRITE_BEHIND_ENABLED'] = False
+    write_buffer.init_app(app)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def test_disabled_buffer_writes_synchronously(app):
+    write_buffer.submit(make_rows(2))
+    assert Analysis.query.count() == 2
+    assert write_buffer.stats()['queued'] == 0
+
+
+def test_rows_are_flushed_in_bulk_after_the_interval(buffered_app):
+    write_buffer.submit(make_rows(3))
+
+    wait_for(lambda: write_buffer.stats()['flushed'] == 3)
+    stats = write_buffer.stats()
+    assert stats['flushes'] == 1
+    assert stats['depth'] == 0
+    assert Analysis.query.count() == 3
+
+
+def test_full_queue_falls_back_to_synchronous_write(buffered_app, mocker):
+    # Keep the background writer from draining the queue during the test
+    mocker.patch.object(write_buffer, '_ensure_worker')
+
+    write_buffer.submit(make_rows(7))
+
+    stats = write_buffer.stats()
+    assert stats['queued'] == 5
+    assert stats['sync_writes'] == 2
+    assert Analysis.query.count() == 2
+
+    write_buffer.flush()
+    assert Analysis.query.count() == 7
+
+
+def test_stop_flushes_queued_rows(buffered_app, mocker):
+    mocker.patch.object(write_buffer, '_ensure_worker')
+    write_buffer.submit(make_rows(4))
+
+    write_buffer.stop()
+
+    assert Analysis.query.count() == 4
+
+
+def test_failed_flush_counts_dropped_rows(buffered_app, mocker):
+    mocker.patch.object(write_buffer, '_ensure_worker')
+    mocker.patch('api.services.persistence.save_analyses', side_effect=RuntimeError("db down"))
+    write_buffer._queue.put_nowait(make_rows(1)[0])
+
+    write_buffer.flush()
+
+    assert write_buffer.stats()['dropped'] == 1
+
+
+def test_analyze_route_uses_the_buffer(buffered_app, client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.routes.analyze_text', return_value={"data": RESULT, "status": 200})
+
+    response = client.post('/api/analyze', json={'text': 'buffered', 'captchaToken': 't'}, headers=session_headers)
+
+    assert response.status_code == 200
+    wait_for(lambda: write_buffer.stats()['flushed'] == 1)
+    assert Analysis.query.one().text_content == 'buffered'
+    assert client.get('/api/persistence/stats').json['enabled'] is True
@@ -0,0 +1,115 @@
+# tests/test_ratelimit.py
+import multiprocessing
+import time
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from api import create_app
+from api.config import TestingConfig
+from api.services.ratelimit import DatabaseStorage, MmapStorage
+
+
+@pytest.fixture
+def mmap_uri(tmp_path):
+    return f"mmap://{tmp_path / 'ratelimit.bin'}?slots=64"
+
+
+def test_mmap_scheme_is_registered(mmap_uri):
+    storage = storage_from_string(mmap_uri)
+    assert isinstance(storage, MmapStorage)
+    assert storage.slots == 64
+    assert storage.check()
+
+
+def test_mmap_counts_within_a_window(mmap_uri):
+    storage = MmapStorage(mmap_uri)
+    assert storage.incr('a', expiry=60) == 1
+    assert storage.incr('a', expiry=60, amount=2) == 3
+    assert storage.get('a') == 3
+    assert storage.get('b') == 0
+    assert 59 < storage.get_expiry('a') - time.time() <= 60
+
+    storage.clear('a')
+    assert storage.get('a') == 0
+
+
+def test_mmap_window_expires(mmap_uri):
+    storage = MmapStorage(mmap_uri)
+    storage.incr('a', expiry=0.05)
+    time.sleep(0.1)
+    assert storage.get('a') == 0
+    assert storage.incr('a', expiry=60) == 1
+
+
+def test_mmap_full_bucket_evicts_the_oldest_window(tmp_path):
+    # 8 slots make a single bucket
+    storage = MmapStorage(f"mmap://{tmp_path / 'small.bin'}?slots=8")
+    for n in range(8):
+        storage.incr(f'key-{n}', expiry=60 + n)
+    storage.incr('newcomer', expiry=60)
+    assert storage.get('newcomer') == 1
+    assert storage.get('key-0') == 0
+    assert all(storage.get(f'key-{n}') == 1 for n in range(1, 8))
+    assert storage.reset() == 8
+
+
+def hit(uri, times):
+    storage = MmapStorage(uri)
+    for _ in range(times):
+        storage.incr('shared', expiry=60)
+
+
+def test_mmap_counters_are_shared_between_processes(mmap_uri):
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=hit, args=(mmap_uri, 200)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert MmapStorage(mmap_uri).get('shared') == 800
+
+
+def test_limiter_uses_the_shared_storage(tmp_path):
+    class LimitedConfig(TestingConfig):
+        RATELIMIT_ENABLED = True
+        RATELIMIT_STORAGE_URI = f"mmap://{tmp_path / 'ratelimit.bin'}"
+
+    statuses = [create_app(LimitedConfig).test_client().post('/api/analyze').status_code for _ in range(16)]
+    # Each request comes from a fresh app (a "worker"); the 16th is still over the limit
+    assert statuses[:15] == [400] * 15
+    assert statuses[15] == 429
+
+
+def test_database_storage(app):
+    storage = storage_from_string('database://')
+    assert isinstance(storage, DatabaseStorage)
+    limiter = FixedWindowRateLimiter(storage)
+    limit = parse('2 per minute')
+
+    assert limiter.hit(limit, 'client')
+    assert limiter.hit(limit, 'client')
+    assert not limiter.hit(limit, 'client')
+    # A rejected hit still counts, as with every fixed-window storage
+    assert storage.get(limit.key_for('client')) == 3
+    assert storage.get_expiry(limit.key_for('client')) > time.time()
+
+    storage.clear(limit.key_for('client'))
+    assert limiter.hit(limit, 'client')
+    assert storage.reset() == 1
+
+
+def test_memory_is_the_default_and_mmap_falls_back_without_fcntl(tmp_path, monkeypatch):
+    from api.config import Config
+    from api.services import ratelimit
+
+    assert Config.RATELIMIT_STORAGE_URI == 'memory://'
+
+    monkeypatch.setattr(ratelimit, 'fcntl', None)
+
+    class WindowsConfig(TestingConfig):
+        RATELIMIT_STORAGE_URI = f"mmap://{tmp_path / 'ratelimit.bin'}"
+
+    app = create_app(WindowsConfig)
+    assert app.config['RATELIMIT_STORAGE_URI'] == 'memory://'
@@ -0,0 +1,131 @@
+# tests/test_resilience.py
+import time
+from datetime import datetime, timedelta
+import pytest
+import requests
+from flask import g
+from api.models import db, Analysis
+from api.services import watson_service
+from api.services.backends import get_backend
+from api.services.cache import make_cache_key
+from api.services.lexicon_service import LexiconBackend
+from api.services.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, watson_breaker
+
+TEXT = 'The support team solved my problem in minutes.'
+UNAVAILABLE = {"error": "Watson API Error: Service Unavailable", "status": 503}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('api.services.resilience.time.monotonic', lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_consecutive_failures_and_recovers(clock):
+    breaker = CircuitBreaker('test', failure_threshold=3, recovery_timeout=10)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock[0] += 10
+    assert breaker.state == HALF_OPEN
+    # One probe at a time
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats()['opened'] == 1
+
+
+def test_failed_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=10)
+    breaker.record(UNAVAILABLE)
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record(UNAVAILABLE)
+    assert breaker.state == OPEN
+    assert breaker.stats()['retry_in_seconds'] == 10
+    # A client error is not the engine's fault
+    breaker = CircuitBreaker('test', failure_threshold=1)
+    breaker.record({"error": "unsupported text language", "status": 422})
+    assert breaker.state == CLOSED
+
+
+def test_watson_calls_get_the_remaining_deadline(app, mocker):
+    watson = mocker.patch('api.services.watson_service.analyze_text', return_value={"data": {}, "status": 200})
+    with app.test_request_context():
+        g.analysis_deadline = time.monotonic() + 2
+        get_backend('watson').analyze(TEXT)
+        assert 1 < watson.call_args.kwargs['timeout'] <= 2
+
+        g.analysis_deadline = time.monotonic()
+        assert get_backend('watson').analyze(TEXT)['status'] == 504
+    assert watson.call_count == 1
+    # Running out of our own budget doesn't count against Watson
+    assert watson_breaker.state == CLOSED
+
+
+def test_watson_timeout_is_reported_as_504(monkeypatch):
+    class SlowClient:
+        def analyze(self, **kwargs):
+            assert kwargs['timeout'] == 0.5
+            raise requests.exceptions.ReadTimeout()
+
+    monkeypatch.setenv('WATSON_API_KEY', 'key')
+    monkeypatch.setenv('WATSON_URL', 'https://watson.invalid')
+    monkeypatch.setattr(watson_service.client_registry, 'get_client', lambda key, url: SlowClient())
+    assert watson_service.analyze_text(TEXT, timeout=0.5)['status'] == 504
+
+
+def analyze(client, headers):
+    return client.post('/api/analyze', headers=headers, json={'text': TEXT, 'captchaToken': 't'})
+
+
+def test_open_circuit_falls_back_to_the_secondary_backend(app, client, mocker, session_headers, captcha_ok):
+    app.config.update(FALLBACK_BACKEND='lexicon', CIRCUIT_FAILURE_THRESHOLD=2)
+    watson_breaker.init_app(app)
+    watson = mocker.patch('api.services.watson_service.analyze_text', return_value=UNAVAILABLE)
+
+    for _ in range(3):
+        response = analyze(client, session_headers)
+        assert response.status_code == 200
+
+    # The third request didn't wait for Watson at all
+    assert watson.call_count == 2
+    assert response.json['meta']['degraded'] == {"reason": "circuit_open", "backend": "lexicon"}
+    assert response.json['sentiment'] == LexiconBackend().analyze(TEXT)['data']['sentiment']
+    # Fallback results are kept in the history but never served as Watson's
+    assert Analysis.query.count() == 3
+    assert Analysis.query.filter(Analysis.cache_key.isnot(None)).count() == 0
+    assert client.get('/api/circuit/stats').json['state'] == OPEN
+
+
+def test_open_circuit_serves_a_stale_stored_result(app, client, mocker, session_headers, captcha_ok):
+    stored = Analysis.from_result('someone', TEXT, {"sentiment": {"label": "positive", "score": 0.7}},
+                                  cache_key=make_cache_key(TEXT, get_backend().cache_namespace))
+    stored.created_at = datetime.utcnow() - timedelta(days=30)
+    db.session.add(stored)
+    db.session.commit()
+    watson_breaker.record_failure()
+    watson_breaker.failure_threshold = 1
+    watson_breaker.record_failure()
+    watson = mocker.patch('api.services.watson_service.analyze_text')
+
+    response = client.post('/api/analyze', headers=session_headers,
+                           json={'text': TEXT, 'captchaToken': 't', 'features': ['sentiment']})
+
+    watson.assert_not_called()
+    assert response.json['sentiment'] == {"label": "positive", "score": 0.7}
+    assert response.json['meta']['degraded'] == {"reason": "circuit_open", "source": "stale_cache"}
+
+
+def test_without_a_fallback_the_error_is_returned(app, client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.services.watson_service.analyze_text', return_value=UNAVAILABLE)
+    response = analyze(client, session_headers)
+    assert response.status_code == 503
@@ -0,0 +1,126 @@
+# tests/test_rollups.py
+from datetime import datetime, timedelta, timezone
+import pytest
+from api.models import db, Analysis, AnalysisRollup
+from api.services.persistence import save_analyses
+from api.services.rollups import GLOBAL_ROLLUP_SCOPE
+
+SESSION = '11111111-2222-3333-4444-555555555555'
+
+
+def result(label, score, joy=0.5, keywords=()):
+    return {
+        "sentiment": {"label": label, "score": score},
+        "emotions": {"joy": joy, "sadness": 0.1, "fear": 0.0, "disgust": 0.0, "anger": 0.2},
+        "keywords": [{"text": text, "relevance": 0.9} for text in keywords],
+    }
+
+
+@pytest.fixture
+def saved(app):
+    save_analyses([
+        Analysis.from_result(SESSION, 'great battery', result('positive', 0.8, keywords=['battery', 'screen'])),
+        Analysis.from_result(SESSION, 'bad battery', result('negative', -0.6, joy=0.1, keywords=['Battery'])),
+        Analysis.from_result('other-session', 'meh', result('neutral', 0.0, keywords=['price'])),
+    ])
+
+
+def rollup(scope):
+    today = datetime.now(timezone.utc).date()
+    return db.session.get(AnalysisRollup, (today, scope))
+
+
+def test_saving_analyses_updates_session_and_global_rollups(saved):
+    session_rollup = rollup(SESSION)
+    assert session_rollup.total_count == 2
+    assert (session_rollup.positive_count, session_rollup.negative_count, session_rollup.neutral_count) == (1, 1, 0)
+    assert session_rollup.sentiment_score_sum == pytest.approx(0.2)
+    assert session_rollup.joy_sum == pytest.approx(0.6)
+    assert session_rollup.keyword_counts == {'battery': 2, 'screen': 1}
+
+    global_rollup = rollup(GLOBAL_ROLLUP_SCOPE)
+    assert global_rollup.total_count == 3
+    assert global_rollup.neutral_count == 1
+    assert global_rollup.keyword_counts == {'battery': 2, 'screen': 1, 'price': 1}
+
+
+def test_keyword_map_is_capped(app):
+    app.config['ROLLUP_MAX_KEYWORDS'] = 2
+    save_analyses([Analysis.from_result(SESSION, 'x', result('positive', 0.5, keywords=['a', 'b']))])
+    save_analyses([Analysis.from_result(SESSION, 'y', result('positive', 0.5, keywords=['b', 'c']))])
+    counts = rollup(SESSION).keyword_counts
+    assert len(counts) == 2
+    assert counts['b'] == 2
+
+
+def test_stats_endpoint(client, session_headers, saved):
+    response = client.get('/api/stats', headers=session_headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['scope'] == 'session'
+    assert len(body['days']) == 1
+    totals = body['totals']
+    assert totals['total'] == 2
+    assert totals['sentiment'] == {'positive': 1, 'negative': 1, 'neutral': 0}
+    assert totals['average_sentiment_score'] == pytest.approx(0.1)
+    assert totals['average_emotions']['joy'] == pytest.approx(0.3)
+    assert totals['top_keywords'][0] == {'text': 'battery', 'count': 2}
+
+    global_body = client.get('/api/stats?scope=global&days=7').get_json()
+    assert global_body['totals']['total'] == 3
+    today = datetime.now(timezone.utc).date()
+    assert global_body['from'] == (today - timedelta(days=6)).isoformat()
+    assert global_body['to'] == today.isoformat()
+
+
+def test_stats_endpoint_validates_parameters(client, session_headers):
+    assert client.get('/api/stats').status_code == 400
+    assert client.get('/api/stats?scope=everyone', headers=session_headers).status_code == 400
+    assert client.get('/api/stats?days=0', headers=session_headers).status_code == 400
+    assert client.get('/api/stats?days=abc', headers=session_headers).status_code == 400
+
+
+def test_the_global_scope_is_not_a_session_id(client, saved, captcha_ok, mocker):
+    analyze = mocker.patch('api.routes.analyze_text')
+    reserved = {'X-Session-ID': GLOBAL_ROLLUP_SCOPE}
+
+    assert client.post('/api/analyze', json={'text': 'Text', 'captchaToken': 't'}, headers=reserved).status_code == 400
+    assert client.get('/api/stats?scope=session', headers=reserved).status_code == 400
+    assert client.get('/api/history', headers=reserved).status_code == 400
+    assert client.get(f'/api/jobs/x/events?session_id={GLOBAL_ROLLUP_SCOPE}').status_code == 400
+    analyze.assert_not_called()
+    assert client.get('/api/stats?scope=global').get_json()['totals']['total'] == 3
+
+
+def test_rebuild_command_matches_incremental_rollups(app, saved):
+    def snapshot():
+        return sorted(
+            (r.day, r.session_id, r.total_count, r.positive_count, round(r.joy_sum, 6), sorted(r.keyword_counts.items()))
+            for r in AnalysisRollup.query.all()
+        )
+
+    expected = snapshot()
+    AnalysisRollup.query.delete()
+    db.session.commit()
+
+    output = app.test_cli_runner().invoke(args=['rollups', 'rebuild', '--batch-size', '2'])
+    assert 'Rebuilt rollups from 3 analyses' in output.output
+    assert snapshot() == expected
+
+
+def test_global_rollups_are_applied_outside_the_insert_transaction(app):
+    from api.services.rollups import global_rollups
+
+    app.config.update(ROLLUP_GLOBAL_BUFFER_ENABLED=True, ROLLUP_GLOBAL_FLUSH_INTERVAL=60)
+    global_rollups.init_app(app)
+    save_analyses([Analysis.from_result(SESSION, 'x', result('positive', 0.5, keywords=['a']))])
+    save_analyses([Analysis.from_result('other-session', 'y', result('negative', -0.5, keywords=['a']))])
+
+    # The session rows are written with the analyses; the global one waits for the flush
+    assert rollup(SESSION).total_count == 1
+    assert rollup(GLOBAL_ROLLUP_SCOPE) is None
+
+    global_rollups.stop()
+    global_rollup = rollup(GLOBAL_ROLLUP_SCOPE)
+    assert (global_rollup.total_count, global_rollup.positive_count, global_rollup.negative_count) == (2, 1, 1)
+    assert global_rollup.keyword_counts == {'a': 2}
@@ -0,0 +1,91 @@
+# tests/test_search.py
+from datetime import datetime, timedelta
+import pytest
+from api import db
+from api.models import Analysis
+from api.services.search import fts5_query
+
+SESSION = '11111111-2222-3333-4444-555555555555'
+
+
+@pytest.fixture
+def analyses(app):
+    base = datetime(2026, 10, 1, 12, 0, 0)
+    texts = [
+        ('The battery is charging slowly', 'negative', ['battery', 'charging']),
+        ('Great screen, bright colours', 'positive', ['screen']),
+        ('Battery life is amazing', 'positive', ['Battery life']),
+        ('Nothing special about the battery', 'neutral', ['battery']),
+    ]
+    rows = [
+        Analysis(session_id=SESSION, text_content=text, sentiment_label=label, sentiment_score=0.0,
+                 keywords=[{"text": keyword, "relevance": 0.9} for keyword in keywords],
+                 created_at=base + timedelta(minutes=n))
+        for n, (text, label, keywords) in enumerate(texts)
+    ]
+    rows.append(Analysis(session_id='other', text_content='My battery died', sentiment_label='negative',
+                         sentiment_score=-0.5, keywords=[{"text": "battery"}], created_at=base))
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+def search(client, headers, **params):
+    response = client.get('/api/history/search', headers=headers, query_string=params)
+    assert response.status_code == 200, response.json
+    return [row['text_content'] for row in response.json]
+
+
+def test_text_search_is_stemmed_and_scoped_to_the_session(client, session_headers, analyses):
+    assert search(client, session_headers, q='batteries') == [
+        'Nothing special about the battery', 'Battery life is amazing', 'The battery is charging slowly'
+    ]
+    assert search(client, session_headers, q='charge battery') == ['The battery is charging slowly']
+    assert search(client, session_headers, q='died') == []
+
+
+def test_keyword_and_label_filters(client, session_headers, analyses):
+    assert search(client, session_headers, keyword='battery') == [
+        'Nothing special about the battery', 'The battery is charging slowly'
+    ]
+    assert search(client, session_headers, q='battery', label='positive') == ['Battery life is amazing']
+
+
+def test_search_is_paginated(client, session_headers, analyses):
+    first = client.get('/api/history/search', headers=session_headers, query_string={'q': 'battery', 'limit': 2})
+    assert len(first.json) == 2
+    second = client.get('/api/history/search', headers=session_headers,
+                        query_string={'q': 'battery', 'limit': 2, 'cursor': first.headers['X-Next-Cursor']})
+    assert [row['text_content'] for row in second.json] == ['The battery is charging slowly']
+    assert 'X-Next-Cursor' not in second.headers
+
+
+def test_search_validation(client, session_headers, analyses):
+    assert client.get('/api/history/search', headers=session_headers).status_code == 400
+    assert client.get('/api/history/search?label=angry', headers=session_headers).status_code == 400
+    assert client.get('/api/history/search?q=battery').status_code == 400
+
+
+def test_user_input_cannot_inject_fts_syntax(client, session_headers, analyses):
+    assert fts5_query('battery OR "screen*') == '"battery" "OR" "screen"'
+    assert fts5_query('?!') is None
+    assert search(client, session_headers, q='?!') == []
+
+
+def test_unchanged_search_pages_cost_a_304(client, session_headers, analyses):
+    first = client.get('/api/history/search', headers=session_headers, query_string={'q': 'battery'})
+    etag = first.headers['ETag']
+
+    unchanged = client.get('/api/history/search', headers={**session_headers, 'If-None-Match': etag},
+                           query_string={'q': 'battery'})
+    assert unchanged.status_code == 304
+    other_query = client.get('/api/history/search', headers={**session_headers, 'If-None-Match': etag},
+                             query_string={'q': 'battery', 'label': 'positive'})
+    assert other_query.status_code == 200
+
+    db.session.add(Analysis(session_id=SESSION, text_content='New battery', sentiment_label='positive',
+                            sentiment_score=0.5, keywords=[], created_at=datetime(2026, 10, 2)))
+    db.session.commit()
+    changed = client.get('/api/history/search', headers={**session_headers, 'If-None-Match': etag},
+                         query_string={'q': 'battery'})
+    assert changed.status_code == 200
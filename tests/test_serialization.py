@@ -0,0 +1,89 @@
+# tests/test_serialization.py
+import gzip
+import json
+from datetime import datetime, timezone
+import pytest
+from flask.json.provider import DefaultJSONProvider
+from api import db
+from api.models import Analysis
+from api.services.serialization import OrjsonProvider, analysis_memo
+
+SESSION = '11111111-2222-3333-4444-555555555555'
+
+
+@pytest.fixture
+def rows(app):
+    analyses = [
+        Analysis(session_id=SESSION, text_content=f"memoized analysis {n} " + "y" * 200,
+                 sentiment_label='positive', sentiment_score=0.5,
+                 keywords=[{"text": "memo", "relevance": 0.9}],
+                 created_at=datetime(2026, 10, 1, 12, n))
+        for n in range(10)
+    ]
+    db.session.add_all(analyses)
+    db.session.commit()
+    return analyses
+
+
+def test_orjson_provider_matches_flask(app):
+    payload = {"b": [1, 2.5, None], "a": {"when": datetime(2026, 10, 17, 9, 30, tzinfo=timezone.utc)}}
+    fast = OrjsonProvider(app)
+    stdlib = DefaultJSONProvider(app)
+
+    assert fast.response(payload).get_data() == stdlib.response(payload).get_data()
+    # Non-ASCII text is sent as UTF-8 rather than \u escapes: the same JSON
+    assert fast.loads(fast.dumps({"é": "ü"})) == json.loads(stdlib.dumps({"é": "ü"}))
+
+
+def test_history_is_served_from_the_memo(client, rows, session_headers, mocker):
+    first = client.get('/api/history', headers=session_headers)
+    assert len(analysis_memo) == 10
+
+    to_dict = mocker.spy(Analysis, 'to_dict')
+    second = client.get('/api/history', headers=session_headers)
+    assert second.json == first.json
+    assert to_dict.call_count == 0
+
+    projected = client.get('/api/history?fields=id,sentiment_label', headers=session_headers)
+    assert [sorted(item) for item in projected.json] == [['id', 'sentiment_label']] * 10
+    assert len(analysis_memo) == 20
+
+
+def test_memoized_pages_encode_like_jsonify(app, client, rows, session_headers):
+    client.get('/api/history', headers=session_headers)
+    spliced = client.get('/api/history', headers=session_headers)
+
+    with app.app_context():
+        expected = app.json.response([row.to_dict() for row in reversed(rows)]).get_data()
+    assert spliced.get_data() == expected
+    assert spliced.mimetype == 'application/json'
+
+
+def test_large_responses_are_gzipped_with_weak_etag(client, rows, session_headers):
+    plain = client.get('/api/history', headers=session_headers)
+    assert 'Content-Encoding' not in plain.headers
+
+    headers = {**session_headers, 'Accept-Encoding': 'gzip'}
+    response = client.get('/api/history', headers=headers)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.headers['ETag'].startswith('W/')
+    assert json.loads(gzip.decompress(response.get_data())) == plain.json
+
+    cached = client.get('/api/history', headers={**headers, 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+
+
+def test_small_responses_are_not_gzipped(client):
+    response = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_payload_sampling_is_off_by_default(app, mocker):
+    from api.services.payload_log import payload_log
+    debug = mocker.patch.object(payload_log.logger, 'debug')
+
+    payload_log.sample('Watson', {"sentiment": {}})
+
+    assert payload_log.sample_rate == 0
+    debug.assert_not_called()
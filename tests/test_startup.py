@@ -0,0 +1,38 @@
+# tests/test_startup.py
+import sys
+import click
+from api import create_app
+from api.config import TestingConfig
+from api.services.startup import preload
+
+
+def test_dev_only_parts_follow_config():
+    class DocsConfig(TestingConfig):
+        SWAGGER_UI_ENABLED = True
+        MIGRATIONS_ENABLED = True
+
+    plain = create_app('api.config.TestingConfig')
+    docs = create_app(DocsConfig)
+
+    assert 'migrate' not in plain.extensions
+    assert not any(rule.rule.startswith('/api/docs') for rule in plain.url_map.iter_rules())
+    assert 'migrate' in docs.extensions
+    assert any(rule.rule.startswith('/api/docs') for rule in docs.url_map.iter_rules())
+
+
+def test_flask_command_loads_migrations():
+    # The flask command creates the app inside its click context
+    with click.Context(click.Command('db')):
+        app = create_app('api.config.TestingConfig')
+
+    assert 'migrate' in app.extensions
+
+
+def test_preload_imports_the_configured_backends():
+    app = create_app('api.config.TestingConfig')
+    app.config.update(SENTIMENT_BACKEND='watson', FALLBACK_BACKEND='lexicon')
+
+    modules = preload(app)
+
+    assert {'ibm_watson', 'requests', 'api.services.lexicon_service'} <= set(modules)
+    assert all(name in sys.modules for name in modules)
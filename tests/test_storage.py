@@ -0,0 +1,64 @@
+# tests/test_storage.py
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from api import db
+from api.models import Analysis, AnalysisText
+from api.services.storage import backfill_storage, pack_emotions, unpack_emotions
+
+SESSION = '11111111-2222-3333-4444-555555555555'
+TEXT = 'The battery lasts all day and the screen is gorgeous. ' * 4
+EMOTIONS = {"joy": 0.812345, "sadness": 0.000123, "fear": 0.05, "disgust": 0.0, "anger": 1.0}
+
+
+def legacy_row(n, text=TEXT):
+    """An analysis as rows were stored before the texts table existed."""
+    return {
+        'session_id': SESSION, 'text_content': text, 'sentiment_label': 'positive', 'sentiment_score': 0.5,
+        **{f'emotion_{name}': score for name, score in EMOTIONS.items()},
+        'keywords': [{"text": "battery", "relevance": 0.9}],
+        'created_at': datetime(2026, 1, 1) + timedelta(minutes=n),
+    }
+
+
+def test_identical_texts_are_stored_once_and_compressed(app):
+    data = {"sentiment": {"label": "positive", "score": 0.9}, "emotions": EMOTIONS}
+    db.session.add_all([Analysis.from_result(session, TEXT, data) for session in ('a', 'b')])
+    db.session.commit()
+    db.session.add(Analysis.from_result('c', TEXT, data))
+    db.session.commit()
+
+    stored = AnalysisText.query.one()
+    assert stored.compressed and len(stored.body) < len(TEXT)
+    assert db.session.scalar(select(func.count()).select_from(Analysis)) == 3
+    assert len({analysis.text_id for analysis in Analysis.query}) == 1
+
+    db.session.expunge_all()
+    analysis = Analysis.query.filter_by(session_id='b').one()
+    assert '_content' not in analysis.text.__dict__
+    assert analysis.to_dict(['text_content', 'emotions']) == {'text_content': TEXT, 'emotions': EMOTIONS}
+
+
+def test_emotions_read_back_unchanged():
+    assert unpack_emotions(pack_emotions(EMOTIONS)) == EMOTIONS
+    assert len(pack_emotions(EMOTIONS)) == 20
+    assert pack_emotions(None) is None
+
+
+def test_backfill_moves_legacy_rows_without_changing_their_output(app, client, session_headers):
+    legacy = [legacy_row(n) for n in range(3)] + [legacy_row(3, 'Short one')]
+    db.session.execute(Analysis.__table__.insert(), legacy)
+    db.session.commit()
+    before = client.get('/api/history', headers=session_headers).json
+    assert before[0]['emotions'] == EMOTIONS
+    # Legacy rows written after the migration ran (by the previous release) aren't indexed until backfilled
+    assert client.get('/api/history/search?q=battery', headers=session_headers).json == []
+
+    assert backfill_storage(batch_size=2) == 4
+
+    assert client.get('/api/history', headers=session_headers).json == before
+    assert AnalysisText.query.count() == 2
+    assert db.session.execute(
+        select(func.count()).select_from(Analysis.__table__).where(Analysis.__table__.c.text_content.isnot(None))
+    ).scalar() == 0
+    assert len(client.get('/api/history/search?q=battery', headers=session_headers).json) == 3
+    assert backfill_storage() == 0
@@ -0,0 +1,82 @@
+# tests/test_usage.py
+from api.models import SessionDailyUsage
+from api.services.usage import usage_counter
+
+WATSON_RESULT = {
+    "data": {"sentiment": {"label": "neutral", "score": 0.0}, "emotions": {}, "keywords": []},
+    "status": 200
+}
+
+
+def test_reserve_stops_at_the_limit(app):
+    assert usage_counter.reserve('s1', 2, limit=3)
+    assert usage_counter.reserve('s1', 1, limit=3)
+    assert not usage_counter.reserve('s1', 1, limit=3)
+    assert usage_counter.get('s1') == 3
+    # Other sessions are unaffected
+    assert usage_counter.reserve('s2', 3, limit=3)
+
+
+def test_reserve_is_all_or_nothing(app):
+    assert usage_counter.reserve('s1', 2, limit=3)
+    assert not usage_counter.reserve('s1', 2, limit=3)
+    assert usage_counter.get('s1') == 2
+
+
+def test_release_gives_quota_back(app):
+    usage_counter.reserve('s1', 3, limit=3)
+    assert not usage_counter.has_room('s1', 1, limit=3)
+    usage_counter.release('s1')
+    assert usage_counter.has_room('s1', 1, limit=3)
+    assert usage_counter.get('s1') == 2
+
+
+def test_release_refunds_the_day_that_was_charged(app, mocker):
+    from datetime import date
+    from api.models import db
+
+    mocker.patch('api.services.usage._today', return_value=date(2026, 10, 16))
+    day = usage_counter.reserve('s1', 3, limit=3)
+    assert day == date(2026, 10, 16)
+
+    # The analysis fails after midnight UTC
+    mocker.patch('api.services.usage._today', return_value=date(2026, 10, 17))
+    usage_counter.reserve('s1', 1, limit=3)
+    usage_counter.release('s1', day=day)
+
+    counts = dict(db.session.query(SessionDailyUsage.usage_date, SessionDailyUsage.count))
+    assert counts == {date(2026, 10, 16): 2, date(2026, 10, 17): 1}
+
+
+def test_exhausted_sessions_are_rejected_without_a_query(app, mocker):
+    usage_counter.reserve('s1', 3, limit=3)
+    assert not usage_counter.has_room('s1', 1, limit=3)
+
+    get = mocker.spy(usage_counter, 'get')
+    assert not usage_counter.has_room('s1', 1, limit=3)
+    assert not usage_counter.reserve('s1', 1, limit=3)
+    assert get.call_count == 0
+
+
+def test_analyze_enforces_the_daily_limit(app, client, mocker, session_headers, captcha_ok):
+    app.config['DAILY_ANALYSIS_LIMIT_PER_SESSION'] = 2
+    watson = mocker.patch('api.routes.analyze_text', return_value=WATSON_RESULT)
+
+    statuses = [
+        client.post('/api/analyze', json={'text': f'text {n}', 'captchaToken': 't'}, headers=session_headers).status_code
+        for n in range(3)
+    ]
+
+    assert statuses == [200, 200, 429]
+    assert watson.call_count == 2
+    usage = SessionDailyUsage.query.one()
+    assert usage.count == 2
+
+
+def test_failed_analysis_does_not_use_quota(app, client, mocker, session_headers, captcha_ok):
+    mocker.patch('api.routes.analyze_text', return_value={"error": "Watson API Error: down", "status": 503})
+
+    response = client.post('/api/analyze', json={'text': 'text', 'captchaToken': 't'}, headers=session_headers)
+
+    assert response.status_code == 503
+    assert usage_counter.get(session_headers['X-Session-ID']) == 0
@@ -0,0 +1,117 @@
+# tests/test_watson_service.py
+import threading
+import time
+import pytest
+from api.services import watson_service
+from api.services.watson_service import WatsonClientRegistry
+
+
+class FakeTokenManager:
+    """Stands in for the IAM token manager; counts token fetches."""
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self.refresh_time = 0
+        self.fetches = 0
+        self.fetched = threading.Event()
+
+    def get_token(self):
+        self.fetches += 1
+        self.refresh_time = time.time() + self.ttl * 0.8
+        self.fetched.set()
+        return "fake-token"
+
+
+class FakeResponse:
+    def __init__(self, result):
+        self._result = result
+
+    def get_result(self):
+        return self._result
+
+
+class FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeNLUClient:
+    """Test double for NaturalLanguageUnderstandingV1; never touches the network."""
+
+    def __init__(self, api_key, api_url):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.http_client = FakeSession()
+        self.authenticator = type('Authenticator', (), {'token_manager': FakeTokenManager()})()
+        self.calls = []
+
+    def analyze(self, text, features):
+        self.calls.append(text)
+        return FakeResponse({
+            "sentiment": {"document": {"label": "positive", "score": 0.9}},
+            "emotion": {"document": {"emotion": {"joy": 0.8}}},
+            "keywords": [{"text": "test", "relevance": 0.9}],
+        })
+
+
+@pytest.fixture
+def registry():
+    registry = WatsonClientRegistry(client_factory=FakeNLUClient)
+    yield registry
+    registry.reset()
+
+
+def test_client_is_reused(registry):
+    first = registry.get_client('key', 'https://nlu.example')
+    second = registry.get_client('key', 'https://nlu.example')
+    assert first is second
+
+
+def test_credential_change_rebuilds_client(registry):
+    old = registry.get_client('key', 'https://nlu.example')
+    new = registry.get_client('rotated-key', 'https://nlu.example')
+    assert new is not old
+    assert new.api_key == 'rotated-key'
+    assert old.http_client.closed
+
+
+def test_reset_drops_client(registry):
+    old = registry.get_client('key', 'https://nlu.example')
+    registry.reset()
+    assert registry.get_client('key', 'https://nlu.example') is not old
+    assert old.http_client.closed
+
+
+def test_forked_child_builds_its_own_client(registry, monkeypatch):
+    parent_client = registry.get_client('key', 'https://nlu.example')
+    monkeypatch.setattr(watson_service.os, 'getpid', lambda: -1)
+    child_client = registry.get_client('key', 'https://nlu.example')
+    assert child_client is not parent_client
+    # The parent's sockets must be left alone.
+    assert not parent_client.http_client.closed
+
+
+def test_token_is_fetched_ahead_of_requests(registry):
+    client = registry.get_client('key', 'https://nlu.example')
+    token_manager = client.authenticator.token_manager
+    assert token_manager.fetched.wait(timeout=2)
+    assert token_manager.fetches == 1
+
+
+def test_analyze_text_uses_registry(registry, monkeypatch):
+    monkeypatch.setenv('WATSON_API_KEY', 'key')
+    monkeypatch.setenv('WATSON_URL', 'https://nlu.example')
+    monkeypatch.setattr(watson_service, 'client_registry', registry)
+
+    first = watson_service.analyze_text("I love it")
+    second = watson_service.analyze_text("Still love it")
+
+    assert first["status"] == 200
+    assert first["data"]["sentiment"]["label"] == "positive"
+    assert first["data"]["emotions"] == {"joy": 0.8}
+    client = registry.get_client('key', 'https://nlu.example')
+    assert client.calls == ["I love it", "Still love it"]
+    assert second["status"] == 200